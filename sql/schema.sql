@@ -64,6 +64,31 @@ CREATE TABLE IF NOT EXISTS dim_material (
     material_main TEXT
 );
 
+-- Date Dimension (built by src/etl/build_dim_date.py)
+CREATE TABLE IF NOT EXISTS dim_date (
+    date_key INT PRIMARY KEY, -- YYYYMMDD
+    date DATE UNIQUE NOT NULL,
+    year INT,
+    quarter INT,
+    month INT,
+    month_name TEXT,
+    year_month TEXT,
+    day_of_month INT,
+    day_of_year INT,
+    day_of_week INT, -- ISO: 1 = Monday
+    day_name TEXT,
+    iso_week INT,
+    iso_year INT,
+    week_start_date DATE,
+    is_weekend BOOLEAN,
+    fiscal_year INT, -- ASOS FY: September -> August, named by end year
+    fiscal_quarter INT,
+    fiscal_month INT,
+    is_holiday BOOLEAN, -- England & Wales bank holidays
+    holiday_name TEXT,
+    retail_event TEXT -- Black Friday, Cyber Monday
+);
+
 CREATE TABLE IF NOT EXISTS dim_product (
     product_id SERIAL PRIMARY KEY,
     sku TEXT UNIQUE,
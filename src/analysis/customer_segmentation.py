@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import numpy as np
 import logging
@@ -19,7 +20,150 @@ from src.utils.db_utils import get_engine
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def main():
+SEGMENT_COLUMNS = ['customer_id', 'Recency', 'Frequency', 'Monetary', 'RFM_Segment', 'Customer_Segment']
+
+def rfm_metrics(customer_ids, order_ids, days, amounts):
+    """
+    Vectorized RFM per customer (no per-customer Python).
+    
+    Args:
+        days: Integer calendar days of each line (e.g. days since 1970-01-01).
+    Returns:
+        DataFrame indexed by customer_id with Recency, Frequency, Monetary.
+    """
+    cust_codes, customers = pd.factorize(np.asarray(customer_ids), sort=True)
+    order_codes, order_labels = pd.factorize(np.asarray(order_ids))
+    days = np.asarray(days, dtype=np.int64)
+    
+    # One sort on the (customer, order) key serves both Recency and Frequency
+    key = cust_codes.astype(np.int64) * len(order_labels) + order_codes
+    by_key = np.argsort(key)
+    key = key[by_key]
+    starts = np.flatnonzero(np.r_[True, np.diff(cust_codes[by_key]) != 0])
+    # Recency: Days since last order (reference = last day + 1)
+    last_day = np.maximum.reduceat(days[by_key], starts)
+    # Frequency: Count unique orders (not line items!) -> key changes within each customer's run
+    frequency = np.add.reduceat(np.r_[True, np.diff(key) != 0].astype(np.int64), starts)
+    # Monetary: Sum of total_amount, through pandas' grouped sum (compensated, like the groupby
+    # in rfm_reference) so the M quintile edges match it bit for bit - np.bincount adds naively
+    monetary = pd.Series(np.asarray(amounts, dtype=np.float64)).groupby(cust_codes).sum().to_numpy()
+    
+    return pd.DataFrame({
+        'Recency': days.max() + 1 - last_day,
+        'Frequency': frequency,
+        'Monetary': monetary
+    }, index=pd.Index(customers, name='customer_id'))
+
+def rfm_reference(df):
+    """The original per-customer groupby / apply RFM, kept to check rfm_metrics against."""
+    reference_date = pd.to_datetime(df['date']).max() + pd.Timedelta(days=1)
+    return df.groupby('customer_id').agg({
+        'date': lambda x: (reference_date - pd.to_datetime(x).max()).days,
+        'order_id': 'nunique',
+        'total_amount': 'sum'
+    }).rename(columns={'date': 'Recency', 'order_id': 'Frequency', 'total_amount': 'Monetary'})
+
+def verify_rfm(df, rfm):
+    """True when rfm_metrics' output equals rfm_reference exactly (Monetary included, no tolerance)."""
+    expected = rfm_reference(df)
+    ok = rfm.index.equals(expected.index)
+    for col in ['Recency', 'Frequency', 'Monetary']:
+        same = ok and np.array_equal(rfm[col].to_numpy(), expected[col].to_numpy())
+        if not same:
+            logger.error(f"RFM {col} differs from the groupby reference.")
+        ok = ok and same
+    logger.info("RFM metrics verified." if ok else "RFM verification FAILED.")
+    return ok
+
+def _quintile(values, labels):
+    # Same bins as the batch job; tiny or tied subsets (dashboard filters) fall back to ranks
+    try:
+        return pd.qcut(values, 5, labels=labels).astype(int)
+    except ValueError:
+        pct = values.rank(method='first', pct=True)
+        return np.asarray(labels)[np.ceil(pct * 5).astype(int) - 1]
+
+def score_rfm(rfm):
+    """Quintile scores (1-5) and the RFM_Segment code, added to a Recency/Frequency/Monetary frame."""
+    rfm = rfm.copy()
+    # Recency: Lower is better (5 = Newest)
+    rfm['R_Score'] = _quintile(rfm['Recency'], [5, 4, 3, 2, 1])
+    # Frequency: Higher is better 
+    # Note: If Frequency has low variance (e.g. most are 1), qcut on the raw values would fail -> rank first
+    rfm['F_Score'] = _quintile(rfm['Frequency'].rank(method='first'), [1, 2, 3, 4, 5])
+    # Monetary: Higher is better
+    rfm['M_Score'] = _quintile(rfm['Monetary'], [1, 2, 3, 4, 5])
+    
+    # Combine Scores ('545'): looked up, not formatted per customer
+    rfm['RFM_Segment'] = RFM_CODES[_lut_index(rfm)]
+    return rfm
+
+# Define Segment Names (Realistic Logic)
+def segment_label(r, f, m):
+    # 1) Champions
+    if r >= 4 and f >= 4 and m >= 4:
+        return "Champions"
+
+    # 2) Loyal Customers
+    if f >= 4 and m >= 3 and r >= 3:
+        return "Loyal Customers"
+
+    # 3) Potential Loyalists
+    if r >= 4 and f in [2, 3]:
+        return "Potential Loyalists"
+
+    # 4) New Customers
+    if r >= 4 and f == 1:
+        return "New Customers"
+
+    # 5) Promising
+    if r == 3 and f in [1, 2]:
+        return "Promising"
+
+    # 6) Need Attention
+    if (r == 3 and f == 3) or (r in [2, 3] and m >= 3):
+        return "Need Attention"
+
+    # 7) At Risk
+    if r <= 2 and (f >= 3 or m >= 4):
+        return "At Risk"
+
+    # 9) Lost (Specific)
+    if r == 1 and f == 1 and m <= 2:
+        return "Lost"
+
+    # 8) Hibernating (Broad)
+    if r <= 2 and f <= 2 and m <= 3:
+        return "Hibernating"
+
+    # Default fallback
+    return "Others"
+
+# The rules only see the three 1-5 scores, so they are evaluated once for all 125 combinations:
+# labelling a customer is then one array lookup, flat index (R-1)*25 + (F-1)*5 + (M-1)
+SCORES = range(1, 6)
+SEGMENT_LUT = np.array([segment_label(r, f, m) for r in SCORES for f in SCORES for m in SCORES], dtype=object)
+RFM_CODES = np.array([f"{r}{f}{m}" for r in SCORES for f in SCORES for m in SCORES], dtype=object)
+
+def _lut_index(rfm):
+    r, f, m = (np.asarray(rfm[col], dtype=np.int64) for col in ('R_Score', 'F_Score', 'M_Score'))
+    return (r - 1) * 25 + (f - 1) * 5 + (m - 1)
+
+def label_segments(rfm):
+    """Customer_Segment for a scored frame, from the precomputed 5x5x5 rule table."""
+    rfm = rfm.copy()
+    rfm['Customer_Segment'] = SEGMENT_LUT[_lut_index(rfm)]
+    return rfm
+
+def segment_customers(rfm):
+    """Recency/Frequency/Monetary frame -> scored + labelled (the batch job's output columns)."""
+    return label_segments(score_rfm(rfm))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RFM customer segmentation into analysis_rfm_segments.")
+    parser.add_argument('--verify', action='store_true', help="Check the vectorized RFM metrics against the groupby reference.")
+    args = parser.parse_args(argv)
+    
     logger.info("Starting Customer Segmentation Analysis (RFM)...")
     engine = get_engine()
     
@@ -31,7 +175,7 @@ def main():
     WHERE customer_id IS NOT NULL
     """
     try:
-        df = pd.read_sql(query, engine)
+        df = pd.read_sql(query, engine, parse_dates=['date'])
     except Exception as e:
         logger.error(f"Error loading sales data: {e}")
         return
@@ -41,84 +185,18 @@ def main():
         return
 
     # 2. Calculate RFM Metrics
-    # Reference date = max date + 1 day
-    reference_date = pd.to_datetime(df['date']).max() + pd.Timedelta(days=1)
-    
-    # Aggregation: 
-    # Recency: Days since last order
-    # Frequency: Count unique orders (not line items!)
-    # Monetary: Sum of total_amount
-    rfm = df.groupby('customer_id').agg({
-        'date': lambda x: (reference_date - pd.to_datetime(x).max()).days,
-        'order_id': 'nunique', # Corrected Frequency Logic
-        'total_amount': 'sum'
-    }).rename(columns={
-        'date': 'Recency',
-        'order_id': 'Frequency',
-        'total_amount': 'Monetary'
-    })
-    
-    # 3. Score Segments (Quintiles 1-5)
-    # Recency: Lower is better (5 = Newest)
-    rfm['R_Score'] = pd.qcut(rfm['Recency'], 5, labels=[5, 4, 3, 2, 1])
-    # Frequency: Higher is better 
-    # Note: If Frequency has low variance (e.g. most are 1), qcut might fail without duplicates='drop'
-    rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
-    # Monetary: Higher is better
-    rfm['M_Score'] = pd.qcut(rfm['Monetary'], 5, labels=[1, 2, 3, 4, 5])
-    
-    # Combine Scores
-    rfm['RFM_Segment'] = rfm['R_Score'].astype(str) + rfm['F_Score'].astype(str) + rfm['M_Score'].astype(str)
+    # Reference date = last sales day + 1 day; Recency counted in calendar days
+    # (dates parsed once by read_sql; Recency is then one grouped max over the day numbers)
+    days = (df['date'].values.astype('datetime64[D]') - np.datetime64('1970-01-01', 'D')).astype(np.int64)
+    rfm = rfm_metrics(df['customer_id'], df['order_id'], days, df['total_amount'])
+    if args.verify and not verify_rfm(df, rfm):
+        sys.exit(1)
     
-    # Define Segment Names (Realistic Logic)
-    def segment_label(row):
-        r = int(row['R_Score'])
-        f = int(row['F_Score'])
-        m = int(row['M_Score'])
-
-        # 1) Champions
-        if r >= 4 and f >= 4 and m >= 4:
-            return "Champions"
-
-        # 2) Loyal Customers
-        if f >= 4 and m >= 3 and r >= 3:
-            return "Loyal Customers"
-
-        # 3) Potential Loyalists
-        if r >= 4 and f in [2, 3]:
-            return "Potential Loyalists"
-
-        # 4) New Customers
-        if r >= 4 and f == 1:
-            return "New Customers"
-
-        # 5) Promising
-        if r == 3 and f in [1, 2]:
-            return "Promising"
-
-        # 6) Need Attention
-        if (r == 3 and f == 3) or (r in [2, 3] and m >= 3):
-            return "Need Attention"
-
-        # 7) At Risk
-        if r <= 2 and (f >= 3 or m >= 4):
-            return "At Risk"
-
-        # 9) Lost (Specific)
-        if r == 1 and f == 1 and m <= 2:
-            return "Lost"
-
-        # 8) Hibernating (Broad)
-        if r <= 2 and f <= 2 and m <= 3:
-            return "Hibernating"
-
-        # Default fallback
-        return "Others"
-            
-    rfm['Customer_Segment'] = rfm.apply(segment_label, axis=1)
+    # 3. Score Segments (Quintiles 1-5) + Segment Names
+    rfm = segment_customers(rfm)
     
     # 4. Save Results
-    output_df = rfm.reset_index()[['customer_id', 'Recency', 'Frequency', 'Monetary', 'RFM_Segment', 'Customer_Segment']]
+    output_df = rfm.reset_index()[SEGMENT_COLUMNS]
     
     logger.info(f"Saving {len(output_df)} segments to analysis_rfm_segments table...")
     output_df.to_sql('analysis_rfm_segments', engine, if_exists='replace', index=False)
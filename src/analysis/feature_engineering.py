@@ -1,113 +1,648 @@
+import argparse
+import hashlib
+import json
 import pandas as pd
 import numpy as np
 import logging
 import sqlalchemy
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+import sys
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import joblib
+from joblib import Parallel, delayed
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.decomposition import PCA, TruncatedSVD
+from sklearn.preprocessing import StandardScaler, normalize
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+
+# Add project root
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
 from src.config import Config
-from src.utils.db_utils import get_engine, insert_data
+from src.utils.db_utils import get_engine, insert_data, reload_table, upsert_data
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def main():
-    logger.info("Starting Feature Engineering...")
-    engine = get_engine()
-    
-    # 1. Load Data
-    logger.info("Loading data from DB...")
+METHODS = ('svd', 'pca') # svd: sparse-native (default) | pca: dense baseline, kept for comparison
+FEATURIZERS = ('tfidf', 'hashing') # tfidf: vocabulary fitted on the corpus | hashing: stateless, chunked in a process pool
+BENCHMARK_SIZES = [1000, 5000, 20000, 50000] # Catalogue sizes (products) for --benchmark
+
+FEATURES_TABLE = 'fact_product_features'
+# Fitted pipelines (vectorizer + reducer + scaler + centroids), one joblib per version, in Config.MODEL_DIR.
+# version = hash of the training data and fit parameters; manifest.json names the current one.
+# An artifact never changes once written: scoring moves a copy of the centroids, kept in <version>.state.joblib.
+MODEL_SUBDIR = 'product_features'
+KEEP_VERSIONS = 5 # Older artifacts are deleted after a fit
+DRIFT_MIN_PRODUCTS = 50 # Fewer scored products than this say nothing about drift
+
+SWEEP_TABLE = 'analysis_cluster_sweep' # One row per k per sweep run (--mode sweep)
+SWEEP_FEATURES_FILE = 'sweep_features.npy' # Scaled features shared by the sweep workers (memmap), in the artifact dir
+# Description embeddings (L2-normalised float32, one row per product_id in ascending order), in Config.MODEL_DIR.
+# Read them memory-mapped with load_embeddings() (src/analysis/similar_products.py)
+EMBEDDINGS_FILE = 'product_embeddings.npy'
+EMBEDDING_IDS_FILE = 'product_embedding_ids.npy'
+HASH_COLUMNS = ['desc_text', 'base_price', 'category_id'] # The product's own inputs (its z-score also depends on its category)
+EPOCHS = 3 # Passes of partial_fit over the catalogue on a full refit
+
+def load_products(engine):
     query = """
-    SELECT 
-        p.product_id, 
-        p.description_clean, 
-        p.category_id, 
+    SELECT
+        p.product_id,
+        p.description_clean,
+        p.category_id,
         p.base_price,
         c.category_name
     FROM dim_product p
     JOIN dim_category c ON p.category_id = c.category_id
     WHERE p.base_price IS NOT NULL
+    ORDER BY p.product_id
     """
-    df = pd.read_sql(query, engine)
-    
-    if df.empty:
-        logger.warning("No data found!")
-        return
+    return pd.read_sql(query, engine)
 
-    # 2. Price Normalization (Z-Score per Category)
-    logger.info("Computing Price Z-Scores...")
-    # Group by category and compute z-score
+def add_price_zscores(df):
+    """Price Z-Score per category (single-item / constant categories -> 0)."""
     df['price_mean'] = df.groupby('category_id')['base_price'].transform('mean')
     df['price_std'] = df.groupby('category_id')['base_price'].transform('std')
     df['price_zscore'] = (df['base_price'] - df['price_mean']) / df['price_std'].replace(0, 1)
-    
+
     # Fill NaN zscores (e.g. single item in category) with 0
     df['price_zscore'] = df['price_zscore'].fillna(0)
+    return df
+
+def feature_hashes(df):
+    """64-bit hash of each product's inputs (stored as BIGINT): a different hash = changed product."""
+    return pd.util.hash_pandas_object(df[HASH_COLUMNS], index=False).to_numpy().view(np.int64)
+
+def _hash_chunk(vectorizer, texts):
+    """Raw term counts of one chunk + its document frequencies (runs in a worker process)."""
+    counts = vectorizer.transform(texts)
+    return counts, np.bincount(counts.indices, minlength=counts.shape[1])
+
+class HashingTfidf:
+    """
+    TF-IDF without a vocabulary: terms are hashed into 2**bits columns, so any chunk can be
+    transformed on its own. fit_transform hashes the chunks in a process pool and sums their
+    document frequencies (the streamed IDF pass); the CSR chunks are stacked, never densified.
+    Only the hashed columns seen at fit time are kept (like TfidfVectorizer ignoring unknown
+    terms), so the reducer works on the real vocabulary width, not 2**bits.
+    Same weighting as TfidfVectorizer (smooth idf, l2-normalised rows).
+    """
+    def __init__(self, bits=None, n_jobs=-1, chunk_size=None):
+        self.vectorizer = HashingVectorizer(n_features=2 ** (bits or Config.FEATURE_HASH_BITS), alternate_sign=False,
+                                            norm=None, stop_words='english', dtype=np.float32)
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size or Config.FEATURE_CHUNK_SIZE
+        self.columns_ = None
+        self.idf_ = None
+
+    def _hash(self, texts):
+        texts = list(texts)
+        chunks = [texts[start:start + self.chunk_size] for start in range(0, len(texts), self.chunk_size)] or [[]]
+        if self.n_jobs != 1 and len(chunks) > 1:
+            results = Parallel(n_jobs=self.n_jobs)(delayed(_hash_chunk)(self.vectorizer, chunk) for chunk in chunks)
+        else:
+            results = [_hash_chunk(self.vectorizer, chunk) for chunk in chunks] # Small inputs: no pool start-up
+        counts = sparse.vstack([r[0] for r in results], format='csr')
+        return counts, sum(r[1] for r in results)
+
+    def _weight(self, counts):
+        counts = counts[:, self.columns_]
+        counts.data *= self.idf_[counts.indices]
+        return normalize(counts, norm='l2', copy=False)
+
+    def fit_transform(self, texts):
+        counts, doc_freq = self._hash(texts)
+        self.columns_ = np.flatnonzero(doc_freq)
+        self.idf_ = (np.log((1 + counts.shape[0]) / (1 + doc_freq[self.columns_])) + 1).astype(np.float32)
+        return self._weight(counts)
+
+    def transform(self, texts):
+        return self._weight(self._hash(texts)[0])
+
+def make_vectorizer(featurizer, max_features, n_jobs=-1, chunk_size=None):
+    if featurizer == 'hashing':
+        return HashingTfidf(n_jobs=n_jobs, chunk_size=chunk_size)
+    return TfidfVectorizer(max_features=max_features, stop_words='english', dtype=np.float32)
+
+def make_reducer(method, n_components, shape, random_state=42):
+    # Can't ask for more components than the matrix has (tiny catalogues / vocabularies)
+    n_components = max(min(n_components, shape[0] - 1, shape[1] - 1), 1)
+    if method == 'pca':
+        return PCA(n_components=n_components, random_state=random_state)
+    return TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=random_state)
+
+def text_embeddings(texts, max_features=None, n_components=None, method='svd', featurizer='tfidf', random_state=42):
+    """
+    TF-IDF of the descriptions reduced to n_components dimensions.
+    'svd' runs randomized TruncatedSVD on the CSR matrix itself, so memory follows the
+    non-zeros (a few dozen per description) instead of n_products x max_features.
+    'pca' densifies first (the old path); PCA also centers the columns, SVD doesn't -
+    on TF-IDF that is the usual LSA set-up and the clusters come out the same.
+    featurizer='hashing' hashes terms (HashingTfidf) instead of capping a fitted vocabulary (svd only).
+    Returns (embeddings, info) with the vocabulary size, non-zeros and kept variance.
+    """
+    max_features = max_features or Config.FEATURE_TFIDF_MAX_FEATURES
+    n_components = n_components or Config.FEATURE_EMBEDDING_DIM
+
+    tfidf = make_vectorizer(featurizer, max_features)
+    tfidf_matrix = tfidf.fit_transform(texts)
+    reducer = make_reducer(method, n_components, tfidf_matrix.shape, random_state)
+    features = reducer.fit_transform(tfidf_matrix.toarray() if method == 'pca' else tfidf_matrix)
+    info = {'terms': tfidf_matrix.shape[1], 'nnz': tfidf_matrix.nnz, 'explained_var': float(reducer.explained_variance_ratio_.sum())}
+    return features, info
+
+def synthetic_catalogue(texts, n, seed=0):
+    """
+    n descriptions resampled from the real ones, each with two extra variant tokens
+    (colour / fit codes) so the vocabulary keeps growing with the catalogue like a real one.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.asarray(texts, dtype=object)[rng.integers(0, len(texts), n)]
+    variants = rng.integers(0, max(n // 4, 1), size=(n, 2))
+    return [f"{text} var{a} var{b}" for text, (a, b) in zip(base, variants)]
+
+def benchmark(texts, sizes, max_features, n_components, dense_limit_mb=2048):
+    """
+    Time and peak traced memory of the sparse SVD vs dense PCA embedding at several catalogue sizes
+    (plus SVD on the hashing featurizer; its worker processes' memory isn't traced).
+    """
+    rows = []
+    for n in sizes:
+        corpus = synthetic_catalogue(texts, n)
+        for method, featurizer in [(method, 'tfidf') for method in METHODS] + [('svd', 'hashing')]:
+            if method == 'pca' and n * max_features * 4 / 1024 ** 2 > dense_limit_mb: # Upper bound: full vocabulary
+                logger.info(f"[{n:,}] pca skipped: dense matrix could reach {n * max_features * 4 / 1024 ** 2:,.0f} MB (> --dense-limit-mb)")
+                rows.append({'products': n, 'method': method, 'featurizer': featurizer})
+                continue
+            tracemalloc.start()
+            started = time.perf_counter()
+            _, info = text_embeddings(corpus, max_features, n_components, method=method, featurizer=featurizer)
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+            rows.append({'products': n, 'method': method, 'featurizer': featurizer, 'terms': info['terms'], 'seconds': round(seconds, 2), 'peak_mb': round(peak, 1),
+                         'dense_input_mb': round(n * info['terms'] * 4 / 1024 ** 2, 1), # float32 TF-IDF, densified
+                         'sparse_input_mb': round(info['nnz'] * 8 / 1024 ** 2, 1), # CSR data + indices
+                         'explained_var': round(info['explained_var'], 3)})
+            logger.info(f"[{n:,}] {method}/{featurizer}: {seconds:.2f}s, peak {peak:,.1f} MB")
+    return pd.DataFrame(rows)
+
+def iter_chunks(df, size):
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+def embed_chunk(model, chunk):
+    """Text embedding of a chunk of products (fitted vectorizer + reducer)."""
+    tfidf_matrix = model['tfidf'].transform(chunk['desc_text'])
+    if model['method'] == 'pca':
+        tfidf_matrix = tfidf_matrix.toarray()
+    return model['reducer'].transform(tfidf_matrix).astype(np.float32)
+
+def transform_chunk(model, chunk, scaled=True):
+    """Clustering features of a chunk of products: [price z-score, text embedding], standardised."""
+    features = np.hstack([chunk[['price_zscore']].to_numpy(np.float32), embed_chunk(model, chunk)])
+    return model['scaler'].transform(features) if scaled else features
+
+def fit_model(df, max_features, n_components, n_clusters, method='svd', featurizer='tfidf', n_jobs=-1,
+              chunk_size=None, epochs=EPOCHS, random_state=42):
+    """
+    Full refit. The vocabulary and reducer are fitted on the whole (sparse) TF-IDF matrix;
+    the scaler and the MiniBatchKMeans centroids then see the catalogue in chunks
+    (partial_fit), so the dense feature matrix never exists in full.
+    """
+    chunk_size = chunk_size or Config.FEATURE_CHUNK_SIZE
+    tfidf = make_vectorizer(featurizer, max_features, n_jobs, chunk_size)
+    tfidf_matrix = tfidf.fit_transform(df['desc_text'])
+    reducer = make_reducer(method, n_components, tfidf_matrix.shape, random_state)
+    reducer.fit(tfidf_matrix.toarray() if method == 'pca' else tfidf_matrix)
+    model = {'tfidf': tfidf, 'reducer': reducer, 'scaler': StandardScaler(), 'method': method, 'featurizer': featurizer,
+             'kmeans': MiniBatchKMeans(n_clusters=min(n_clusters, len(df)), random_state=random_state, n_init=3),
+             'fitted_at': datetime.now(), 'fitted_products': len(df), 'updated_products': 0}
+
+    # Scale everything together so the price isn't drowned by the text dimensions
+    for chunk in iter_chunks(df, chunk_size):
+        model['scaler'].partial_fit(transform_chunk(model, chunk, scaled=False))
+    rng = np.random.default_rng(random_state)
+    for _ in range(epochs): # epochs=0: transformers only (the sweep fits its own centroids)
+        shuffled = df.iloc[rng.permutation(len(df))] # Mini-batches shouldn't follow catalogue order
+        for chunk in iter_chunks(shuffled, chunk_size):
+            model['kmeans'].partial_fit(transform_chunk(model, chunk))
+    return model
+
+def assign_clusters(model, df, chunk_size=None, update=True):
+    """
+    Cluster ids for df, chunk by chunk, and each product's distance to its nearest centroid
+    (measured before the update, for drift). With update=True each chunk then moves the
+    centroids (partial_fit), so new products keep shaping the clusters between fits.
+    """
+    chunk_size = chunk_size or Config.FEATURE_CHUNK_SIZE
+    labels, distances = [], []
+    for chunk in iter_chunks(df, chunk_size):
+        X = transform_chunk(model, chunk)
+        distances.append(model['kmeans'].transform(X).min(axis=1))
+        if update and len(chunk) >= model['kmeans'].n_clusters:
+            model['kmeans'].partial_fit(X)
+        labels.append(model['kmeans'].predict(X))
+    if not labels:
+        return np.empty(0, dtype=np.int32), np.empty(0)
+    return np.concatenate(labels), np.concatenate(distances)
+
+def fit_params(args):
+    """Parameters that define a fitted pipeline (part of its version)."""
+    params = {'featurizer': args.featurizer, 'method': args.method, 'components': args.components, 'clusters': args.clusters}
+    if args.featurizer == 'hashing':
+        params['hash_bits'] = Config.FEATURE_HASH_BITS
+    else:
+        params['max_features'] = args.max_features
+    return params
+
+def training_version(df, params):
+    """Hash of the training data (product ids + input hashes) and parameters: same data, same artifact."""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode())
+    digest.update(df[['product_id', 'feature_hash']].sort_values('product_id').to_numpy(np.int64).tobytes())
+    return digest.hexdigest()[:12]
+
+def artifact_dir():
+    return os.path.join(Config.MODEL_DIR, MODEL_SUBDIR)
+
+def read_manifest():
+    path = os.path.join(artifact_dir(), 'manifest.json')
+    if not os.path.exists(path):
+        return {'current': None, 'versions': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _write_manifest(manifest):
+    path = os.path.join(artifact_dir(), 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def _dump(obj, path):
+    joblib.dump(obj, path + '.tmp')
+    os.replace(path + '.tmp', path) # A crash mid-dump never leaves a half-written file
+
+def model_paths(version):
+    """(fitted artifact, scoring state) of a version."""
+    return (os.path.join(artifact_dir(), f"{version}.joblib"),
+            os.path.join(artifact_dir(), f"{version}.state.joblib"))
+
+def load_model(version=None, scored=True):
+    """
+    The fitted pipeline of a version (default: the current one); None if there is none.
+    scored=True applies the version's scoring state (centroids moved since the fit, products scored).
+    """
+    version = version or read_manifest()['current']
+    path, state_path = model_paths(version) if version else (None, None)
+    if not (path and os.path.exists(path)):
+        return None
+    model = joblib.load(path)
+    if scored and os.path.exists(state_path):
+        model.update(joblib.load(state_path))
+    return model
+
+def save_model(model):
+    """
+    Make a fitted version current, with a fresh scoring state. The artifact is only written when
+    the version is new: it stays what was fitted on that data. Keeps the KEEP_VERSIONS newest.
+    """
+    os.makedirs(artifact_dir(), exist_ok=True)
+    path, state_path = model_paths(model['version'])
+    if not os.path.exists(path):
+        _dump(model, path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    manifest = read_manifest()
+    manifest['current'] = model['version']
+    manifest['versions'][model['version']] = {
+        'fitted_at': model['fitted_at'].isoformat(timespec='seconds'), 'products': model['fitted_products'],
+        'updated_products': 0, 'mean_distance': model['mean_distance'], 'params': model['params']
+    }
+    for version in sorted(manifest['versions'], key=lambda v: manifest['versions'][v]['fitted_at'], reverse=True)[KEEP_VERSIONS:]:
+        if version != model['version']:
+            manifest['versions'].pop(version)
+            for old in model_paths(version):
+                if os.path.exists(old):
+                    os.remove(old)
+    _write_manifest(manifest)
+    return path
+
+def save_state(model):
+    """Scoring state of a version: the centroids partial_fit moved and the products scored since the fit."""
+    _dump({'kmeans': model['kmeans'], 'updated_products': model['updated_products'], 'scored_at': datetime.now()},
+          model_paths(model['version'])[1])
+    manifest = read_manifest()
+    if model['version'] in manifest['versions']:
+        manifest['versions'][model['version']]['updated_products'] = model['updated_products']
+        _write_manifest(manifest)
+
+def embedding_paths():
+    return os.path.join(Config.MODEL_DIR, EMBEDDINGS_FILE), os.path.join(Config.MODEL_DIR, EMBEDDING_IDS_FILE)
+
+def load_embeddings():
+    """(product_ids, embeddings): ids sorted ascending, embeddings a read-only float32 memmap (None, None if not built)."""
+    emb_path, ids_path = embedding_paths()
+    if not (os.path.exists(emb_path) and os.path.exists(ids_path)):
+        return None, None
+    return np.load(ids_path), np.load(emb_path, mmap_mode='r')
+
+def write_embeddings(model, df, changed_ids=None, chunk_size=None):
+    """
+    Rewrite the embedding file for the products in df, row i = i-th smallest product_id.
+    Rows of products not in changed_ids are copied from the previous file (None = embed everything),
+    so an incremental run only transforms the new / changed descriptions.
+    Rows are L2-normalised: cosine similarity is then a plain dot product.
+    """
+    chunk_size = chunk_size or Config.FEATURE_CHUNK_SIZE
+    emb_path, ids_path = embedding_paths()
+    df = df.sort_values('product_id')
+    ids = df['product_id'].to_numpy(np.int64)
+    dims = model['reducer'].n_components
+    old_ids, old = load_embeddings() if changed_ids is not None else (None, None)
+    if old is not None and old.shape[1] != dims:
+        old_ids, old = None, None
+
+    reuse = np.zeros(len(ids), dtype=bool)
+    if old_ids is not None:
+        reuse = np.isin(ids, old_ids) & ~np.isin(ids, changed_ids)
+
+    os.makedirs(Config.MODEL_DIR, exist_ok=True)
+    out = np.lib.format.open_memmap(emb_path + '.tmp', mode='w+', dtype=np.float32, shape=(len(ids), dims))
+    reused = np.flatnonzero(reuse)
+    for start in range(0, len(reused), chunk_size):
+        rows = reused[start:start + chunk_size]
+        out[rows] = old[np.searchsorted(old_ids, ids[rows])]
+    fresh = np.flatnonzero(~reuse)
+    for start in range(0, len(fresh), chunk_size):
+        rows = fresh[start:start + chunk_size]
+        vectors = embed_chunk(model, df.iloc[rows])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        out[rows] = vectors / np.where(norms > 0, norms, 1) # Empty descriptions stay all-zero
+    out.flush()
+    del out, old # Release the maps before swapping the files
+    np.save(ids_path + '.tmp.npy', ids)
+    os.replace(ids_path + '.tmp.npy', ids_path)
+    os.replace(emb_path + '.tmp', emb_path)
+    return len(fresh)
+
+def stratified_sample(df, size, by='category_id', seed=42):
+    """Positions of about `size` rows, every category in proportion to its size (at least one row each)."""
+    if len(df) <= size:
+        return np.arange(len(df))
+    rng = np.random.default_rng(seed)
+    groups = df[by].to_numpy()
+    rank = pd.Series(rng.random(len(df))).groupby(groups).rank(method='first').to_numpy()
+    quota = np.ceil(pd.Series(groups).map(pd.Series(groups).value_counts()).to_numpy() * size / len(df))
+    return np.flatnonzero(rank <= quota)
+
+def write_feature_matrix(model, df, path, chunk_size=None):
+    """Scaled clustering features of every product into a float32 .npy the sweep workers memory-map."""
+    chunk_size = chunk_size or Config.FEATURE_CHUNK_SIZE
+    first = transform_chunk(model, df.iloc[:1])
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(len(df), first.shape[1]))
+    for start in range(0, len(df), chunk_size):
+        out[start:start + chunk_size] = transform_chunk(model, df.iloc[start:start + chunk_size])
+    out.flush()
+
+def evaluate_k(path, sample, k, chunk_size, epochs=EPOCHS, random_state=42):
+    """
+    Fit k clusters on the memory-mapped features (partial_fit over shuffled chunks, as in a fit)
+    and score them on the sample: silhouette is O(sample^2), not O(products^2).
+    Runs in a worker process; only the path and the sample positions are sent to it.
+    """
+    started = time.perf_counter()
+    X = np.load(path, mmap_mode='r')
+    kmeans = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3)
+    rng = np.random.default_rng(random_state)
+    for _ in range(epochs):
+        order = rng.permutation(len(X))
+        for start in range(0, len(X), chunk_size):
+            kmeans.partial_fit(X[np.sort(order[start:start + chunk_size])])
+    sample_X = np.asarray(X[sample])
+    labels = kmeans.predict(sample_X)
+    separated = len(np.unique(labels)) > 1
+    return {
+        'k': k,
+        'silhouette': float(silhouette_score(sample_X, labels)) if separated else np.nan,
+        'davies_bouldin': float(davies_bouldin_score(sample_X, labels)) if separated else np.nan,
+        'inertia': float(-kmeans.score(sample_X) / len(sample_X)), # Mean squared distance to the centroid
+        'seconds': round(time.perf_counter() - started, 2)
+    }
+
+def run_sweep(df, model, args, engine):
+    """
+    Evaluate k_min..k_max concurrently (joblib processes over one shared feature memmap),
+    score each on a category-stratified sample and append the results to analysis_cluster_sweep.
+    Chosen k = best silhouette (ties: lower Davies-Bouldin).
+    """
+    sample = stratified_sample(df, args.sample)
+    ks = [k for k in range(max(args.k_min, 2), args.k_max + 1) if k < len(sample)] # Silhouette needs 2 <= k < samples
+    if not ks:
+        logger.warning(f"Sweep: no cluster count to evaluate (k = {args.k_min}..{args.k_max}, sample of {len(sample):,} products).")
+        return
+    if model is None or {**model['params'], 'clusters': args.clusters} != fit_params(args):
+        logger.info("Sweep: fitting the feature transformers (no current model with these parameters)...")
+        model = fit_model(df, args.max_features, args.components, args.clusters, method=args.method, featurizer=args.featurizer,
+                          n_jobs=args.n_jobs, chunk_size=args.chunk_size, epochs=0)
+    os.makedirs(artifact_dir(), exist_ok=True)
+    path = os.path.join(artifact_dir(), SWEEP_FEATURES_FILE)
+    write_feature_matrix(model, df, path, args.chunk_size)
+    logger.info(f"Sweep: k = {ks[0]}..{ks[-1]} on {len(df):,} products, scored on a stratified sample of {len(sample):,}...")
+
+    try:
+        results = Parallel(n_jobs=args.n_jobs)(delayed(evaluate_k)(path, sample, k, args.chunk_size) for k in ks)
+    finally:
+        os.remove(path)
+    sweep = pd.DataFrame(results)
+    best = sweep.sort_values(['silhouette', 'davies_bouldin'], ascending=[False, True]).iloc[0]['k']
+    sweep['chosen'] = sweep['k'] == best
+    sweep['products'] = len(df)
+    sweep['sample_size'] = len(sample)
+    sweep['run_at'] = pd.Timestamp.now()
+    insert_data(sweep, SWEEP_TABLE, engine, if_exists='append')
+    logger.info(f"Cluster sweep:\n{sweep[['k', 'silhouette', 'davies_bouldin', 'inertia', 'seconds', 'chosen']].to_string(index=False)}")
+    logger.info(f"Chosen k = {int(best)}. Apply with: --mode fit --clusters {int(best)} (or FEATURE_CLUSTERS={int(best)}).")
+
+def fit_reason(model, args):
+    """Why this run can't just score with the current model (None = score)."""
+    if model is None:
+        return "no fitted model"
+    if model['params'] != fit_params(args):
+        return "fit parameters changed"
+    if Config.FEATURE_REFIT_DAYS and datetime.now() - model['fitted_at'] > timedelta(days=Config.FEATURE_REFIT_DAYS):
+        return f"model older than {Config.FEATURE_REFIT_DAYS} days (FEATURE_REFIT_DAYS)"
+    return None
+
+def drift_reason(model, distances):
+    """
+    Whether the products scored since the fit warrant a new fit: too many of them relative to
+    the training catalogue, or this run's products sit much further from their centroids
+    than the training products did.
+    """
+    if model['updated_products'] > Config.FEATURE_DRIFT_NEW_SHARE * model['fitted_products']:
+        return f"{model['updated_products']:,} products scored since the fit (> {Config.FEATURE_DRIFT_NEW_SHARE:.0%} of {model['fitted_products']:,})"
+    if len(distances) >= DRIFT_MIN_PRODUCTS and distances.mean() > Config.FEATURE_DRIFT_DISTANCE * model['mean_distance']:
+        return f"new products are {distances.mean() / model['mean_distance']:.1f}x further from their centroids than at fit time"
+    return None
+
+def ensure_features_table(engine):
+    """fact_product_features as in schema.sql; older tables (to_sql replace) get the new columns and key."""
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(f"""
+            CREATE TABLE IF NOT EXISTS {FEATURES_TABLE} (
+                product_id INT PRIMARY KEY REFERENCES dim_product(product_id),
+                price_zscore FLOAT, cluster_id INT, feature_hash BIGINT, updated_at TIMESTAMP
+            )
+        """))
+        conn.execute(sqlalchemy.text(f"ALTER TABLE {FEATURES_TABLE} ADD COLUMN IF NOT EXISTS feature_hash BIGINT"))
+        conn.execute(sqlalchemy.text(f"ALTER TABLE {FEATURES_TABLE} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP"))
+        has_key = conn.execute(sqlalchemy.text(
+            "SELECT EXISTS (SELECT 1 FROM pg_index WHERE indrelid = to_regclass(:t) AND indisprimary)"), {'t': FEATURES_TABLE}).scalar()
+        if not has_key:
+            conn.execute(sqlalchemy.text(f"ALTER TABLE {FEATURES_TABLE} ADD PRIMARY KEY (product_id)"))
+
+def run_fit(df, args, engine, reason):
+    """Fit (or reuse the artifact already fitted on exactly this data), assign every product, rewrite the table."""
+    params = fit_params(args)
+    version = training_version(df, params)
+    model = load_model(version, scored=False) # As fitted: its scoring state starts over
+    if model is not None:
+        logger.info(f"Fit ({reason}): artifact {version} was already fitted on this data, reusing it.")
+    else:
+        # TF-IDF + SVD / PCA on every product, centroids streamed through partial_fit
+        terms = f"hashed 2^{Config.FEATURE_HASH_BITS} columns" if args.featurizer == 'hashing' else f"{args.max_features} terms"
+        logger.info(f"Fit ({reason}): TF-IDF {terms} -> {args.method} {args.components} dims, {args.clusters} clusters...")
+        model = fit_model(df, args.max_features, args.components, args.clusters, method=args.method, featurizer=args.featurizer,
+                          n_jobs=args.n_jobs, chunk_size=args.chunk_size)
+        model.update(version=version, params=params)
+        logger.info(f"Embedding keeps {model['reducer'].explained_variance_ratio_.sum():.1%} of the TF-IDF variance.")
+
+    # Assign every product with the final centroids; their mean distance is the drift baseline
+    labels, distances = assign_clusters(model, df, args.chunk_size, update=False)
+    df = df.assign(cluster_id=labels)
+    model.setdefault('mean_distance', float(distances.mean())) # Set once, at fit time
+    model['updated_products'] = 0
+
+    logger.info(f"Saving features to {FEATURES_TABLE}...")
+    output_df = df[['product_id', 'price_zscore', 'cluster_id', 'feature_hash']].assign(updated_at=datetime.now())
+    reload_table(output_df, FEATURES_TABLE, engine) # Truncate + COPY, keeps the key
+    path = save_model(model)
+    embedded = write_embeddings(model, df, None, args.chunk_size)
+    logger.info(f"Fit complete: {len(output_df):,} products, {embedded:,} embeddings; model {version} in {path}.")
+
+def run_score(df, model, args, engine):
+    """
+    Score only the products missing from the table or whose inputs changed, plus those whose
+    price z-score moved because their category gained or lost products (same product, new
+    feature: re-clustered, but they don't move the centroids or count towards drift).
+    Returns the drift reason, if any.
+    """
+    stored = pd.read_sql(f"SELECT product_id, price_zscore, feature_hash FROM {FEATURES_TABLE}", engine)
+    merged = df[['product_id', 'price_zscore', 'feature_hash']].merge(stored, on='product_id', how='left', suffixes=('', '_stored'))
+    changed = (merged['feature_hash'] != merged['feature_hash_stored']).to_numpy()
+    restated = ~changed & ~np.isclose(merged['price_zscore'], merged['price_zscore_stored'], rtol=1e-9, atol=1e-12)
+    todo, restate = df[changed].copy(), df[restated].copy()
+    gone = np.setdiff1d(stored['product_id'].to_numpy(), df['product_id'].to_numpy())
+    logger.info(f"Score with model {model['version']} (fitted {model['fitted_at']:%Y-%m-%d %H:%M}): "
+                f"{len(todo):,} new/changed of {len(df):,} products, {len(restate):,} with a new price z-score, {len(gone):,} removed.")
+    if len(gone):
+        with engine.begin() as conn:
+            conn.execute(sqlalchemy.text(f"DELETE FROM {FEATURES_TABLE} WHERE product_id = ANY(:ids)"), {'ids': gone.tolist()})
+
+    # New products move the centroids (partial_fit) and get their cluster
+    todo['cluster_id'], distances = assign_clusters(model, todo, args.chunk_size)
+    restate['cluster_id'], _ = assign_clusters(model, restate, args.chunk_size, update=False)
+    model['updated_products'] += len(todo)
+    output_df = pd.concat([todo, restate])[['product_id', 'price_zscore', 'cluster_id', 'feature_hash']].assign(updated_at=datetime.now())
+    upsert_data(output_df, FEATURES_TABLE, engine, ['product_id'])
+    save_state(model)
+
+    # Persist the description embeddings (memory-mapped; read by similar_products.py)
+    embedded = write_embeddings(model, df, todo['product_id'].to_numpy(), args.chunk_size)
+    logger.info(f"Score complete: {len(output_df):,} rows upserted, {embedded:,} embedded, {len(df) - embedded:,} embeddings reused.")
+    return drift_reason(model, distances)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Product features: price z-scores, description embeddings and clusters (fact_product_features).")
+    parser.add_argument('--mode', choices=['auto', 'fit', 'score', 'sweep'], default='auto',
+                        help="fit: fit on every product | score: only new/changed products with the current model | auto: score, fit when needed (drift) "
+                             "| sweep: evaluate a range of cluster counts (nothing else is written).")
+    parser.add_argument('--max-features', type=int, default=Config.FEATURE_TFIDF_MAX_FEATURES, help="TF-IDF vocabulary size (fit).")
+    parser.add_argument('--components', type=int, default=Config.FEATURE_EMBEDDING_DIM, help="Embedding dimensions (fit).")
+    parser.add_argument('--method', choices=METHODS, default='svd', help="svd: sparse TruncatedSVD | pca: densify + PCA.")
+    parser.add_argument('--featurizer', choices=FEATURIZERS, default=Config.FEATURE_FEATURIZER, help="tfidf: fitted vocabulary | hashing: stateless, parallel chunks.")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Worker processes for the hashing featurizer and the sweep (-1 = all cores).")
+    parser.add_argument('--clusters', type=int, default=Config.FEATURE_CLUSTERS, help="Number of product clusters.")
+    parser.add_argument('--k-min', type=int, default=2, help="Smallest cluster count of --mode sweep.")
+    parser.add_argument('--k-max', type=int, default=12, help="Largest cluster count of --mode sweep.")
+    parser.add_argument('--sample', type=int, default=Config.FEATURE_SWEEP_SAMPLE, help="Products (stratified by category) scored per k in --mode sweep.")
+    parser.add_argument('--chunk-size', type=int, default=Config.FEATURE_CHUNK_SIZE, help="Products per partial_fit / predict chunk.")
+    parser.add_argument('--benchmark', action='store_true', help="Compare svd vs pca time/memory on resampled catalogues; nothing is written.")
+    parser.add_argument('--sizes', default=','.join(map(str, BENCHMARK_SIZES)), help="Catalogue sizes for --benchmark (comma-separated).")
+    parser.add_argument('--dense-limit-mb', type=int, default=2048, help="Skip the pca benchmark above this dense matrix size.")
+    args = parser.parse_args(argv)
+    if args.featurizer == 'hashing' and args.method == 'pca':
+        parser.error("--featurizer hashing needs --method svd (it keeps the whole, uncapped vocabulary; too wide to densify)")
+    if args.mode == 'sweep' and args.k_max < max(args.k_min, 2):
+        parser.error(f"--k-max ({args.k_max}) must be >= --k-min ({args.k_min}) and >= 2")
+
+    logger.info("Starting Feature Engineering...")
+    engine = get_engine()
+
+    # 1. Load Data
+    logger.info("Loading data from DB...")
+    df = load_products(engine)
+
+    if df.empty:
+        logger.warning("No data found!")
+        return
 
-    # 3. Text Features (TF-IDF + PCA)
-    logger.info("Generating Text Embeddings (TF-IDF + PCA)...")
-    
-    # TF-IDF
-    tfidf = TfidfVectorizer(max_features=500, stop_words='english')
     # Filter out empty descriptions
     df['desc_text'] = df['description_clean'].fillna('')
-    tfidf_matrix = tfidf.fit_transform(df['desc_text'])
-    
-    # PCA to reduce to 50 dimensions
-    pca = PCA(n_components=50)
-    pca_features = pca.fit_transform(tfidf_matrix.toarray())
-    
-    # Add PCA features to DF (as a list or individual columns? Let's use individual for DB or JSON?)
-    # For DB simplicity, let's just store the cluster_id and maybe top few components if visualization needed.
-    # User asked for "embeddings placeholder". 
-    # Let's store the full array as a JSON/Array type if Postgres supports it, or just use it for clustering now.
-    # Postgres has ARRAY type.
-    
-    # 4. Clustering (K-Means)
-    logger.info("Clustering Products...")
-    # Combine Price Z-Score and PCA features for clustering
-    # Reshape price_zscore to (n_samples, 1)
-    price_feature = df[['price_zscore']].values
-    
-    # Combine: Scale PCA features to match price scale? 
-    # PCA features are already somewhat centered, but let's scale everything together.
-    scaler = StandardScaler()
-    combined_features = np.hstack([price_feature, pca_features])
-    combined_features_scaled = scaler.fit_transform(combined_features)
-    
-    kmeans = KMeans(n_clusters=5, random_state=42, n_init=10)
-    df['cluster_id'] = kmeans.fit_predict(combined_features_scaled)
-    
-    # 5. Save to Database
-    logger.info("Saving features to fact_product_features...")
-    
-    # Prepare output table
-    # Columns: product_id, price_zscore, cluster_id, embedding_vector (optional)
-    
-    # Create the table if not exists (using SQLAlchemy DDL or just to_sql with create)
-    # Let's define it explicitly via SQL execution for better control, or rely on to_sql
-    
-    output_df = df[['product_id', 'price_zscore', 'cluster_id']].copy()
-    
-    # We can add embedding as a column (Postgres ARRAY)
-    # output_df['embedding_vector'] = list(pca_features) 
-    # Pandas -> SQL Array support varies. Let's skip vector storage for now to avoid complexity unless requested.
-    # The requirement said "embeddings placeholder". Cluster ID is a good proxy for similarity groups.
-    
-    # To SQL
-    output_df.to_sql('fact_product_features', engine, if_exists='replace', index=False)
-    
-    # Set PK for good measure (optional)
-    with engine.connect() as conn:
-        try:
-            conn.execute(sqlalchemy.text("ALTER TABLE fact_product_features ADD PRIMARY KEY (product_id)"))
-            conn.commit()
-        except:
-            pass # PK might fail if duplicates or replace logic varies, strictly optional
-            
-    logger.info(f"Feature engineering complete. {len(output_df)} rows saved.")
+
+    if args.benchmark:
+        sizes = [int(s) for s in args.sizes.split(',')]
+        result = benchmark(df['desc_text'].tolist(), sizes, args.max_features, args.components, args.dense_limit_mb)
+        logger.info(f"Embedding benchmark (max_features={args.max_features}, components={args.components}):\n{result.to_string(index=False)}")
+        return
+
+    # 2. Price Normalization (Z-Score per Category)
+    logger.info("Computing Price Z-Scores...")
+    df = add_price_zscores(df)
+    df['feature_hash'] = feature_hashes(df)
+
+    ensure_features_table(engine)
+    model = load_model()
+
+    # 3. Fit and / or score
+    if args.mode == 'sweep':
+        run_sweep(df, model, args, engine)
+        return
+    if args.mode == 'fit':
+        run_fit(df, args, engine, "--mode fit")
+        return
+    reason = fit_reason(model, args)
+    if reason and args.mode == 'score':
+        logger.error(f"Can't score: {reason}. Run with --mode fit first.")
+        return
+    if reason:
+        run_fit(df, args, engine, reason)
+        return
+    drift = run_score(df, model, args, engine)
+    if drift and args.mode == 'auto':
+        run_fit(df, args, engine, f"drift: {drift}")
+    elif drift:
+        logger.warning(f"Drift: {drift}. Consider --mode fit.")
 
 if __name__ == "__main__":
     main()
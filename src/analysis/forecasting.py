@@ -0,0 +1,267 @@
+import argparse
+import pandas as pd
+import numpy as np
+import logging
+import sqlalchemy
+import sys
+import os
+import time
+from itertools import product
+from joblib import Parallel, delayed
+
+# Add project root
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.etl.refresh_rollups import rollups_current
+from src.utils.db_utils import get_engine, insert_data
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FORECAST_TABLE = 'analysis_forecast'
+HORIZON = 28 # Days ahead
+SEASON = 7 # Weekly seasonality
+MIN_HISTORY = 2 * SEASON # Days needed to initialise level, trend and seasonal states
+PHI = 0.98 # Trend damping
+BACKTEST_FOLDS = 3 # Rolling origins, each HORIZON days apart
+SERIES_BLOCK = 256 # Series per grid-search pass (keeps the (params x series) state in CPU cache)
+
+# Smoothing parameter grid, evaluated for every series in one pass (ETS error-correction form:
+# beta <= alpha, gamma <= 1 - alpha keep the models stable)
+ALPHAS = [0.05, 0.1, 0.2, 0.3, 0.5]
+BETAS = [0.0, 0.01, 0.05, 0.1]
+GAMMAS = [0.05, 0.1, 0.2, 0.3]
+PARAM_GRID = np.array([(a, b, g) for a, b, g in product(ALPHAS, BETAS, GAMMAS) if b <= a and g <= 1 - a])
+
+Z_80, Z_95 = 1.2816, 1.9600
+
+def load_daily_revenue(engine):
+    """
+    Revenue per (store, category, day). Reads the agg_sales_daily rollup while it still
+    matches fact_sales (refresh_rollups stamp), else the line items.
+    """
+    if rollups_current(lambda sql, params: pd.read_sql(sqlalchemy.text(sql), engine, params=params or {})):
+        query = """
+        SELECT sales_date AS date, store_id, category_id, SUM(revenue) AS revenue
+        FROM agg_sales_daily GROUP BY 1, 2, 3
+        """
+    else:
+        query = """
+        SELECT CAST(s.date AS DATE) AS date, s.store_id, p.category_id, SUM(s.total_amount) AS revenue
+        FROM fact_sales s JOIN dim_product p ON s.product_id = p.product_id
+        GROUP BY 1, 2, 3
+        """
+    df = pd.read_sql(query, engine)
+    df['date'] = pd.to_datetime(df['date'])
+    df['revenue'] = df['revenue'].astype(float)
+    return df
+
+def build_series(df):
+    """
+    Dense series x day matrix: every store x category plus the store, category and total
+    aggregates (so the dashboard has a series for any sidebar selection).
+
+    Returns:
+        (Y, keys, dates): Y is float64 (n_series, n_days), zero-filled; keys has
+        level / store_id / category_id per row.
+    """
+    df = df.dropna(subset=['store_id', 'category_id'])
+    dates = pd.date_range(df['date'].min(), df['date'].max(), freq='D')
+    bottom = df.pivot_table(index=['store_id', 'category_id'], columns='date', values='revenue', aggfunc='sum')
+    bottom = bottom.reindex(columns=dates, fill_value=0).fillna(0)
+
+    stores = bottom.groupby(level='store_id').sum()
+    categories = bottom.groupby(level='category_id').sum()
+    total = bottom.sum(axis=0).to_frame().T
+
+    keys = pd.concat([
+        pd.DataFrame({'level': 'total', 'store_id': [np.nan], 'category_id': [np.nan]}),
+        pd.DataFrame({'level': 'store', 'store_id': stores.index.values, 'category_id': np.nan}),
+        pd.DataFrame({'level': 'category', 'store_id': np.nan, 'category_id': categories.index.values}),
+        pd.DataFrame({'level': 'store_category', 'store_id': bottom.index.get_level_values(0), 'category_id': bottom.index.get_level_values(1)})
+    ], ignore_index=True)
+    Y = np.vstack([total.values, stores.values, categories.values, bottom.values]).astype(np.float64)
+    return Y, keys, dates
+
+def holt_winters(Y, alpha, beta, gamma, season=SEASON, phi=PHI):
+    """
+    Additive damped Holt-Winters (ETS A,Ad,A) run over many series and parameter sets at once.
+    The only Python loop is over time; each step updates every (parameter set, series) together,
+    in place on preallocated buffers.
+
+    Args:
+        Y: (n_series, T) history.
+        alpha, beta, gamma: (G, 1) or (G, n_series) smoothing parameters.
+    Returns:
+        (level, trend, seasonal, sse, n): final states (G, S), (G, S), (season, G, S), summed squared
+        one-step errors after the first season, and the number of errors in it.
+    """
+    n_series, T = Y.shape
+    Yt = np.ascontiguousarray(Y.T) # Day t is a contiguous row
+    first = Y[:, :season].mean(axis=1)
+    second = Y[:, season:2 * season].mean(axis=1) if T >= 2 * season else first
+    shape = np.broadcast_shapes(np.shape(alpha), (1, n_series))
+
+    level = np.broadcast_to(first, shape).copy()
+    trend = np.broadcast_to((second - first) / season, shape).copy()
+    # Season slot k is a contiguous (G, S) block
+    seasonal = np.broadcast_to((Y[:, :season] - first[:, None]).T[:, None, :], (season,) + shape).copy()
+    sse = np.zeros(shape)
+    damped, err, tmp = np.empty(shape), np.empty(shape), np.empty(shape)
+
+    for t in range(T):
+        s = seasonal[t % season]
+        np.multiply(trend, phi, out=damped)
+        level += damped # l + phi * b
+        np.subtract(Yt[t], level, out=err)
+        err -= s # y - (l + phi * b + s)
+        if t >= season:
+            np.multiply(err, err, out=tmp)
+            sse += tmp
+        np.multiply(alpha, err, out=tmp)
+        level += tmp
+        np.multiply(beta, err, out=tmp)
+        np.add(damped, tmp, out=trend)
+        np.multiply(gamma, err, out=tmp)
+        s += tmp
+    return level, trend, seasonal, sse, max(T - season, 1)
+
+def fit_forecast(Y, horizon=HORIZON, season=SEASON, phi=PHI, grid=PARAM_GRID):
+    """
+    Grid-search (alpha, beta, gamma) per series by in-sample one-step SSE, then forecast.
+
+    Returns:
+        dict with forecast (S, H), sigma_h (S, H) forecast standard errors and params (S, 3).
+    """
+    n_series, T = Y.shape
+    if T < 2 * season:
+        raise ValueError(f"Holt-Winters needs at least {2 * season} days of history, got {T}.")
+    alpha, beta, gamma = (grid[:, i:i + 1] for i in range(3))
+    best = np.empty(n_series, dtype=np.int64)
+    for start in range(0, n_series, SERIES_BLOCK):
+        block = slice(start, start + SERIES_BLOCK)
+        sse = holt_winters(Y[block], alpha, beta, gamma, season, phi)[3]
+        best[block] = sse.argmin(axis=0)
+    params = grid[best]
+
+    # Re-run once with each series' own parameters to get its final states
+    a, b, g = (params[:, i][None, :] for i in range(3))
+    level, trend, seasonal, sse, n = holt_winters(Y, a, b, g, season, phi)
+    level, trend, seasonal, sigma = level[0], trend[0], seasonal[:, 0].T, np.sqrt(sse[0] / n)
+
+    h = np.arange(1, horizon + 1)
+    damp = np.cumsum(phi ** h) # sum_{i=1..h} phi^i
+    season_idx = (T + h - 1) % season
+    forecast = level[:, None] + damp[None, :] * trend[:, None] + seasonal[:, season_idx]
+
+    # ETS(A,Ad,A) forecast variance: sigma^2 * (1 + sum_{j<h} c_j^2),
+    # c_j = alpha + beta * phi * (1 - phi^j) / (1 - phi) + gamma * [j % season == 0]
+    j = np.arange(1, horizon)
+    c = (params[:, 0:1] + params[:, 1:2] * phi * (1 - phi ** j) / (1 - phi)
+         + params[:, 2:3] * (j % season == 0))
+    var_factor = 1 + np.concatenate([np.zeros((n_series, 1)), np.cumsum(c ** 2, axis=1)], axis=1)
+    return {'forecast': forecast, 'sigma_h': sigma[:, None] * np.sqrt(var_factor), 'params': params}
+
+def _backtest_fold(Y, origin, horizon, season):
+    """Fit on Y[:, :origin], score the next `horizon` days. Also scores a seasonal-naive baseline."""
+    actual = Y[:, origin:origin + horizon]
+    forecast = np.clip(fit_forecast(Y[:, :origin], horizon, season)['forecast'], 0, None)
+    naive = np.tile(Y[:, origin - season:origin], int(np.ceil(horizon / season)))[:, :horizon]
+    return np.abs(actual - forecast).sum(axis=1), np.abs(actual - naive).sum(axis=1), np.abs(actual).sum(axis=1)
+
+def backtest(Y, horizon=HORIZON, folds=BACKTEST_FOLDS, season=SEASON, n_jobs=-1):
+    """
+    Rolling-origin backtest, folds run in parallel (joblib processes).
+
+    Returns:
+        DataFrame per series: backtest_mae, backtest_wape, baseline_mae (seasonal naive).
+    """
+    T = Y.shape[1]
+    origins = [T - k * horizon for k in range(folds, 0, -1) if T - k * horizon >= 3 * season]
+    if not origins:
+        logger.warning("History too short for a backtest.")
+        return pd.DataFrame(index=range(Y.shape[0]), columns=['backtest_mae', 'backtest_wape', 'baseline_mae'], dtype=float)
+
+    results = Parallel(n_jobs=min(n_jobs if n_jobs > 0 else len(origins), len(origins)))(
+        delayed(_backtest_fold)(Y, origin, horizon, season) for origin in origins
+    )
+    abs_err, naive_err, abs_actual = (np.sum(parts, axis=0) for parts in zip(*results))
+    n_points = len(origins) * horizon
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wape = np.where(abs_actual > 0, abs_err / abs_actual, np.nan)
+    return pd.DataFrame({
+        'backtest_mae': abs_err / n_points,
+        'backtest_wape': wape,
+        'baseline_mae': naive_err / n_points
+    })
+
+def run_forecast(engine, horizon=HORIZON, folds=BACKTEST_FOLDS, n_jobs=-1):
+    """Full pipeline: load -> series matrix -> fit/forecast -> backtest -> rows for analysis_forecast."""
+    df = load_daily_revenue(engine)
+    if df.empty:
+        logger.warning("No sales data found. Cannot forecast.")
+        return pd.DataFrame()
+
+    Y, keys, dates = build_series(df)
+    if Y.shape[1] < MIN_HISTORY:
+        logger.warning(f"Only {Y.shape[1]} days of sales history; at least {MIN_HISTORY} are needed to forecast.")
+        return pd.DataFrame()
+    logger.info(f"{Y.shape[0]:,} series x {Y.shape[1]} days ({len(PARAM_GRID)} parameter sets each).")
+
+    start = time.perf_counter()
+    fit = fit_forecast(Y, horizon)
+    logger.info(f"Fitted + forecast in {time.perf_counter() - start:.2f}s.")
+
+    start = time.perf_counter()
+    scores = backtest(Y, horizon, folds, n_jobs=n_jobs) if folds else pd.DataFrame(index=range(len(Y)))
+    logger.info(f"Backtest ({folds} folds) in {time.perf_counter() - start:.2f}s.")
+    if 'backtest_mae' in scores and scores['backtest_mae'].notna().any():
+        total = scores.iloc[0]
+        logger.info(f"Total revenue: backtest MAE {total['backtest_mae']:,.2f} vs seasonal naive {total['baseline_mae']:,.2f} (WAPE {total['backtest_wape']:.1%}).")
+
+    # Long format: one row per series x forecast day
+    n_series = len(keys)
+    forecast, sigma = fit['forecast'], fit['sigma_h']
+    out = keys.loc[np.repeat(np.arange(n_series), horizon)].reset_index(drop=True)
+    out['forecast_date'] = np.tile(pd.date_range(dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D'), n_series)
+    out['horizon'] = np.tile(np.arange(1, horizon + 1), n_series)
+    out['forecast'] = np.clip(forecast, 0, None).ravel()
+    for z, name in ((Z_80, '80'), (Z_95, '95')):
+        out[f'lower_{name}'] = np.clip(forecast - z * sigma, 0, None).ravel()
+        out[f'upper_{name}'] = np.clip(forecast + z * sigma, 0, None).ravel()
+    for i, name in enumerate(['alpha', 'beta', 'gamma']):
+        out[name] = np.repeat(fit['params'][:, i], horizon)
+    for col in scores.columns:
+        out[col] = np.repeat(scores[col].values, horizon)
+
+    stores = pd.read_sql("SELECT store_id, store_name FROM dim_store", engine).set_index('store_id')['store_name']
+    categories = pd.read_sql("SELECT category_id, category_name FROM dim_category", engine).set_index('category_id')['category_name']
+    out.insert(2, 'store_name', out['store_id'].map(stores).fillna('All'))
+    out.insert(4, 'category_name', out['category_id'].map(categories).fillna('All'))
+    out['history_end'] = dates[-1]
+    out['created_at'] = pd.Timestamp.now()
+    return out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast daily revenue for every store x category series (Holt-Winters).")
+    parser.add_argument('--horizon', type=int, default=HORIZON, help="Days to forecast.")
+    parser.add_argument('--folds', type=int, default=BACKTEST_FOLDS, help="Backtest origins (0 = skip).")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Parallel backtest workers (-1 = one per fold).")
+    args = parser.parse_args(argv)
+
+    logger.info("Starting Revenue Forecasting...")
+    engine = get_engine()
+    out = run_forecast(engine, horizon=args.horizon, folds=args.folds, n_jobs=args.n_jobs)
+    if out.empty:
+        return
+
+    logger.info(f"Saving {len(out):,} forecast rows to {FORECAST_TABLE}...")
+    insert_data(out, FORECAST_TABLE, engine, if_exists='replace', method='copy')
+    logger.info("Forecasting Complete.")
+
+if __name__ == "__main__":
+    main()
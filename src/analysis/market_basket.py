@@ -0,0 +1,153 @@
+import argparse
+import pandas as pd
+import numpy as np
+import logging
+import sqlalchemy
+import sys
+import os
+from scipy import sparse
+
+# Add project root
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.utils.db_utils import get_engine, insert_data
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RULES_TABLE = 'analysis_basket_rules'
+
+# Item granularity -> (item id column, label query)
+LEVELS = {
+    'product': ('p.product_id', "SELECT product_id AS item_id, name AS item_name FROM dim_product"),
+    'category': ('p.category_id', "SELECT category_id AS item_id, category_name AS item_name FROM dim_category"),
+    'brand': ('p.brand_id', "SELECT brand_id AS item_id, brand_name AS item_name FROM dim_brand")
+}
+
+MIN_PAIR_ORDERS = 2 # Minimum co-occurring orders for a rule (absolute support)
+TOP_K = 10 # Rules kept per antecedent (by lift)
+
+def load_baskets(engine, level):
+    """(order_id, item_id) pairs for the chosen level; repeated lines collapse in the matrix."""
+    item_col, _ = LEVELS[level]
+    query = f"""
+    SELECT s.order_id, {item_col} AS item_id
+    FROM fact_sales s
+    JOIN dim_product p ON s.product_id = p.product_id
+    WHERE {item_col} IS NOT NULL
+    """
+    return pd.read_sql(query, engine)
+
+def incidence_matrix(order_ids, item_ids):
+    """
+    Sparse binary order x item matrix (CSR).
+    Returns (matrix, item labels) - rows are orders, columns the item ids in `items` order.
+    """
+    order_codes, _ = pd.factorize(np.asarray(order_ids))
+    item_codes, items = pd.factorize(np.asarray(item_ids))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(order_codes), dtype=np.int32), (order_codes, item_codes)),
+        shape=(order_codes.max() + 1, len(items))
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1 # Presence, not quantity
+    return matrix, items
+
+def mine_rules(matrix, items, min_pair_orders=MIN_PAIR_ORDERS, top_k=TOP_K):
+    """
+    Pair rules A -> B from one sparse product: (X^T X)[a, b] = orders containing both.
+    Never densifies - cost follows the number of co-occurring pairs, not items^2.
+
+    Returns:
+        DataFrame: antecedent_id, consequent_id, pair_orders, support, confidence, lift
+        (top_k consequents per antecedent, by lift).
+    """
+    n_orders = matrix.shape[0]
+    item_orders = np.asarray(matrix.sum(axis=0)).ravel()
+
+    # Support pruning: an item in fewer orders than the pair threshold can't be in any kept pair
+    keep = np.flatnonzero(item_orders >= min_pair_orders)
+    matrix = matrix[:, keep].tocsr()
+    items, item_orders = items[keep], item_orders[keep]
+
+    co = (matrix.T @ matrix).tocoo()
+    # Off-diagonal pairs with enough orders; both directions are rules (A -> B and B -> A)
+    pairs = (co.row != co.col) & (co.data >= min_pair_orders)
+    a, b, count = co.row[pairs], co.col[pairs], co.data[pairs].astype(np.int64)
+    if len(count) == 0:
+        return pd.DataFrame(columns=['antecedent_id', 'consequent_id', 'pair_orders', 'support', 'confidence', 'lift'])
+
+    support = count / n_orders
+    confidence = count / item_orders[a]
+    lift = confidence / (item_orders[b] / n_orders)
+
+    # Top-k per antecedent: sort by (antecedent, -lift, -pair_orders) and keep the first k of each run
+    order = np.lexsort((-count, -lift, a))
+    a_sorted = a[order]
+    run_start = np.r_[0, np.flatnonzero(np.diff(a_sorted)) + 1]
+    rank = np.arange(len(order)) - np.repeat(run_start, np.diff(np.r_[run_start, len(order)]))
+    top = order[rank < top_k]
+
+    return pd.DataFrame({
+        'antecedent_id': items[a[top]],
+        'consequent_id': items[b[top]],
+        'pair_orders': count[top],
+        'support': support[top],
+        'confidence': confidence[top],
+        'lift': lift[top]
+    }).sort_values(['lift', 'pair_orders'], ascending=False, ignore_index=True)
+
+def build_rules(engine, level, min_pair_orders=MIN_PAIR_ORDERS, top_k=TOP_K):
+    """Mine one level and attach item names. Returns the rows for analysis_basket_rules."""
+    df = load_baskets(engine, level)
+    if df.empty:
+        logger.warning(f"No sales lines for level '{level}'.")
+        return pd.DataFrame()
+
+    matrix, items = incidence_matrix(df['order_id'], df['item_id'])
+    logger.info(f"[{level}] {matrix.shape[0]:,} orders x {matrix.shape[1]:,} items, {matrix.nnz:,} non-zeros.")
+    rules = mine_rules(matrix, items, min_pair_orders=min_pair_orders, top_k=top_k)
+
+    names = pd.read_sql(LEVELS[level][1], engine).set_index('item_id')['item_name']
+    rules.insert(0, 'level', level)
+    rules.insert(2, 'antecedent', rules['antecedent_id'].map(names))
+    rules.insert(4, 'consequent', rules['consequent_id'].map(names))
+    rules['n_orders'] = matrix.shape[0]
+    rules['created_at'] = pd.Timestamp.now()
+    logger.info(f"[{level}] {len(rules):,} rules (top {top_k} per antecedent, >= {min_pair_orders} orders).")
+    return rules
+
+def save_rules(rules, level, engine):
+    """Replace this level's rows in analysis_basket_rules (other levels are kept)."""
+    if sqlalchemy.inspect(engine).has_table(RULES_TABLE):
+        with engine.begin() as conn:
+            conn.execute(sqlalchemy.text(f"DELETE FROM {RULES_TABLE} WHERE level = :level"), {'level': level})
+        if not rules.empty:
+            insert_data(rules, RULES_TABLE, engine, if_exists='append')
+    elif not rules.empty:
+        insert_data(rules, RULES_TABLE, engine, if_exists='replace')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mine market basket rules (support / confidence / lift) from fact_sales.")
+    parser.add_argument('--level', choices=list(LEVELS) + ['all'], default='all', help="Item granularity.")
+    parser.add_argument('--min-pair-orders', type=int, default=MIN_PAIR_ORDERS, help="Minimum orders containing both items.")
+    parser.add_argument('--top-k', type=int, default=TOP_K, help="Rules kept per antecedent.")
+    args = parser.parse_args(argv)
+
+    logger.info("Starting Market Basket Analysis...")
+    engine = get_engine()
+    levels = list(LEVELS) if args.level == 'all' else [args.level]
+    for level in levels:
+        rules = build_rules(engine, level, min_pair_orders=args.min_pair_orders, top_k=args.top_k)
+        save_rules(rules, level, engine)
+        if rules.empty:
+            continue
+        logger.info(f"[{level}] Top rules:\n" + str(rules[['antecedent', 'consequent', 'pair_orders', 'confidence', 'lift']].head(5)))
+    logger.info("Market Basket Analysis Complete.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import pandas as pd
+import numpy as np
+import logging
+import sqlalchemy
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threadpoolctl import threadpool_limits
+
+# Add project root
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.utils.db_utils import get_engine, reload_table
+from src.analysis.feature_engineering import load_embeddings
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SIMILAR_TABLE = 'fact_product_similar'
+
+# Embeddings are L2-normalised by feature_engineering.py, so cosine similarity = dot product.
+# All-pairs similarity runs in row blocks: block x n scores at a time, never n x n.
+
+def block_rows(n, block_mb):
+    """Rows per block so that one block of float32 scores (rows x n) fits in block_mb."""
+    return max(int(block_mb * 1024 ** 2 // (4 * max(n, 1))), 1)
+
+def top_k_block(embeddings, start, stop, k):
+    """Top-k neighbours (positions, scores) of rows start:stop against every row, best first, self excluded."""
+    scores = embeddings[start:stop] @ embeddings.T
+    rows = np.arange(stop - start)
+    scores[rows, rows + start] = -np.inf
+    part = np.argpartition(scores, -k, axis=1)[:, -k:] # Unordered top-k, O(n) per row
+    top = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-top, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+def build_similar(ids, embeddings, k=None, block_mb=None, workers=None):
+    """
+    Cosine top-k for every product as a long frame (product_id, rank, similar_product_id, score).
+    Blocks run on `workers` threads (the matmul releases the GIL, BLAS is pinned to one thread
+    per worker); peak extra memory ~ workers x block_mb.
+    Pairs with a non-positive score (e.g. empty descriptions) are dropped.
+    """
+    k = min(k or Config.SIMILAR_TOP_K, len(ids) - 1)
+    block_mb = block_mb or Config.SIMILAR_BLOCK_MB
+    workers = workers or Config.SIMILAR_WORKERS
+    n = len(ids)
+    if k < 1:
+        return pd.DataFrame(columns=['product_id', 'rank', 'similar_product_id', 'score'])
+
+    step = block_rows(n, block_mb)
+    neighbours = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    def run(start):
+        stop = min(start + step, n)
+        neighbours[start:stop], scores[start:stop] = top_k_block(embeddings, start, stop, k)
+
+    with threadpool_limits(limits=1 if workers > 1 else None, user_api='blas'):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, range(0, n, step)))
+
+    out = pd.DataFrame({
+        'product_id': np.repeat(ids, k),
+        'rank': np.tile(np.arange(1, k + 1, dtype=np.int16), n),
+        'similar_product_id': ids[neighbours.ravel()],
+        'score': scores.ravel()
+    })
+    return out[out['score'] > 0].reset_index(drop=True)
+
+class SimilarProducts:
+    """
+    "Similar to product X" straight from the embedding memmap: one matrix-vector product
+    over the catalogue, no database round trip.
+    """
+    def __init__(self):
+        self.ids, self.embeddings = load_embeddings()
+        if self.ids is None:
+            raise FileNotFoundError("No product embeddings yet. Run 'python src/analysis/feature_engineering.py' first.")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def similar(self, product_id, k=10):
+        """The k most similar products to product_id: DataFrame (similar_product_id, score), best first."""
+        pos = np.searchsorted(self.ids, product_id)
+        if pos >= len(self.ids) or self.ids[pos] != product_id:
+            raise KeyError(f"Product {product_id} has no embedding.")
+        k = min(k, len(self.ids) - 1)
+        scores = self.embeddings @ self.embeddings[pos]
+        scores[pos] = -np.inf
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top])]
+        return pd.DataFrame({'similar_product_id': self.ids[top], 'score': scores[top]})
+
+def ensure_similar_table(engine):
+    """fact_product_similar as in schema.sql (reload_table would otherwise create it without a key)."""
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(f"""
+            CREATE TABLE IF NOT EXISTS {SIMILAR_TABLE} (
+                product_id INT REFERENCES dim_product(product_id),
+                rank SMALLINT,
+                similar_product_id INT REFERENCES dim_product(product_id),
+                score REAL,
+                PRIMARY KEY (product_id, rank)
+            )
+        """))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Top-k similar products (cosine on the description embeddings) -> fact_product_similar.")
+    parser.add_argument('--k', type=int, default=Config.SIMILAR_TOP_K, help="Neighbours per product.")
+    parser.add_argument('--block-mb', type=int, default=Config.SIMILAR_BLOCK_MB, help="Score block size per worker (MB).")
+    parser.add_argument('--workers', type=int, default=Config.SIMILAR_WORKERS, help="Threads computing blocks.")
+    parser.add_argument('--product-id', type=int, default=None, help="Only print the products similar to this one (nothing is written).")
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+
+    if args.product_id is not None:
+        index = SimilarProducts()
+        started = time.perf_counter()
+        similar = index.similar(args.product_id, args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        names = pd.read_sql(sqlalchemy.text("SELECT product_id, name FROM dim_product WHERE product_id = ANY(:ids)"), engine,
+                            params={'ids': [args.product_id] + similar['similar_product_id'].tolist()}).set_index('product_id')['name']
+        similar['name'] = similar['similar_product_id'].map(names)
+        logger.info(f"Similar to {args.product_id} ({names.get(args.product_id, '?')}), {elapsed:.1f} ms over {len(index):,} products:\n{similar.to_string(index=False)}")
+        return
+
+    logger.info("Starting Similar Products...")
+    ids, embeddings = load_embeddings()
+    if ids is None:
+        logger.warning("No product embeddings yet. Run 'python src/analysis/feature_engineering.py' first.")
+        return
+
+    started = time.perf_counter()
+    similar = build_similar(ids, embeddings, args.k, args.block_mb, args.workers)
+    logger.info(f"Top-{args.k} neighbours for {len(ids):,} products ({embeddings.shape[1]} dims) in {time.perf_counter() - started:.1f}s "
+                f"(blocks of {block_rows(len(ids), args.block_mb):,} rows, {args.workers} workers).")
+
+    ensure_similar_table(engine)
+    reload_table(similar, SIMILAR_TABLE, engine)
+    logger.info(f"Similar Products Complete. {len(similar):,} rows saved to {SIMILAR_TABLE}.")
+
+if __name__ == "__main__":
+    main()
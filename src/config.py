@@ -15,6 +15,40 @@ class Config:
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     DATA_DIR = os.path.join(BASE_DIR, "data")
     RAW_DATA_PATH = os.path.join(DATA_DIR, "raw", "asos_products.parquet")
+    SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots") # Parquet star-schema exports
+    
+    # Dashboard query backend: 'postgres' (live DB) or 'duckdb' (embedded, over the latest Parquet snapshot)
+    DASHBOARD_BACKEND = os.getenv("DASHBOARD_BACKEND", "postgres")
+    # 'sql' = per-page aggregate queries pushed down to the backend, 'memory' = load everything into pandas,
+    # 'service' = ask the shared aggregation service (src/dashboard/service.py)
+    DASHBOARD_QUERY_MODE = os.getenv("DASHBOARD_QUERY_MODE", "sql")
+    DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "600")) # Seconds a page aggregate stays cached
+    DASHBOARD_REFRESH_SECONDS = int(os.getenv("DASHBOARD_REFRESH_SECONDS", "30")) # Memory mode: watermark check interval; SQL mode: rollup / history freshness check interval
+    DASHBOARD_FRAME_CACHE_DIR = os.getenv("DASHBOARD_FRAME_CACHE_DIR", os.path.join(DATA_DIR, "dashboard_cache")) # Memory mode: Arrow snapshot of the frames
+    DASHBOARD_PERF_LOG = os.getenv("DASHBOARD_PERF_LOG", os.path.join(DATA_DIR, "logs", "dashboard_perf.jsonl")) # Per-render timings (empty = off)
+    # Chart point budgets (src/dashboard/chart_reduce.py): LTTB series, grid-binned scatters, top-N bars
+    DASHBOARD_SERIES_POINTS = int(os.getenv("DASHBOARD_SERIES_POINTS", "1500"))
+    DASHBOARD_SCATTER_POINTS = int(os.getenv("DASHBOARD_SCATTER_POINTS", "5000"))
+    DASHBOARD_TOP_N = int(os.getenv("DASHBOARD_TOP_N", "12"))
+    DASHBOARD_SERVICE_URL = os.getenv("DASHBOARD_SERVICE_URL", "http://127.0.0.1:8765") # Or unix:///path/to.sock
+    DASHBOARD_SERVICE_CACHE_MB = int(os.getenv("DASHBOARD_SERVICE_CACHE_MB", "256")) # Service result cache budget
+    DASHBOARD_SERVICE_WORKERS = int(os.getenv("DASHBOARD_SERVICE_WORKERS", "4")) # Service threads computing misses
+
+    # Product features (src/analysis/feature_engineering.py)
+    FEATURE_TFIDF_MAX_FEATURES = int(os.getenv("FEATURE_TFIDF_MAX_FEATURES", "500")) # TF-IDF vocabulary size
+    FEATURE_EMBEDDING_DIM = int(os.getenv("FEATURE_EMBEDDING_DIM", "50")) # Description embedding dimensions
+    FEATURE_FEATURIZER = os.getenv("FEATURE_FEATURIZER", "tfidf") # tfidf | hashing (stateless, parallel chunks)
+    FEATURE_HASH_BITS = int(os.getenv("FEATURE_HASH_BITS", "18")) # Hashing featurizer: 2**bits columns
+    FEATURE_CLUSTERS = int(os.getenv("FEATURE_CLUSTERS", "5")) # Product clusters (MiniBatchKMeans)
+    FEATURE_SWEEP_SAMPLE = int(os.getenv("FEATURE_SWEEP_SAMPLE", "10000")) # Products scored per k by --mode sweep
+    FEATURE_CHUNK_SIZE = int(os.getenv("FEATURE_CHUNK_SIZE", "10000")) # Products per partial_fit / predict chunk
+    FEATURE_REFIT_DAYS = int(os.getenv("FEATURE_REFIT_DAYS", "0")) # Also fit when the model is older than this (0 = drift only)
+    FEATURE_DRIFT_NEW_SHARE = float(os.getenv("FEATURE_DRIFT_NEW_SHARE", "0.25")) # Fit once products scored since the fit exceed this share
+    FEATURE_DRIFT_DISTANCE = float(os.getenv("FEATURE_DRIFT_DISTANCE", "1.5")) # ... or sit this much further from their centroids
+    MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(DATA_DIR, "models")) # Fitted model artifacts (joblib) + embedding memmaps
+    SIMILAR_TOP_K = int(os.getenv("SIMILAR_TOP_K", "10")) # Neighbours per product in fact_product_similar
+    SIMILAR_BLOCK_MB = int(os.getenv("SIMILAR_BLOCK_MB", "64")) # Score block per worker (bounds memory)
+    SIMILAR_WORKERS = int(os.getenv("SIMILAR_WORKERS", "4")) # Threads for the blocked similarity
 
     @property
     def DATABASE_URL(self):
@@ -2,7 +2,6 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import sqlalchemy
 import sys
 import os
 from datetime import datetime, timedelta
@@ -14,6 +13,12 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from src.config import Config
+from src.dashboard.backends import get_backend
+from src.dashboard import perf as perf_metrics
+from src.dashboard.chart_reduce import bin_scatter, downsample_series, top_n
+from src.dashboard.frames import LiveFrames
+from src.dashboard.queries import Filters, FrameQueries, SqlQueries
+from src.dashboard.service import ServiceQueries
 
 # --- CONFIGURATION ---
 st.set_page_config(
@@ -41,56 +46,80 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- DATA LOADING ---
-@st.cache_data
-def load_data():
-    engine = sqlalchemy.create_engine(Config().DATABASE_URL)
-    
-    # 1. Sales Data (Fact + Dims)
-    # Added: order_id, unit_cost, total_cost
-    # Removed: channel (use st.type instead)
-    q_sales = """
-    SELECT 
-        s.date, s.time, s.order_id, s.customer_id, s.quantity, s.unit_price, s.total_amount, 
-        s.unit_cost, s.total_cost, s.profit, s.payment_method,
-        st.store_name, st.region, st.type as store_type,
-        p.name as product_name, p.sku, p.base_price, c.category_name, b.brand_name,
-        cus.gender, cus.age, cus.region as customer_region, cus.loyalty_score
-    FROM fact_sales s
-    JOIN dim_store st ON s.store_id = st.store_id
-    JOIN dim_product p ON s.product_id = p.product_id
-    JOIN dim_category c ON p.category_id = c.category_id
-    LEFT JOIN dim_brand b ON p.brand_id = b.brand_id
-    LEFT JOIN dim_customer cus ON s.customer_id = cus.customer_id
-    """
-    
-    # 2. Inventory Data
-    # Added: snapshot_date
-    q_inv = """
-    SELECT i.snapshot_date, i.stock_on_hand, i.reorder_point, i.last_restock_date,
-           p.name as product_name, p.sku, st.store_name, st.type as store_type
-    FROM fact_inventory i
-    JOIN dim_product p ON i.product_id = p.product_id
-    JOIN dim_store st ON i.store_id = st.store_id
-    """
-    
-    try:
-        with engine.connect() as conn:
-            df_sales = pd.read_sql(q_sales, conn)
-            df_inv = pd.read_sql(q_inv, conn)
-            
-        # Ensure proper types
-        df_sales['date'] = pd.to_datetime(df_sales['date'])
-        df_inv['snapshot_date'] = pd.to_datetime(df_inv['snapshot_date'])
-        
-        return df_sales, df_inv
-    except Exception as e:
-        st.error(f"Error loading data: {e}")
-        return pd.DataFrame(), pd.DataFrame()
+@st.cache_resource
+def load_backend():
+    # Shared across sessions: one engine / DuckDB instance per server process
+    return get_backend()
+
+@st.cache_resource
+def load_live_frames():
+    # Compact frames shared by all sessions; refreshed incrementally above the watermarks
+    # Persisted as Arrow IPC under DASHBOARD_FRAME_CACHE_DIR, so a restart maps them instead of re-running the joins
+    return LiveFrames(load_backend(), interval=Config.DASHBOARD_REFRESH_SECONDS,
+                      snapshot_dir=os.path.join(Config.DASHBOARD_FRAME_CACHE_DIR, Config.DASHBOARD_BACKEND))
+
+@st.cache_resource
+def load_queries():
+    # 'sql': page aggregates pushed down to the backend (default)
+    # 'memory': line items held in memory, aggregated in pandas
+    # 'service': thin client; the aggregation service holds the data and shares results across sessions
+    if Config.DASHBOARD_QUERY_MODE == 'memory':
+        return FrameQueries.from_live(load_live_frames())
+    if Config.DASHBOARD_QUERY_MODE == 'service':
+        return ServiceQueries(Config.DASHBOARD_SERVICE_URL)
+    return SqlQueries(load_backend())
+
+def data_version():
+    """Memory mode: fetch rows above the watermarks (at most once per refresh interval)."""
+    if Config.DASHBOARD_QUERY_MODE == 'memory':
+        load_queries() # Subscribed to the frames before any refresh patches them
+        return load_live_frames().refresh()
+    if Config.DASHBOARD_QUERY_MODE == 'service':
+        return load_queries().version() # The service refreshes; a new version invalidates the page cache
+    return 0
+
+@st.cache_data(ttl=Config.DASHBOARD_CACHE_TTL, show_spinner=False)
+def cached_query(name, version, *args):
+    """One page aggregate, cached per (query, data version, filters) across reruns and sessions."""
+    perf.annotate(cache='miss') # Only runs on a miss
+    return getattr(load_queries(), name)(*args)
 
-df_sales_raw, df_inv_raw = load_data()
+def run_query(name, version, *args):
+    with perf.span(f"query:{name}", 'query') as span:
+        result = cached_query(name, version, *args)
+    span.setdefault('cache', 'hit')
+    span.update(perf_metrics.result_size(result))
+    return result
 
-if df_sales_raw.empty:
-    st.error("No data found. Please run 'python src/etl/generate_mock_data.py' first.")
+def show_chart(fig, name=None):
+    """st.plotly_chart, timed: figure serialization + send, with the number of points drawn."""
+    name = name or fig.layout.title.text or 'figure'
+    with perf.span(f"chart:{name}", 'render') as span:
+        span['points'] = perf_metrics.figure_points(fig)
+        st.plotly_chart(fig, use_container_width=True)
+
+def show_table(data, name):
+    """st.dataframe, timed (Styler formatting is rendered here)."""
+    with perf.span(f"table:{name}", 'render'):
+        st.dataframe(data, use_container_width=True)
+
+# One recorder per rerun: load, queries, page compute and chart renders (sidebar "Performance" panel)
+perf = perf_metrics.Recorder(backend=Config.DASHBOARD_BACKEND, mode=Config.DASHBOARD_QUERY_MODE)
+
+try:
+    with perf.span('load:backend', 'load'):
+        # Service mode: the dashboard itself never opens the database
+        backend = load_queries() if Config.DASHBOARD_QUERY_MODE == 'service' else load_backend()
+    with perf.span('load:refresh', 'load'):
+        version = data_version()
+    filter_options = run_query('filter_options', version)
+except Exception as e:
+    source = "aggregation service" if Config.DASHBOARD_QUERY_MODE == 'service' else f"{Config.DASHBOARD_BACKEND} backend"
+    st.error(f"Error connecting to the {source}: {e}")
+    st.stop()
+
+if pd.isna(filter_options['min_date']):
+    st.error("No data found. Please run 'python src/etl/generate_mock_data.py' first (and 'python src/etl/export_parquet.py' for the DuckDB backend).")
     st.stop()
 
 # --- SIDEBAR NAVIGATION ---
@@ -106,46 +135,51 @@ pages = [
     "8. Forecasting"
 ]
 selected_page = st.sidebar.radio("Navigation", pages)
+perf.page = selected_page
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("Filters")
 
 # Date Filter
-min_date = df_sales_raw['date'].min()
-max_date = df_sales_raw['date'].max()
+min_date = filter_options['min_date'].date()
+max_date = filter_options['max_date'].date()
 date_range = st.sidebar.date_input("Date Range", [min_date, max_date], min_value=min_date, max_value=max_date)
 
 # Store Filter
-all_stores = ['All'] + sorted(df_sales_raw['store_name'].unique().tolist())
+all_stores = ['All'] + filter_options['stores']
 selected_store = st.sidebar.selectbox("Store", all_stores)
 
 # Category Filter
-all_cats = ['All'] + sorted(df_sales_raw['category_name'].unique().tolist())
+all_cats = ['All'] + filter_options['categories']
 selected_cat = st.sidebar.selectbox("Category", all_cats)
 
-# --- FILTERING LOGIC ---
-mask = (df_sales_raw['date'] >= pd.to_datetime(date_range[0])) & (df_sales_raw['date'] <= pd.to_datetime(date_range[1]))
-if selected_store != 'All':
-    mask &= (df_sales_raw['store_name'] == selected_store)
-if selected_cat != 'All':
-    mask &= (df_sales_raw['category_name'] == selected_cat)
-
-df_filtered = df_sales_raw.loc[mask]
+# --- FILTERS ---
+# Each page fetches only the aggregates it renders; the filters travel with the query
+# (SQL predicates in 'sql' mode) and form the cache key.
+filters = Filters(start=date_range[0], end=date_range[-1], store=selected_store, category=selected_cat)
 
 # Helper
 def format_currency(val):
     return f"£{val:,.2f}"
 
+def reduced_caption(shown, total, what):
+    # Charts are drawn from reduced data (chart_reduce.py); say so when it happened
+    if shown < total:
+        st.caption(f"Chart shows {shown:,} {what} summarising {total:,} (point budget).")
+
 # --- PAGE IMPLEMENTATIONS ---
+# Self time of this block = pandas work and figure building (queries and renders are timed separately)
+page_span = perf.begin(f"page:{selected_page}", 'compute')
 
 if selected_page == "1. Executive Summary":
     st.title("📊 Executive Summary")
     
     # KPIs
-    total_rev = df_filtered['total_amount'].sum()
-    total_orders = df_filtered['order_id'].nunique() # Corrected: Unique Orders
-    total_lines = len(df_filtered)
-    gross_profit = df_filtered['profit'].sum()
+    kpis = run_query('kpis', version, filters)
+    total_rev = kpis['total_rev']
+    total_orders = kpis['total_orders'] # Corrected: Unique Orders
+    total_lines = kpis['total_lines']
+    gross_profit = kpis['gross_profit']
     margin = (gross_profit / total_rev * 100) if total_rev > 0 else 0
     aov = total_rev / total_orders if total_orders > 0 else 0
     basket_size = total_lines / total_orders if total_orders > 0 else 0 # Avg Items per Order
@@ -162,73 +196,65 @@ if selected_page == "1. Executive Summary":
     
     with col1:
         st.subheader("Sales Trend (Daily)")
-        daily_sales = df_filtered.groupby('date')['total_amount'].sum().reset_index()
-        fig_trend = px.line(daily_sales, x='date', y='total_amount', title="Daily Revenue", template="plotly_white")
-        st.plotly_chart(fig_trend, use_container_width=True)
+        daily_sales = run_query('daily_revenue', version, filters)
+        plot_sales = downsample_series(daily_sales, 'date', 'total_amount') # LTTB keeps peaks and dips
+        fig_trend = px.line(plot_sales, x='date', y='total_amount', title="Daily Revenue", template="plotly_white")
+        show_chart(fig_trend)
+        reduced_caption(len(plot_sales), len(daily_sales), "days")
         
     with col2:
         st.subheader("Revenue by Channel")
         # Use store_type as channel
-        fig_chan = px.pie(df_filtered.groupby('store_type')['total_amount'].sum().reset_index(), 
+        fig_chan = px.pie(top_n(run_query('revenue_by_channel', version, filters), 'store_type', 'total_amount'), 
                           values='total_amount', names='store_type', hole=0.4, color_discrete_sequence=px.colors.qualitative.Pastel)
-        st.plotly_chart(fig_chan, use_container_width=True)
+        show_chart(fig_chan)
 
 elif selected_page == "2. Sales Performance":
     st.title("📈 Sales Performance")
     
     # Heatmap
     st.subheader("Sales Heatmap (Peak Times)")
-    df_heat = df_filtered.copy()
-    df_heat['hour'] = pd.to_datetime(df_heat['time'], format='%H:%M:%S').dt.hour
-    df_heat['day_of_week'] = df_heat['date'].dt.day_name()
-    
-    heatmap_data = df_heat.pivot_table(index='day_of_week', columns='hour', values='order_id', aggfunc='nunique')
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    heatmap_data = heatmap_data.reindex(days_order)
+    heatmap_data = run_query('sales_heatmap', version, filters)
     
     fig_heat = px.imshow(heatmap_data, labels=dict(x="Hour", y="Day", color="Orders"), color_continuous_scale="Viridis")
-    st.plotly_chart(fig_heat, use_container_width=True)
+    show_chart(fig_heat)
     
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Average Order Value (AOV) by Store")
-        store_metrics = df_filtered.groupby('store_name').agg(
-            Rev=('total_amount', 'sum'),
-            Orders=('order_id', 'nunique')
-        ).reset_index()
-        store_metrics['AOV'] = store_metrics['Rev'] / store_metrics['Orders']
+        store_metrics = run_query('store_metrics', version, filters)
+        # Largest stores by revenue; the rest are one bar with their pooled AOV
+        plot_stores = top_n(store_metrics, 'store_name', 'Revenue',
+                            aggregations={'AOV': lambda rest: rest['Revenue'].sum() / rest['Orders'].sum()})
         
-        fig_pay = px.bar(store_metrics, x='store_name', y='AOV', color='AOV', color_continuous_scale='Blues')
-        st.plotly_chart(fig_pay, use_container_width=True)
+        fig_pay = px.bar(plot_stores, x='store_name', y='AOV', color='AOV', color_continuous_scale='Blues')
+        show_chart(fig_pay)
         
     with c2:
         st.subheader("Top Payment Methods")
-        fig_chan = px.bar(df_filtered.groupby('payment_method')['order_id'].nunique().reset_index(), 
+        fig_chan = px.bar(top_n(run_query('payment_methods', version, filters), 'payment_method', 'order_id'), 
                           x='payment_method', y='order_id', title="Transaction Volume")
-        st.plotly_chart(fig_chan, use_container_width=True)
+        show_chart(fig_chan)
 
 elif selected_page == "3. Product & Margin":
     st.title("👗 Product Profitability")
     
-    prod_perf = df_filtered.groupby('product_name').agg(
-        Revenue=('total_amount', 'sum'),
-        Cost=('total_cost', 'sum'),
-        Profit=('profit', 'sum'),
-        Qty_Sold=('quantity', 'sum')
-    ).reset_index()
-    prod_perf['Margin_Pct'] = prod_perf['Profit'] / prod_perf['Revenue']
+    prod_perf = run_query('product_margin', version, filters)
     
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Most Profitable Products (Top 10)")
         top_profit = prod_perf.nlargest(10, 'Profit')
-        st.dataframe(top_profit[['product_name', 'Revenue', 'Profit', 'Margin_Pct']].style.format({'Revenue': '£{:.2f}', 'Profit': '£{:.2f}', 'Margin_Pct': '{:.1%}'}), use_container_width=True)
+        show_table(top_profit[['product_name', 'Revenue', 'Profit', 'Margin_Pct']].style.format({'Revenue': '£{:.2f}', 'Profit': '£{:.2f}', 'Margin_Pct': '{:.1%}'}), 'top products')
 
     with c2:
         st.subheader("Margin Scatter Plot")
-        fig_scat = px.scatter(prod_perf, x='Revenue', y='Margin_Pct', size='Qty_Sold', 
-                              hover_name='product_name', title="Revenue vs Margin %")
-        st.plotly_chart(fig_scat, use_container_width=True)
+        # Above the point budget, products are binned on a Revenue x Margin grid (hover: products per marker)
+        plot_prod = bin_scatter(prod_perf, 'Revenue', 'Margin_Pct', size='Qty_Sold', label='product_name')
+        fig_scat = px.scatter(plot_prod, x='Revenue', y='Margin_Pct', size='Qty_Sold', 
+                              hover_name='product_name', hover_data=['points'], title="Revenue vs Margin %")
+        show_chart(fig_scat)
+        reduced_caption(len(plot_prod), len(prod_perf), "markers")
 
 elif selected_page == "4. Inventory Intelligence":
     st.title("📦 Inventory Intelligence")
@@ -236,27 +262,21 @@ elif selected_page == "4. Inventory Intelligence":
     # 1. Historical Trend
     st.subheader("Stock Level Trends (Historical)")
     # Filter by store if needed, but show trend aggregation
-    df_inv_trend = df_inv_raw.copy()
-    if selected_store != 'All':
-        df_inv_trend = df_inv_trend[df_inv_trend['store_name'] == selected_store]
-        
-    daily_stock = df_inv_trend.groupby('snapshot_date')['stock_on_hand'].sum().reset_index()
-    fig_stock = px.line(daily_stock, x='snapshot_date', y='stock_on_hand', title="Total Stock on Hand over Time")
-    st.plotly_chart(fig_stock, use_container_width=True)
+    daily_stock = run_query('inventory_trend', version, selected_store)
+    fig_stock = px.line(downsample_series(daily_stock, 'snapshot_date', 'stock_on_hand'), x='snapshot_date', y='stock_on_hand', title="Total Stock on Hand over Time")
+    show_chart(fig_stock)
 
     # 2. Current Status
     st.subheader("Current Stock Status (Latest Snapshot)")
-    latest_date = df_inv_trend['snapshot_date'].max()
-    df_curr = df_inv_trend[df_inv_trend['snapshot_date'] == latest_date]
-    
-    low_stock = df_curr[df_curr['stock_on_hand'] <= df_curr['reorder_point']]
+    status = run_query('inventory_status', version, selected_store)
+    low_stock = status['low_stock']
     
     c1, c2, c3 = st.columns(3)
-    c1.metric("Date Snapshot", latest_date.strftime('%Y-%m-%d'))
-    c2.metric("Total Items", f"{df_curr['stock_on_hand'].sum():,}")
+    c1.metric("Date Snapshot", status['latest_date'].strftime('%Y-%m-%d') if status['latest_date'] is not None else "-")
+    c2.metric("Total Items", f"{status['total_stock']:,}")
     c3.metric("Critical Low Stock Alerts", f"{len(low_stock)}", delta_color="inverse")
     
-    st.dataframe(low_stock[['store_name', 'product_name', 'stock_on_hand', 'reorder_point']].sort_values('stock_on_hand'), use_container_width=True)
+    show_table(low_stock, 'low stock')
 
 elif selected_page == "5. Customer Segments":
     st.title("👥 Customer Segmentation (RFM)")
@@ -268,76 +288,150 @@ elif selected_page == "5. Customer Segments":
     *   **At Risk**: High value but haven't bought recently.
     """)
     
-    # Should use the pre-calculated segments ideally, but let's calc on the fly using dashboard filters
-    current_date = df_filtered['date'].max() + timedelta(days=1)
-    rfm = df_filtered.groupby('customer_id').agg({
-        'date': lambda x: (current_date - x.max()).days,
-        'order_id': 'nunique', # Frequency = Orders
-        'total_amount': 'sum'
-    }).rename(columns={'date': 'Recency', 'order_id': 'Frequency', 'total_amount': 'Monetary'})
-    
-    # Basic scoring logic for visualization
-    rfm['R_Score'] = pd.qcut(rfm['Recency'], 3, labels=['High', 'Mid', 'Low']) # Low recency is Good? No, Low days is good. 
-    # Let's just visualize scatter
+    # Full range without store/category filters -> the batch job's analysis_rfm_segments;
+    # otherwise RFM over the filtered lines (same scoring + labels, vectorized)
+    full_range = filters.start <= min_date and filters.end >= max_date and selected_store == 'All' and selected_cat == 'All'
+    rfm = run_query('rfm_segments', version) if full_range else None
+    if rfm is None:
+        rfm = run_query('customer_rfm', version, filters)
+        st.caption(f"RFM computed for the selected filters ({len(rfm):,} customers).")
+    else:
+        st.caption(f"Precomputed segments from analysis_rfm_segments ({len(rfm):,} customers).")
     
-    fig_rfm = px.scatter(rfm, x='Recency', y='Frequency', size='Monetary', color='Monetary', 
-                         title="Recency vs Frequency (Size = Spend)", hover_data=['Monetary'])
-    st.plotly_chart(fig_rfm, use_container_width=True)
+    # A browser can't draw a million markers: bin the scatter per segment (every customer is
+    # counted, unlike a sample), keep the tables exact
+    plot_rfm = bin_scatter(rfm, 'Recency', 'Frequency', size='Monetary', color='Customer_Segment')
+    fig_rfm = px.scatter(plot_rfm, x='Recency', y='Frequency', size='Monetary', color='Customer_Segment', 
+                         title="Recency vs Frequency (Size = Spend)", hover_data=['Monetary', 'points'])
+    show_chart(fig_rfm)
+    reduced_caption(len(plot_rfm), len(rfm), "markers")
     
     c1, c2 = st.columns(2)
     with c1:
             st.subheader("Top Customers (Champions)")
-            st.dataframe(rfm.nlargest(10, 'Monetary').style.format({'Monetary': '£{:.2f}'}), use_container_width=True)
+            show_table(rfm.nlargest(10, 'Monetary').style.format({'Monetary': '£{:.2f}'}), 'top customers')
+    with c2:
+            st.subheader("Customers per Segment")
+            seg_counts = rfm['Customer_Segment'].value_counts().rename_axis('Customer_Segment').reset_index(name='customers')
+            show_chart(px.bar(seg_counts, x='Customer_Segment', y='customers'), 'segment counts')
 
 elif selected_page == "6. Basket Analysis":
     st.title("🛒 Market Basket Analysis")
     
     # Items per Order Distribution
-    basket_sizes = df_filtered.groupby('order_id').size().reset_index(name='item_count')
+    basket_sizes = run_query('basket_sizes', version, filters)
     
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Distribution of Basket Sizes")
-        fig_hist = px.histogram(basket_sizes, x='item_count', nbins=10, title="Items per Order")
-        st.plotly_chart(fig_hist, use_container_width=True)
+        fig_hist = px.bar(basket_sizes, x='item_count', y='orders', title="Items per Order")
+        show_chart(fig_hist)
         
     with c2:
         st.subheader("Basket Size by Category")
-        # Join back to get category
         # Which categories stimulate bulk buys?
-        cat_basket = df_filtered.groupby('category_name')['quantity'].mean().reset_index() # Avg Qty per Line Item
+        cat_basket = run_query('category_quantity', version, filters) # Avg Qty per Line Item
         fig_bar = px.bar(cat_basket.nlargest(10, 'quantity'), x='category_name', y='quantity', title="Avg Qty per Item (Bulk Potential)")
-        st.plotly_chart(fig_bar, use_container_width=True)
+        show_chart(fig_bar)
+
+    # Association rules (batch: src/analysis/market_basket.py, full history - not affected by the sidebar filters)
+    st.markdown("---")
+    st.subheader("Product Affinity (Association Rules)")
+    level = st.radio("Rule level", ['category', 'brand', 'product'], horizontal=True)
+    rules = run_query('basket_rules', version, level)
+
+    if rules is None or rules.empty:
+        st.info(f"No {level} rules yet. Run 'python src/analysis/market_basket.py' (min. 2 shared orders per pair).")
+    else:
+        st.caption(f"{len(rules)} strongest rules by lift · {int(rules['n_orders'].iloc[0]):,} orders · mined {pd.Timestamp(rules['created_at'].iloc[0]):%Y-%m-%d %H:%M}")
+        c1, c2 = st.columns([3, 2])
+        with c1:
+            show_table(rules[['antecedent', 'consequent', 'pair_orders', 'support', 'confidence', 'lift']].head(20)
+                       .style.format({'support': '{:.2%}', 'confidence': '{:.1%}', 'lift': '{:.2f}'}), 'basket rules')
+        with c2:
+            fig_rules = px.scatter(rules, x='support', y='confidence', color='lift', size='pair_orders',
+                                   hover_data=['antecedent', 'consequent'], title="Support vs Confidence (colour = Lift)")
+            show_chart(fig_rules)
 
 elif selected_page == "7. Store Operations":
     st.title("🏪 Store Performance")
     
-    store_stats = df_filtered.groupby('store_name').agg(
-        Revenue=('total_amount', 'sum'),
-        Orders=('order_id', 'nunique')
-    ).reset_index()
-    store_stats['AOV'] = store_stats['Revenue'] / store_stats['Orders']
+    store_stats = run_query('store_metrics', version, filters)
     
-    st.dataframe(store_stats.style.background_gradient(subset=['Revenue'], cmap='Greens').format({'Revenue': '£{:.2f}', 'AOV': '£{:.2f}'}), use_container_width=True)
+    show_table(store_stats.style.background_gradient(subset=['Revenue'], cmap='Greens').format({'Revenue': '£{:.2f}', 'AOV': '£{:.2f}'}), 'store metrics')
     
     st.subheader("Physical vs Online Share")
     # Store Type logic
-    type_stats = df_filtered.groupby('store_type')['total_amount'].sum().reset_index()
-    fig_pie = px.pie(type_stats, values='total_amount', names='store_type')
-    st.plotly_chart(fig_pie, use_container_width=True)
+    type_stats = run_query('revenue_by_channel', version, filters)
+    fig_pie = px.pie(top_n(type_stats, 'store_type', 'total_amount'), values='total_amount', names='store_type')
+    show_chart(fig_pie)
 
 elif selected_page == "8. Forecasting":
     st.title("🔮 Revenue Forecasting")
     
     # Simple Moving Average
-    daily_sales = df_filtered.groupby('date')['total_amount'].sum().reset_index().set_index('date').sort_index()
+    daily_sales = run_query('daily_revenue', version, filters).set_index('date').sort_index()
     idx = pd.date_range(daily_sales.index.min(), daily_sales.index.max())
     daily_sales = daily_sales.reindex(idx, fill_value=0)
     
     daily_sales['MA_7'] = daily_sales['total_amount'].rolling(window=7).mean()
-    
-    st.line_chart(daily_sales[['total_amount', 'MA_7']])
-    st.caption("Blue: Actual Daily Revenue, Orange: 7-Day Moving Average trend.")
+
+    # Holt-Winters forecast for the selected store / category (batch: src/analysis/forecasting.py)
+    fc = run_query('revenue_forecast', version, selected_store, selected_cat)
+    if fc is None or fc.empty:
+        with perf.span('chart:revenue trend', 'render'):
+            st.line_chart(daily_sales[['total_amount', 'MA_7']])
+        st.caption("Blue: Actual Daily Revenue, Orange: 7-Day Moving Average trend.")
+        st.info("No model forecast yet. Run 'python src/analysis/forecasting.py' for Holt-Winters forecasts with intervals.")
+    else:
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Next 7 Days (Forecast)", format_currency(fc['forecast'].head(7).sum()))
+        c2.metric("Backtest Error (WAPE)", f"{fc['backtest_wape'].iloc[0]:.1%}" if pd.notna(fc['backtest_wape'].iloc[0]) else "-")
+        c3.metric("MAE vs Seasonal Naive", format_currency(fc['backtest_mae'].iloc[0]) if pd.notna(fc['backtest_mae'].iloc[0]) else "-",
+                  delta=format_currency(fc['backtest_mae'].iloc[0] - fc['baseline_mae'].iloc[0]) if pd.notna(fc['baseline_mae'].iloc[0]) else None,
+                  delta_color="inverse")
+
+        fig_fc = go.Figure()
+        for lo, hi, name, opacity in (('lower_95', 'upper_95', '95% interval', 0.15), ('lower_80', 'upper_80', '80% interval', 0.3)):
+            fig_fc.add_trace(go.Scatter(x=fc['forecast_date'], y=fc[hi], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig_fc.add_trace(go.Scatter(x=fc['forecast_date'], y=fc[lo], line=dict(width=0), fill='tonexty',
+                                        fillcolor=f'rgba(255,127,14,{opacity})', name=name))
+        # Actuals are LTTB-reduced; the moving average is smooth, so the same rows are enough for it
+        plot_sales = downsample_series(daily_sales.rename_axis('date').reset_index(), 'date', 'total_amount')
+        fig_fc.add_trace(go.Scatter(x=plot_sales['date'], y=plot_sales['total_amount'], name='Actual', line=dict(color='#1f77b4')))
+        fig_fc.add_trace(go.Scatter(x=plot_sales['date'], y=plot_sales['MA_7'], name='7-Day MA', line=dict(color='#7f7f7f', dash='dot')))
+        fig_fc.add_trace(go.Scatter(x=fc['forecast_date'], y=fc['forecast'], name='Forecast', line=dict(color='#ff7f0e')))
+        fig_fc.update_layout(template='plotly_white', title="Daily Revenue: Actual, Trend & Forecast", hovermode='x unified')
+        show_chart(fig_fc)
+        st.caption(f"Holt-Winters (additive, damped, weekly seasonality) fitted on history up to "
+                   f"{pd.Timestamp(fc['history_end'].iloc[0]):%Y-%m-%d} · run {pd.Timestamp(fc['created_at'].iloc[0]):%Y-%m-%d %H:%M}")
+
+# --- PERFORMANCE ---
+perf.end(page_span)
+frames_mb = perf_metrics.frames_memory(load_queries()) # Memory mode only
+render = perf.finish(version=version, frames_mb=round(sum(frames_mb.values()), 2) if frames_mb else None,
+                     sales_rows=len(load_queries().df_sales) if frames_mb else None,
+                     rss_mb=perf_metrics.process_rss_mb())
+perf_metrics.append_log(render) # One line per render: compare over time with 'python src/dashboard/perf.py'
+
+st.sidebar.markdown("---")
+with st.sidebar.expander("⏱️ Performance"):
+    c1, c2 = st.columns(2)
+    c1.metric("Render", f"{render['total_ms']:,.0f} ms")
+    c2.metric("Process RSS", f"{render['rss_mb']:,.0f} MB" if render['rss_mb'] is not None else "-")
+    st.caption(" · ".join(f"{kind} {render[f'{kind}_ms']:,.0f} ms" for kind in perf_metrics.KINDS))
+    spans = pd.DataFrame(render['spans']).reindex(columns=['name', 'kind', 'ms', 'self_ms', 'cache', 'rows', 'points'])
+    st.dataframe(spans.sort_values('self_ms', ascending=False), hide_index=True, use_container_width=True)
+    if Config.DASHBOARD_QUERY_MODE == 'service':
+        stats = load_queries().stats()
+        st.caption(f"Service cache: {stats['hits']:,} hits · {stats['misses']:,} misses · {stats['coalesced']:,} coalesced · "
+                   f"{stats['entries']:,} results ({stats['cache_mb']:,.1f} MB)")
+    if frames_mb:
+        st.caption("Cached frames: " + " · ".join(f"{label} {mb:,.1f} MB" for label, mb in frames_mb.items()))
+    # Recent renders of this page (from the log) - a jump after a data load shows up here
+    history = pd.DataFrame([r for r in perf_metrics.tail_log(limit=200) if r.get('page') == selected_page])
+    if len(history) > 1:
+        st.line_chart(history.set_index('ts')[['query_ms', 'compute_ms', 'render_ms']], height=150)
 
 st.sidebar.markdown("---")
-st.sidebar.caption("ASOS Retail Dashboard v2.2 (Enterprise)")
+st.sidebar.caption(f"ASOS Retail Dashboard v2.2 (Enterprise) · {backend.describe()} · {Config.DASHBOARD_QUERY_MODE} mode")
@@ -0,0 +1,83 @@
+import os
+import re
+import sys
+import threading
+import pandas as pd
+import sqlalchemy
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.etl.export_parquet import latest_snapshot_dir, load_manifest
+
+# Named parameters are written SQLAlchemy-style (:name). '::' casts are left alone.
+PARAM_PATTERN = re.compile(r'(?<![:\w]):(\w+)')
+
+class PostgresBackend:
+    """Live PostgreSQL warehouse."""
+    name = 'postgres'
+    
+    def __init__(self, url=None):
+        self.engine = sqlalchemy.create_engine(url or Config().DATABASE_URL)
+    
+    def query(self, sql, params=None):
+        with self.engine.connect() as conn:
+            return pd.read_sql(sqlalchemy.text(sql), conn, params=params or {})
+    
+    def describe(self):
+        return f"PostgreSQL ({Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_NAME})"
+
+class DuckDBBackend:
+    """
+    Embedded DuckDB over the latest Parquet snapshot (src/etl/export_parquet.py).
+    Every exported table is exposed as a view, so the same SQL runs here and on Postgres
+    and no database service is needed. Filters on the month-partitioned facts are pushed
+    down into the Parquet scan.
+    """
+    name = 'duckdb'
+    
+    def __init__(self, snapshot_dir=None, threads=None):
+        import duckdb # Optional dependency: only needed for this backend
+        
+        self.snapshot_dir = snapshot_dir or latest_snapshot_dir()
+        if not self.snapshot_dir or not os.path.isdir(self.snapshot_dir):
+            raise FileNotFoundError("No Parquet snapshot found. Run 'python src/etl/export_parquet.py' first.")
+        self.manifest = load_manifest(self.snapshot_dir)
+        
+        self.conn = duckdb.connect(':memory:')
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+        for table, info in self.manifest['tables'].items():
+            if info['partition_by']:
+                source = os.path.join(self.snapshot_dir, table, '*', '*.parquet')
+                scan = f"read_parquet('{source}', hive_partitioning = true)"
+            else:
+                scan = f"read_parquet('{os.path.join(self.snapshot_dir, table + '.parquet')}')"
+            self.conn.execute(f'CREATE VIEW "{table}" AS SELECT * FROM {scan}')
+        self._local = threading.local()
+    
+    def _cursor(self):
+        # DuckDB connections are not thread-safe: one cursor per Streamlit script thread
+        if not hasattr(self._local, 'cursor'):
+            self._local.cursor = self.conn.cursor()
+        return self._local.cursor
+    
+    def query(self, sql, params=None):
+        sql = PARAM_PATTERN.sub(r'$\1', sql)
+        return self._cursor().execute(sql, params or {}).df()
+    
+    def describe(self):
+        return f"DuckDB (snapshot {self.manifest['snapshot']})"
+
+BACKENDS = {'postgres': PostgresBackend, 'duckdb': DuckDBBackend}
+
+def get_backend(name=None, **kwargs):
+    """Instantiate the configured dashboard backend (Config.DASHBOARD_BACKEND by default)."""
+    name = (name or Config.DASHBOARD_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown dashboard backend: {name}. Choose from {list(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,106 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+
+# Chart inputs are reduced to a point budget before they reach Plotly: the payload and
+# the browser's draw time then depend on the budget, not on how many rows the data has.
+# Tables and KPIs keep using the exact query results.
+
+def _numeric(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the visual
+    shape of the series (peaks and dips survive, unlike every-nth sampling).
+    First and last points are always kept; x must be sorted.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x, y = _numeric(x), _numeric(y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64) # threshold - 2 buckets over the inner points
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Third vertex: mean of the next bucket (the last point for the final bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+def downsample_series(df, x, y, budget=None):
+    """Rows of a time series (sorted by x) reduced with LTTB on column y; other columns follow the same rows."""
+    budget = budget or Config.DASHBOARD_SERIES_POINTS
+    if len(df) <= budget:
+        return df
+    return df.iloc[lttb_indices(df[x].to_numpy(), df[y].to_numpy(), budget)]
+
+def _cells(values, bins):
+    lo, hi = np.nanmin(values), np.nanmax(values)
+    if hi <= lo:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.minimum(((values - lo) / (hi - lo) * bins).astype(np.int64), bins - 1)
+
+def bin_scatter(df, x, y, budget=None, size=None, color=None, label=None):
+    """
+    Scatter input under a point budget. Small inputs pass through (with points=1).
+    Above the budget, points are aggregated on a regular x/y grid (per colour group):
+    one marker per non-empty cell at the mean position, `points` = rows in the cell,
+    `size` summed, and `label` naming the cell's largest member (+N more).
+    """
+    budget = budget or Config.DASHBOARD_SCATTER_POINTS
+    df = df.dropna(subset=[x, y])
+    if len(df) <= budget:
+        return df.assign(points=1)
+    groups = df[color].nunique() if color else 1
+    bins = max(int(np.sqrt(budget / max(groups, 1))), 1)
+    keys = [_cells(_numeric(df[x]), bins), _cells(_numeric(df[y]), bins)]
+    if color:
+        keys.append(df[color].to_numpy())
+
+    grouped = df.groupby(keys, sort=False)
+    aggregations = {x: (x, 'mean'), y: (y, 'mean'), 'points': (x, 'size')}
+    if size:
+        aggregations[size] = (size, 'sum')
+    out = grouped.agg(**aggregations)
+    if color:
+        out[color] = grouped[color].first()
+    if label:
+        # Representative: the largest marker of the cell (or its first row)
+        rep = df.loc[grouped[size].idxmax(), label].to_numpy() if size else grouped[label].first().to_numpy()
+        out[label] = np.where(out['points'] > 1, [f"{name} (+{n - 1:,} more)" for name, n in zip(rep, out['points'])], rep)
+    return out.reset_index(drop=True)
+
+def top_n(df, label, value, n=None, other='Other', aggregations=None):
+    """
+    The n - 1 largest rows by `value` plus one `other` row for the rest (categorical bars / pies).
+    The other row sums numeric columns unless `aggregations` maps a column to a function
+    of the remaining rows (e.g. a ratio recomputed from its parts).
+    """
+    n = n or Config.DASHBOARD_TOP_N
+    if len(df) <= n:
+        return df
+    ranked = df.sort_values(value, ascending=False)
+    top, rest = ranked.iloc[:n - 1], ranked.iloc[n - 1:]
+    row = {col: rest[col].sum() for col in df.columns if col != label and pd.api.types.is_numeric_dtype(df[col])}
+    for col, func in (aggregations or {}).items():
+        row[col] = func(rest)
+    row[label] = f"{other} ({len(rest):,})"
+    return pd.concat([top, pd.DataFrame([row])], ignore_index=True)
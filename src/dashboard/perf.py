@@ -0,0 +1,217 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError: # Optional: process RSS is only reported when psutil is installed
+    psutil = None
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Span kinds: 'load' (backend / frame refresh), 'query' (page aggregate, cache hit or miss),
+# 'compute' (page block: pandas + figure building), 'render' (chart / table sent to the browser)
+KINDS = ('load', 'query', 'compute', 'render')
+
+# Cached frames held by FrameQueries (memory mode)
+FRAME_ATTRS = {'df_sales': 'sales', 'df_inv': 'inventory', 'daily': 'daily cube', 'stock': 'stock cube'}
+
+_log_lock = threading.Lock() # Sessions run on threads of one server process
+
+class Recorder:
+    """
+    Timings of one dashboard render (one Streamlit rerun).
+    Spans nest: a span's self time excludes its children, so the per-kind totals add up
+    to the run time (e.g. the page block's 'compute' excludes the queries and charts inside it).
+    """
+    def __init__(self, page=None, **context):
+        self.page = page
+        self.context = context
+        self.spans = []
+        self._stack = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, kind):
+        """Time a block; yields the span dict so callers can attach counters (rows, points...)."""
+        span = self.begin(name, kind)
+        try:
+            yield span
+        finally:
+            self.end(span)
+
+    def begin(self, name, kind):
+        span = {'name': name, 'kind': kind, 'ms': 0.0, 'self_ms': 0.0, '_start': time.perf_counter(), '_child': 0.0}
+        self._stack.append(span)
+        self.spans.append(span)
+        return span
+
+    def end(self, span=None):
+        span = span or self._stack[-1]
+        while self._stack:
+            top = self._stack.pop()
+            top['ms'] = (time.perf_counter() - top.pop('_start')) * 1000
+            top['self_ms'] = top['ms'] - top.pop('_child')
+            if self._stack:
+                self._stack[-1]['_child'] += top['ms']
+            if top is span:
+                break
+
+    def annotate(self, **values):
+        """Attach values to the innermost open span (e.g. cache='miss' from inside a cached function)."""
+        if self._stack:
+            self._stack[-1].update(values)
+
+    def finish(self, **extra):
+        """Close any span left open (st.stop) and return the run record."""
+        while self._stack:
+            self.end()
+        totals = {kind: 0.0 for kind in KINDS}
+        for span in self.spans:
+            totals[span['kind']] = totals.get(span['kind'], 0.0) + span['self_ms']
+        record = {
+            'ts': datetime.now().isoformat(timespec='seconds'),
+            'page': self.page,
+            **self.context,
+            'total_ms': round((time.perf_counter() - self._started) * 1000, 1),
+            **{f'{kind}_ms': round(ms, 1) for kind, ms in totals.items()},
+            'spans': [{k: round(v, 1) if isinstance(v, float) else v for k, v in span.items()} for span in self.spans],
+            **extra
+        }
+        return record
+
+def result_size(result):
+    """Rows / MB of a query result (DataFrames only)."""
+    if isinstance(result, pd.DataFrame):
+        return {'rows': len(result), 'mb': round(result.memory_usage(deep=True).sum() / 1024 ** 2, 3)}
+    return {}
+
+def figure_points(fig):
+    """Data points in a Plotly figure - what the browser has to receive and draw."""
+    points = 0
+    for trace in fig.data:
+        for attr in ('z', 'x', 'values', 'y'):
+            values = getattr(trace, attr, None)
+            if values is not None:
+                points += len(values) if attr != 'z' else sum(len(row) for row in values)
+                break
+    return points
+
+def frames_memory(queries):
+    """MB held by the cached frames (memory mode); empty for SQL mode."""
+    memory = {}
+    for attr, label in FRAME_ATTRS.items():
+        frame = getattr(queries, attr, None)
+        if isinstance(frame, pd.DataFrame):
+            memory[label] = round(frame.memory_usage(deep=True).sum() / 1024 ** 2, 2)
+    return memory
+
+def process_rss_mb():
+    """Resident memory of the dashboard process (None without psutil)."""
+    if psutil is None:
+        return None
+    return round(psutil.Process().memory_info().rss / 1024 ** 2, 1)
+
+def append_log(record, path=None):
+    """Append one render record as a JSON line. An empty DASHBOARD_PERF_LOG disables logging."""
+    path = Config.DASHBOARD_PERF_LOG if path is None else path
+    if not path:
+        return
+    try:
+        line = json.dumps(record, default=str)
+        with _log_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    except OSError as e:
+        logger.warning(f"Could not append to the performance log {path}: {e}")
+
+def tail_log(path=None, limit=200, block=64 * 1024):
+    """Last `limit` records of the log, read from the end (the file only grows)."""
+    path = Config.DASHBOARD_PERF_LOG if path is None else path
+    if not path or not os.path.exists(path):
+        return []
+    lines = deque(maxlen=limit + 1)
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos, tail = f.tell(), b''
+        while pos > 0 and len(lines) <= limit:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + tail
+            parts = chunk.split(b'\n')
+            tail = parts[0] # Possibly a partial line, completed by the next block
+            lines.extendleft(reversed([p for p in parts[1:] if p.strip()]))
+        if pos == 0 and tail.strip():
+            lines.appendleft(tail)
+    records = []
+    for line in list(lines)[-limit:]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue # Line cut by a crash mid-write
+    return records
+
+def read_log(path=None):
+    """Whole log as a DataFrame of renders (one row per record, spans left nested)."""
+    path = Config.DASHBOARD_PERF_LOG if path is None else path
+    if not path or not os.path.exists(path):
+        return pd.DataFrame()
+    df = pd.read_json(path, lines=True)
+    if not df.empty:
+        df['ts'] = pd.to_datetime(df['ts'])
+    return df
+
+def summarize(df, by='page'):
+    """Median / p95 render timings grouped by page, span or day (with the data size next to them)."""
+    if df.empty:
+        return df
+    if by == 'span':
+        spans = pd.json_normalize(df['spans'].explode().dropna().tolist())
+        summary = spans.groupby(['kind', 'name'])['ms'].describe(percentiles=[.5, .95])[['count', '50%', '95%', 'max']]
+        summary['self_ms (median)'] = spans.groupby(['kind', 'name'])['self_ms'].median()
+        return summary.sort_values('95%', ascending=False)
+    keys = ['page'] if by == 'page' else [df['ts'].dt.date.rename('day'), 'page']
+    summary = df.groupby(keys)['total_ms'].describe(percentiles=[.5, .95])[['count', '50%', '95%', 'max']]
+    for col in ('query_ms', 'compute_ms', 'render_ms', 'frames_mb', 'sales_rows'):
+        if col in df.columns:
+            summary[f'{col} (median)'] = df.groupby(keys)[col].median()
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise the dashboard performance log (DASHBOARD_PERF_LOG).")
+    parser.add_argument('--log', default=Config.DASHBOARD_PERF_LOG, help="Path to the JSONL log.")
+    parser.add_argument('--by', choices=['page', 'span', 'day'], default='page', help="Grouping of the summary.")
+    parser.add_argument('--days', type=int, default=None, help="Only renders from the last N days.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    df = read_log(args.log)
+    if df.empty:
+        logger.info(f"No renders logged in {args.log}.")
+        return
+    if args.days:
+        df = df[df['ts'] >= pd.Timestamp.now() - pd.Timedelta(days=args.days)]
+    with pd.option_context('display.width', 200, 'display.max_columns', 20, 'display.float_format', '{:,.1f}'.format):
+        print(summarize(df, by=args.by))
+
+if __name__ == "__main__":
+    main()
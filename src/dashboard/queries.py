@@ -0,0 +1,619 @@
+import functools
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.analysis.customer_segmentation import SEGMENT_COLUMNS, rfm_metrics, segment_customers
+from src.dashboard.frames import from_day, label_code, to_day
+from src.etl.inventory_history import current_history_end
+from src.etl.refresh_rollups import rollups_current
+
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+@dataclass(frozen=True)
+class Filters:
+    """Sidebar filters. Hashable, so (query, filters) doubles as the cache key."""
+    start: date
+    end: date # Inclusive
+    store: str = 'All'
+    category: str = 'All'
+
+# --- RFM (shared by both implementations) -----------------------------------
+
+def _segments(rfm):
+    # Same scoring + labels as src/analysis/customer_segmentation.py, on whatever customers the filters kept
+    return segment_customers(rfm)[SEGMENT_COLUMNS[1:]]
+
+def read_rfm_segments(backend):
+    """analysis_rfm_segments as written by the batch job, or None if it hasn't been run / exported."""
+    try:
+        df = backend.query('''
+            SELECT customer_id, "Recency", "Frequency", "Monetary", "RFM_Segment", "Customer_Segment"
+            FROM analysis_rfm_segments
+        ''')
+    except Exception:
+        return None
+    return df.set_index('customer_id') if not df.empty else None
+
+def read_basket_rules(backend, level, limit=200):
+    """Strongest rules (by lift) of one level from analysis_basket_rules (src/analysis/market_basket.py), or None."""
+    try:
+        df = backend.query('''
+            SELECT antecedent, consequent, pair_orders, support, confidence, lift, n_orders, created_at
+            FROM analysis_basket_rules WHERE level = :level
+            ORDER BY lift DESC, pair_orders DESC LIMIT :limit
+        ''', {'level': level, 'limit': limit})
+    except Exception:
+        return None
+    return df
+
+def read_forecast(backend, store='All', category='All'):
+    """The analysis_forecast series matching the sidebar selection (src/analysis/forecasting.py), or None."""
+    level = {(True, True): 'total', (False, True): 'store', (True, False): 'category', (False, False): 'store_category'}[(store == 'All', category == 'All')]
+    try:
+        df = backend.query('''
+            SELECT forecast_date, forecast, lower_80, upper_80, lower_95, upper_95,
+                   backtest_mae, backtest_wape, baseline_mae, history_end, created_at
+            FROM analysis_forecast
+            WHERE level = :level AND store_name = :store AND category_name = :category
+            ORDER BY forecast_date
+        ''', {'level': level, 'store': store, 'category': category})
+    except Exception:
+        return None
+    df['forecast_date'] = pd.to_datetime(df['forecast_date'])
+    return df
+
+# --- SQL (pushdown) implementation ------------------------------------------
+
+# Line items joined to the dims the sidebar filters on (inner joins, like the original load query)
+SALES_FROM = """
+    FROM fact_sales s
+    JOIN dim_store st ON s.store_id = st.store_id
+    JOIN dim_product p ON s.product_id = p.product_id
+    JOIN dim_category c ON p.category_id = c.category_id
+"""
+
+# A rollup (src/etl/refresh_rollups.py) with the same inner joins as SALES_FROM: its product
+# join already happened in the refresh, the store and category joins drop the same lines.
+ROLLUP_FROM = """
+    FROM {table} a
+    JOIN dim_store st ON a.store_id = st.store_id
+    JOIN dim_category c ON a.category_id = c.category_id
+"""
+
+class SqlQueries:
+    """
+    Page aggregates computed inside the query backend (Postgres or DuckDB).
+    Sidebar filters become SQL predicates, so only the rows a page renders leave the database.
+    """
+    mode = 'sql'
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self._checks = {}
+    
+    def _checked(self, name, check):
+        """Result of a freshness check, re-run at most once per DASHBOARD_REFRESH_SECONDS."""
+        now = time.monotonic()
+        cached = self._checks.get(name)
+        if cached is None or now - cached[0] >= Config.DASHBOARD_REFRESH_SECONDS:
+            cached = self._checks[name] = (now, check())
+        return cached[1]
+    
+    def _rollups(self):
+        # Rollups only while they cover fact_sales exactly; otherwise the line items are read
+        return self._checked('rollups', lambda: rollups_current(self.backend.query))
+    
+    def _sales_where(self, f, date_col="s.date"):
+        clauses = [f"{date_col} >= :start", f"{date_col} < :end"]
+        params = {
+            'start': pd.Timestamp(f.start).to_pydatetime(),
+            'end': (pd.Timestamp(f.end) + timedelta(days=1)).to_pydatetime()
+        }
+        if f.store != 'All':
+            clauses.append("st.store_name = :store")
+            params['store'] = f.store
+        if f.category != 'All':
+            clauses.append("c.category_name = :category")
+            params['category'] = f.category
+        return "WHERE " + " AND ".join(clauses), params
+    
+    def _sales(self, select, f, group_by=None, order_by=None):
+        where, params = self._sales_where(f)
+        sql = f"SELECT {select} {SALES_FROM} {where}"
+        if group_by:
+            sql += f" GROUP BY {group_by}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        return self.backend.query(sql, params)
+    
+    def _rollup(self, table, select, f, group_by=None, order_by=None):
+        where, params = self._sales_where(f, date_col="a.sales_date")
+        sql = f"SELECT {select} {ROLLUP_FROM.format(table=table)} {where}"
+        if group_by:
+            sql += f" GROUP BY {group_by}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        return self.backend.query(sql, params)
+    
+    def filter_options(self):
+        bounds = self.backend.query("SELECT MIN(date) AS min_date, MAX(date) AS max_date FROM fact_sales")
+        stores = self.backend.query("SELECT DISTINCT store_name FROM dim_store ORDER BY store_name")
+        cats = self.backend.query("""
+            SELECT DISTINCT c.category_name FROM dim_category c
+            JOIN dim_product p ON p.category_id = c.category_id ORDER BY c.category_name
+        """)
+        return {
+            'min_date': pd.to_datetime(bounds['min_date'].iloc[0]),
+            'max_date': pd.to_datetime(bounds['max_date'].iloc[0]),
+            'stores': stores['store_name'].dropna().tolist(),
+            'categories': cats['category_name'].dropna().tolist()
+        }
+    
+    def kpis(self, f):
+        row = self._sales("""
+            SUM(s.total_amount) AS total_rev, COUNT(DISTINCT s.order_id) AS total_orders,
+            COUNT(*) AS total_lines, SUM(s.profit) AS gross_profit
+        """, f).iloc[0]
+        kpis = {k: (0 if pd.isna(v) else float(v)) for k, v in row.items()}
+        # Counts come back as floats from iloc on a mixed row
+        kpis['total_orders'] = int(kpis['total_orders'])
+        kpis['total_lines'] = int(kpis['total_lines'])
+        return kpis
+    
+    def daily_revenue(self, f):
+        if self._rollups():
+            df = self._rollup('agg_sales_daily', "a.sales_date AS date, SUM(a.revenue) AS total_amount", f, group_by="1", order_by="1")
+        else:
+            df = self._sales("CAST(s.date AS DATE) AS date, SUM(s.total_amount) AS total_amount", f, group_by="1", order_by="1")
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+    
+    def revenue_by_channel(self, f):
+        if self._rollups():
+            return self._rollup('agg_sales_daily', "st.type AS store_type, SUM(a.revenue) AS total_amount", f, group_by="1")
+        return self._sales("st.type AS store_type, SUM(s.total_amount) AS total_amount", f, group_by="1")
+    
+    def sales_heatmap(self, f):
+        if f.category != 'All' and self._rollups():
+            # An order has one day, hour and store, so per-category distinct orders add up exactly.
+            # Across categories they don't (multi-category orders), hence the line items for 'All'.
+            df = self._rollup('agg_sales_hourly', "a.weekday AS dow, a.hour AS hour, SUM(a.order_count) AS orders", f, group_by="1, 2")
+        else:
+            df = self._sales("""
+                EXTRACT(ISODOW FROM s.date) AS dow, EXTRACT(HOUR FROM s.time) AS hour,
+                COUNT(DISTINCT s.order_id) AS orders
+            """, f, group_by="1, 2")
+        df['day_of_week'] = df['dow'].astype(int).map(lambda d: DAYS_ORDER[d - 1])
+        df['hour'] = df['hour'].astype(int)
+        return df.pivot_table(index='day_of_week', columns='hour', values='orders', aggfunc='sum').reindex(DAYS_ORDER)
+    
+    def store_metrics(self, f):
+        df = self._sales("""
+            st.store_name, SUM(s.total_amount) AS revenue, COUNT(DISTINCT s.order_id) AS orders
+        """, f, group_by="1", order_by="1")
+        df = df.rename(columns={'revenue': 'Revenue', 'orders': 'Orders'})
+        df['AOV'] = df['Revenue'] / df['Orders']
+        return df
+    
+    def payment_methods(self, f):
+        return self._sales("s.payment_method, COUNT(DISTINCT s.order_id) AS order_id", f, group_by="1")
+    
+    def product_margin(self, f):
+        df = self._sales("""
+            p.name AS product_name, SUM(s.total_amount) AS revenue, SUM(s.total_cost) AS cost,
+            SUM(s.profit) AS profit, SUM(s.quantity) AS qty_sold
+        """, f, group_by="1")
+        df = df.rename(columns={'revenue': 'Revenue', 'cost': 'Cost', 'profit': 'Profit', 'qty_sold': 'Qty_Sold'})
+        df['Margin_Pct'] = df['Profit'] / df['Revenue']
+        return df
+    
+    def customer_rfm(self, f):
+        df = self._sales("""
+            s.customer_id, MAX(CAST(s.date AS DATE)) AS last_date, COUNT(DISTINCT s.order_id) AS frequency,
+            SUM(s.total_amount) AS monetary
+        """, f, group_by="1").dropna(subset=['customer_id'])
+        if df.empty:
+            return pd.DataFrame(columns=SEGMENT_COLUMNS).set_index('customer_id')
+        last_day = to_day(df['last_date'])
+        rfm = pd.DataFrame({
+            'Recency': last_day.max() + 1 - last_day.astype(np.int64),
+            'Frequency': df['frequency'].to_numpy(),
+            'Monetary': df['monetary'].to_numpy()
+        }, index=pd.Index(df['customer_id'].to_numpy(), name='customer_id'))
+        return _segments(rfm)
+    
+    def rfm_segments(self):
+        return read_rfm_segments(self.backend)
+    
+    def basket_rules(self, level, limit=200):
+        return read_basket_rules(self.backend, level, limit)
+    
+    def revenue_forecast(self, store, category):
+        return read_forecast(self.backend, store, category)
+    
+    def basket_sizes(self, f):
+        where, params = self._sales_where(f)
+        return self.backend.query(f"""
+            SELECT item_count, COUNT(*) AS orders
+            FROM (SELECT s.order_id, COUNT(*) AS item_count {SALES_FROM} {where} GROUP BY s.order_id) baskets
+            GROUP BY item_count ORDER BY item_count
+        """, params)
+    
+    def category_quantity(self, f):
+        if self._rollups():
+            return self._rollup('agg_sales_daily', "c.category_name, CAST(SUM(a.quantity) AS DOUBLE PRECISION) / SUM(a.line_count) AS quantity", f, group_by="1")
+        return self._sales("c.category_name, AVG(s.quantity) AS quantity", f, group_by="1")
+    
+    def _inventory_where(self, store):
+        if store != 'All':
+            return "WHERE st.store_name = :store", {'store': store}
+        return "", {}
+    
+    def _history_end(self):
+        """
+        Last snapshot of the delta-encoded history (src/etl/inventory_history.py), or None when
+        it isn't built or was encoded from an earlier load of fact_inventory (read the facts).
+        """
+        end = self._checked('history', lambda: current_history_end(self.backend.query))
+        return None if end is None else end.date()
+    
+    def inventory_trend(self, store):
+        where, params = self._inventory_where(store)
+        end = self._history_end()
+        if end is None:
+            sql = f"""
+                SELECT i.snapshot_date, SUM(i.stock_on_hand) AS stock_on_hand
+                FROM fact_inventory i JOIN dim_store st ON i.store_id = st.store_id
+                {where} GROUP BY 1 ORDER BY 1
+            """
+        else:
+            # Precomputed totals, plus any snapshot loaded after the history was last built
+            newer = (where + " AND " if where else "WHERE ") + "i.snapshot_date > :end"
+            params = {**params, 'end': end}
+            sql = f"""
+                SELECT t.snapshot_date, SUM(t.stock_on_hand) AS stock_on_hand
+                FROM inv_snapshot_totals t JOIN dim_store st ON t.store_id = st.store_id
+                {where} GROUP BY 1
+                UNION ALL
+                SELECT i.snapshot_date, SUM(i.stock_on_hand) AS stock_on_hand
+                FROM fact_inventory i JOIN dim_store st ON i.store_id = st.store_id
+                {newer} GROUP BY 1
+                ORDER BY 1
+            """
+        df = self.backend.query(sql, params)
+        df['snapshot_date'] = pd.to_datetime(df['snapshot_date'])
+        df['stock_on_hand'] = df['stock_on_hand'].astype(np.int64)
+        return df
+    
+    def inventory_status(self, store):
+        """Latest snapshot: totals + the low-stock lines (stock <= reorder point)."""
+        where, params = self._inventory_where(store)
+        end = self._history_end()
+        if end is not None:
+            newer = self.backend.query(f"""
+                SELECT MAX(i.snapshot_date) AS latest_date
+                FROM fact_inventory i JOIN dim_store st ON i.store_id = st.store_id
+                {(where + " AND " if where else "WHERE ") + "i.snapshot_date > :end"}
+            """, {**params, 'end': end})['latest_date'].iloc[0]
+            if pd.isna(newer):
+                return self._inventory_status_history(where, params)
+        
+        latest = self.backend.query(f"""
+            SELECT MAX(i.snapshot_date) AS latest_date
+            FROM fact_inventory i JOIN dim_store st ON i.store_id = st.store_id {where}
+        """, params)['latest_date'].iloc[0]
+        if pd.isna(latest):
+            return {'latest_date': None, 'total_stock': 0, 'low_stock': pd.DataFrame(columns=['store_name', 'product_name', 'stock_on_hand', 'reorder_point'])}
+        
+        params = {**params, 'latest': pd.Timestamp(latest).date()}
+        latest_where = (where + " AND " if where else "WHERE ") + "i.snapshot_date = :latest"
+        total = self.backend.query(f"""
+            SELECT SUM(i.stock_on_hand) AS total_stock
+            FROM fact_inventory i JOIN dim_store st ON i.store_id = st.store_id {latest_where}
+        """, params)['total_stock'].iloc[0]
+        low_stock = self.backend.query(f"""
+            SELECT st.store_name, p.name AS product_name, i.stock_on_hand, i.reorder_point
+            FROM fact_inventory i
+            JOIN dim_store st ON i.store_id = st.store_id
+            JOIN dim_product p ON i.product_id = p.product_id
+            {latest_where} AND i.stock_on_hand <= i.reorder_point
+            ORDER BY i.stock_on_hand
+        """, params)
+        return {'latest_date': pd.Timestamp(latest), 'total_stock': int(total or 0), 'low_stock': low_stock}
+    
+    def _inventory_status_history(self, where, params):
+        # Latest snapshot rebuilt from base + change rows: the last row of each line wins
+        totals = self.backend.query(f"""
+            SELECT t.snapshot_date, SUM(t.stock_on_hand) AS total_stock
+            FROM inv_snapshot_totals t JOIN dim_store st ON t.store_id = st.store_id
+            {where} GROUP BY 1 ORDER BY 1 DESC LIMIT 1
+        """, params)
+        if totals.empty:
+            return {'latest_date': None, 'total_stock': 0, 'low_stock': pd.DataFrame(columns=['store_name', 'product_name', 'stock_on_hand', 'reorder_point'])}
+        latest = pd.Timestamp(totals['snapshot_date'].iloc[0])
+        low_stock = self.backend.query(f"""
+            WITH history AS (
+                SELECT snapshot_date, store_id, product_id, stock_on_hand, reorder_point FROM inv_history_base
+                UNION ALL
+                SELECT snapshot_date, store_id, product_id, stock_on_hand, reorder_point FROM inv_history_delta
+                WHERE snapshot_date <= :latest
+            ), latest AS (
+                SELECT h.*, ROW_NUMBER() OVER (PARTITION BY h.store_id, h.product_id ORDER BY h.snapshot_date DESC) AS rn
+                FROM history h JOIN dim_store st ON h.store_id = st.store_id {where}
+            )
+            SELECT st.store_name, p.name AS product_name, l.stock_on_hand, l.reorder_point
+            FROM latest l
+            JOIN dim_store st ON l.store_id = st.store_id
+            JOIN dim_product p ON l.product_id = p.product_id
+            WHERE l.rn = 1 AND l.stock_on_hand <= l.reorder_point
+            ORDER BY l.stock_on_hand
+        """, {**params, 'latest': latest.date()})
+        return {'latest_date': latest, 'total_stock': int(totals['total_stock'].iloc[0] or 0), 'low_stock': low_stock}
+
+# --- In-memory implementation -----------------------------------------------
+
+def _decode(df, columns):
+    # Categorical group keys -> plain labels, only on the (small) aggregate that gets rendered
+    for col in columns:
+        df[col] = np.asarray(df[col], dtype=object)
+    return df
+
+def _money(df, columns):
+    # float32 per row, float64 while summing
+    return df[columns].astype(np.float64)
+
+@dataclass(frozen=True, eq=False)
+class _FrameState:
+    """Compact frames + the aggregates patched onto them, always replaced as a whole."""
+    df_sales: pd.DataFrame
+    df_inv: pd.DataFrame
+    daily: pd.DataFrame
+    stock: pd.DataFrame
+
+def _pinned(method):
+    """
+    Run a FrameQueries query on the state current when it starts: on_refresh swaps in a new
+    state from the refresh thread, and one query reads the frames and cubes several times.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self._local, 'state', None) is not None: # Nested query: already pinned
+            return method(self, *args, **kwargs)
+        self._local.state = self._state
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._local.state = None
+    return wrapper
+
+class FrameQueries:
+    """
+    The same page aggregates over the compact frames from src/dashboard/frames.py
+    (categorical dims, int32 day / order codes). Masks and group-bys run on the codes;
+    labels are decoded only on the aggregated result.
+    Used when DASHBOARD_QUERY_MODE=memory (small datasets / offline demos).
+    """
+    mode = 'memory'
+    
+    def __init__(self, df_sales, df_inv, backend=None):
+        self.backend = backend # Only for the precomputed tables (rfm_segments)
+        self._local = threading.local()
+        self._state = _FrameState(df_sales, df_inv, self._daily_cube(df_sales), self._stock_cube(df_inv))
+    
+    # Read from the state pinned by the running query (or the current one outside a query)
+    def _view(self):
+        return getattr(self._local, 'state', None) or self._state
+    
+    df_sales = property(lambda self: self._view().df_sales)
+    df_inv = property(lambda self: self._view().df_inv)
+    daily = property(lambda self: self._view().daily)
+    stock = property(lambda self: self._view().stock)
+    
+    @classmethod
+    def from_live(cls, live):
+        """Bind to a LiveFrames: its incremental batches patch the aggregates below."""
+        queries = cls(live.df_sales, live.df_inv, backend=live.loader.backend)
+        live.listeners.append(queries.on_refresh)
+        return queries
+    
+    # -- Patched aggregates ---------------------------------------------------
+    # Day x store x category sums (sales) and snapshot x store totals (inventory). Much smaller
+    # than the line items; new batches are added onto them instead of regrouping everything.
+    
+    @staticmethod
+    def _daily_cube(df):
+        if df.empty:
+            return pd.DataFrame(columns=['day', 'store', 'category', 'revenue', 'profit', 'lines'])
+        sums = _money(df, ['total_amount', 'profit']).rename(columns={'total_amount': 'revenue'})
+        sums['lines'] = 1
+        keys = [df['day'].values, df['store_name'].cat.codes.values, df['category_name'].cat.codes.values]
+        cube = sums.groupby(keys).sum()
+        cube.index.names = ['day', 'store', 'category']
+        return cube.reset_index()
+    
+    @staticmethod
+    def _stock_cube(df):
+        if df.empty:
+            return pd.DataFrame(columns=['snapshot_date', 'store', 'stock_on_hand'])
+        cube = df['stock_on_hand'].astype(np.int64).groupby([df['snapshot_date'].values, df['store_name'].cat.codes.values]).sum()
+        cube.index.names = ['snapshot_date', 'store']
+        return cube.reset_index()
+    
+    @staticmethod
+    def _patch(cube, delta, keys):
+        return pd.concat([cube, delta]).groupby(keys, as_index=False).sum()
+    
+    def on_refresh(self, live, delta):
+        """
+        LiveFrames listener. delta is None after a full reload.
+        The new state is built aside and swapped in with one assignment, while queries keep
+        running on the previous one.
+        """
+        if delta is None:
+            self._state = _FrameState(live.df_sales, live.df_inv, self._daily_cube(live.df_sales), self._stock_cube(live.df_inv))
+            return
+        delta_sales, delta_inv = delta
+        daily, stock = self._state.daily, self._state.stock
+        # The tail rows of the appended frames carry the unioned (stable) category codes
+        if len(delta_sales):
+            daily = self._patch(daily, self._daily_cube(live.df_sales.iloc[-len(delta_sales):]), ['day', 'store', 'category'])
+        if len(delta_inv):
+            stock = self._patch(stock, self._stock_cube(live.df_inv.iloc[-len(delta_inv):]), ['snapshot_date', 'store'])
+        self._state = _FrameState(live.df_sales, live.df_inv, daily, stock)
+    
+    def _mask(self, f, day, store_codes, category_codes):
+        mask = (day >= to_day([f.start])[0]) & (day <= to_day([f.end])[0])
+        if f.store != 'All':
+            mask &= store_codes == label_code(self.df_sales['store_name'], f.store)
+        if f.category != 'All':
+            mask &= category_codes == label_code(self.df_sales['category_name'], f.category)
+        return mask
+    
+    def _filtered(self, f):
+        df = self.df_sales
+        return df.loc[self._mask(f, df['day'].values, df['store_name'].cat.codes.values, df['category_name'].cat.codes.values)]
+    
+    def _daily(self, f):
+        cube = self.daily
+        return cube.loc[self._mask(f, cube['day'].values, cube['store'].values, cube['category'].values)]
+    
+    @_pinned
+    def filter_options(self):
+        df = self.df_sales
+        def observed(col):
+            codes = df[col].cat.codes.values
+            return sorted(df[col].cat.categories[np.unique(codes[codes >= 0])].tolist())
+        return {
+            'min_date': from_day([df['day'].min()])[0],
+            'max_date': from_day([df['day'].max()])[0],
+            'stores': observed('store_name'),
+            'categories': observed('category_name')
+        }
+    
+    @_pinned
+    def kpis(self, f):
+        daily = self._daily(f)
+        return {
+            'total_rev': float(daily['revenue'].sum()),
+            'total_orders': int(self._filtered(f)['order_id'].nunique()), # Unique Orders
+            'total_lines': int(daily['lines'].sum()),
+            'gross_profit': float(daily['profit'].sum())
+        }
+    
+    @_pinned
+    def daily_revenue(self, f):
+        daily = self._daily(f).groupby('day')['revenue'].sum()
+        return pd.DataFrame({'date': from_day(daily.index), 'total_amount': daily.values})
+    
+    @_pinned
+    def revenue_by_channel(self, f):
+        df = self._filtered(f)
+        out = _money(df, ['total_amount']).groupby(df['store_type'], observed=True)['total_amount'].sum().reset_index()
+        return _decode(out, ['store_type'])
+    
+    @_pinned
+    def sales_heatmap(self, f):
+        df = self._filtered(f)
+        heatmap = df.groupby(['weekday', 'hour'])['order_id'].nunique().unstack('hour')
+        heatmap = heatmap.reindex(range(7))
+        heatmap.index = pd.Index(DAYS_ORDER, name='day_of_week')
+        return heatmap
+    
+    @_pinned
+    def store_metrics(self, f):
+        df = self._filtered(f)
+        out = pd.DataFrame({
+            'Revenue': _money(df, ['total_amount']).groupby(df['store_name'], observed=True)['total_amount'].sum(),
+            'Orders': df.groupby('store_name', observed=True)['order_id'].nunique()
+        }).reset_index()
+        out['AOV'] = out['Revenue'] / out['Orders']
+        return _decode(out, ['store_name'])
+    
+    @_pinned
+    def payment_methods(self, f):
+        out = self._filtered(f).groupby('payment_method', observed=True)['order_id'].nunique().reset_index()
+        return _decode(out, ['payment_method'])
+    
+    @_pinned
+    def product_margin(self, f):
+        df = self._filtered(f)
+        sums = _money(df, ['total_amount', 'total_cost', 'profit'])
+        sums['quantity'] = df['quantity'].astype(np.int64)
+        out = sums.groupby(df['product_name'], observed=True).sum().reset_index()
+        out = out.rename(columns={'total_amount': 'Revenue', 'total_cost': 'Cost', 'profit': 'Profit', 'quantity': 'Qty_Sold'})
+        out['Margin_Pct'] = out['Profit'] / out['Revenue']
+        return _decode(out, ['product_name'])
+    
+    @_pinned
+    def customer_rfm(self, f):
+        df = self._filtered(f)
+        df = df[df['customer_id'].notna()]
+        if df.empty:
+            return pd.DataFrame(columns=SEGMENT_COLUMNS).set_index('customer_id')
+        rfm = rfm_metrics(df['customer_id'].values, df['order_id'].values, df['day'].values, df['total_amount'].values)
+        return _segments(rfm)
+    
+    def rfm_segments(self):
+        return read_rfm_segments(self.backend) if self.backend is not None else None
+    
+    def basket_rules(self, level, limit=200):
+        return read_basket_rules(self.backend, level, limit) if self.backend is not None else None
+    
+    def revenue_forecast(self, store, category):
+        return read_forecast(self.backend, store, category) if self.backend is not None else None
+    
+    @_pinned
+    def basket_sizes(self, f):
+        # Line items per order straight off the int32 order codes
+        sizes = np.bincount(self._filtered(f)['order_id'].values)
+        counts = np.bincount(sizes[sizes > 0])
+        item_count = np.nonzero(counts)[0]
+        return pd.DataFrame({'item_count': item_count, 'orders': counts[item_count]})
+    
+    @_pinned
+    def category_quantity(self, f):
+        # Avg Qty per Line Item
+        df = self._filtered(f)
+        out = df['quantity'].astype(np.float64).groupby(df['category_name'], observed=True).mean().reset_index()
+        return _decode(out, ['category_name'])
+    
+    def _inventory(self, store):
+        if store != 'All':
+            inv = self.df_inv
+            return inv[inv['store_name'].cat.codes.values == label_code(inv['store_name'], store)]
+        return self.df_inv
+    
+    @_pinned
+    def inventory_trend(self, store):
+        stock = self.stock
+        if store != 'All':
+            stock = stock[stock['store'].values == label_code(self.df_inv['store_name'], store)]
+        trend = stock.groupby('snapshot_date')['stock_on_hand'].sum().reset_index()
+        trend['snapshot_date'] = pd.to_datetime(trend['snapshot_date'])
+        return trend
+    
+    @_pinned
+    def inventory_status(self, store):
+        df_inv = self._inventory(store)
+        latest_date = df_inv['snapshot_date'].max()
+        df_curr = df_inv[df_inv['snapshot_date'] == latest_date]
+        low_stock = df_curr[df_curr['stock_on_hand'] <= df_curr['reorder_point']]
+        low_stock = low_stock[['store_name', 'product_name', 'stock_on_hand', 'reorder_point']].sort_values('stock_on_hand')
+        return {
+            'latest_date': latest_date,
+            'total_stock': int(df_curr['stock_on_hand'].astype(np.int64).sum()),
+            'low_stock': _decode(low_stock.copy(), ['store_name', 'product_name'])
+        }
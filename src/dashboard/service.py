@@ -0,0 +1,375 @@
+import argparse
+import asyncio
+import functools
+import http.client
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.dashboard.queries import Filters, SqlQueries
+
+logger = logging.getLogger(__name__)
+
+# The page API both sides speak: every public query method of SqlQueries / FrameQueries
+QUERY_NAMES = frozenset(name for name, attr in vars(SqlQueries).items() if callable(attr) and not name.startswith('_'))
+
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+
+# --- Wire format --------------------------------------------------------------
+# Arguments: JSON, Filters tagged as {"filters": {...}} (dates as ISO strings).
+# Results: a JSON header plus one Arrow IPC stream per DataFrame, so frames keep their
+# dtypes (categoricals, datetimes, index) and are not re-parsed row by row on the client.
+
+def encode_args(args):
+    """Canonical JSON of the query arguments (also the cache key)."""
+    def tag(value):
+        if isinstance(value, Filters):
+            return {'filters': {'start': value.start.isoformat(), 'end': value.end.isoformat(),
+                                'store': value.store, 'category': value.category}}
+        return value
+    return json.dumps([tag(a) for a in args], sort_keys=True)
+
+def decode_args(payload):
+    def untag(value):
+        if isinstance(value, dict) and 'filters' in value:
+            f = value['filters']
+            return Filters(start=date.fromisoformat(f['start']), end=date.fromisoformat(f['end']),
+                           store=f['store'], category=f['category'])
+        return value
+    return [untag(a) for a in json.loads(payload)]
+
+def _frame_bytes(df):
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def encode_result(result):
+    """Query result (DataFrame, dict of scalars / frames, or None) -> bytes."""
+    frames = []
+    def tag(value):
+        if isinstance(value, pd.DataFrame):
+            frames.append(_frame_bytes(value))
+            return {'frame': len(frames) - 1}
+        if isinstance(value, pd.Timestamp):
+            return {'ts': value.isoformat()}
+        if isinstance(value, dict):
+            return {'dict': {k: tag(v) for k, v in value.items()}}
+        if hasattr(value, 'item'): # numpy scalar
+            return {'value': value.item()}
+        return {'value': value}
+    header = json.dumps(tag(result)).encode()
+    parts = [struct.pack('<I', len(header)), header]
+    for frame in frames:
+        parts += [struct.pack('<Q', len(frame)), frame]
+    return b''.join(parts)
+
+def decode_result(payload):
+    view = memoryview(payload)
+    (size,) = struct.unpack_from('<I', view)
+    header = json.loads(bytes(view[4:4 + size]))
+    frames, pos = [], 4 + size
+    while pos < len(view):
+        (length,) = struct.unpack_from('<Q', view, pos)
+        frames.append(pa.ipc.open_stream(pa.py_buffer(view[pos + 8:pos + 8 + length])).read_all().to_pandas())
+        pos += 8 + length
+    def untag(node):
+        if 'frame' in node:
+            return frames[node['frame']]
+        if 'ts' in node:
+            return pd.Timestamp(node['ts'])
+        if 'dict' in node:
+            return {k: untag(v) for k, v in node['dict'].items()}
+        return node['value']
+    return untag(header)
+
+# --- Server -----------------------------------------------------------------
+
+class ResultCache:
+    """
+    LRU of encoded results, bounded by their total size in bytes (not by entry count:
+    one inventory table weighs as much as thousands of KPI rows). Entries also expire
+    after `ttl` seconds, so SQL-mode results pick up new rows like the dashboard cache did.
+    """
+    def __init__(self, max_bytes, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._items = OrderedDict() # key -> (payload, expires_at)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and time.monotonic() > item[1]:
+            self._drop(key)
+            return None
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key, payload):
+        if len(payload) > self.max_bytes:
+            return # Would evict everything else; serve it uncached
+        if key in self._items:
+            self._drop(key)
+        self._items[key] = (payload, time.monotonic() + self.ttl if self.ttl else None)
+        self.bytes += len(payload)
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._items)))
+
+    def _drop(self, key):
+        payload, _ = self._items.pop(key)
+        self.bytes -= len(payload)
+
+    def clear(self):
+        self._items.clear()
+        self.bytes = 0
+
+class AggregationService:
+    """
+    One process owning the dashboard data, serving page aggregates to every session.
+    Identical requests (same query, arguments and data version) are computed once:
+    finished results come from the ResultCache, and concurrent misses share one
+    in-flight computation (single-flight) instead of each running the group-by.
+    """
+    def __init__(self, queries, live=None, cache_mb=256, ttl=None, workers=4):
+        self.queries = queries
+        self.live = live # LiveFrames in memory mode: refreshed in the background, version in the key
+        self.cache = ResultCache(cache_mb * 1024 ** 2, ttl=ttl)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='agg')
+        self.version = live.version if live else 0
+        self.stats = {'requests': 0, 'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+        self._inflight = {}
+
+    def _compute(self, name, args):
+        start = time.perf_counter()
+        payload = encode_result(getattr(self.queries, name)(*decode_args(args)))
+        logger.info(f"{name}{args} computed in {(time.perf_counter() - start) * 1000:.0f} ms ({len(payload) / 1024:.0f} KB)")
+        return payload
+
+    async def result(self, name, args):
+        """Encoded result for one query; `args` is the canonical JSON from encode_args."""
+        self.stats['requests'] += 1
+        key = (self.version, name, args)
+        payload = self.cache.get(key)
+        if payload is not None:
+            self.stats['hits'] += 1
+            return payload
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats['misses'] += 1
+            task = asyncio.get_running_loop().run_in_executor(self.pool, self._compute, name, args)
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._settle, key))
+        else:
+            self.stats['coalesced'] += 1
+        # shield: a client hanging up must not cancel the computation the others are waiting on
+        return await asyncio.shield(task)
+
+    def _settle(self, key, task):
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is None and key[0] == self.version:
+            self.cache.put(key, task.result())
+
+    async def refresh_loop(self, interval):
+        """Memory mode: pull rows above the watermarks; a new version retires the cached results."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                version = await loop.run_in_executor(self.pool, self.live.refresh)
+                if version != self.version:
+                    self.version = version
+                    self.cache.clear()
+            except Exception as e:
+                logger.warning(f"Refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    def describe(self):
+        return {**self.stats, 'version': self.version, 'entries': len(self.cache),
+                'cache_mb': round(self.cache.bytes / 1024 ** 2, 2), 'inflight': len(self._inflight),
+                'mode': self.queries.mode}
+
+    # -- HTTP/1.1 (keep-alive) over TCP or a Unix socket ----------------------
+    # POST /query {"name": ..., "args": [...]} -> result bytes
+    # GET /version, GET /stats -> JSON
+
+    async def _route(self, method, path, body):
+        if method == 'POST' and path == '/query':
+            request = json.loads(body)
+            name = request.get('name')
+            if name not in QUERY_NAMES:
+                return 404, 'application/json', json.dumps({'error': f"Unknown query: {name}"}).encode()
+            args = encode_args(decode_args(json.dumps(request.get('args', []))))
+            return 200, ARROW_TYPE, await self.result(name, args)
+        if method == 'GET' and path == '/version':
+            return 200, 'application/json', json.dumps({'version': self.version}).encode()
+        if method == 'GET' and path == '/stats':
+            return 200, 'application/json', json.dumps(self.describe()).encode()
+        return 404, 'application/json', b'{"error": "Not found"}'
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                try:
+                    status, content_type, payload = await self._route(method, path, body)
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    logger.exception(f"{method} {path} failed")
+                    status, content_type, payload = 500, 'application/json', json.dumps({'error': str(e)}).encode()
+                reason = {200: 'OK', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+                writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass # Client went away or sent garbage
+        finally:
+            writer.close()
+
+async def serve(service, url, refresh_seconds=None):
+    parts = urlsplit(url)
+    if parts.scheme == 'unix':
+        server = await asyncio.start_unix_server(service.handle, path=parts.path)
+    else:
+        server = await asyncio.start_server(service.handle, host=parts.hostname, port=parts.port)
+    if service.live and refresh_seconds:
+        asyncio.get_running_loop().create_task(service.refresh_loop(refresh_seconds))
+    logger.info(f"Aggregation service ({service.queries.mode} mode, version {service.version}) listening on {url}")
+    async with server:
+        await server.serve_forever()
+
+# --- Client -----------------------------------------------------------------
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+class ServiceQueries:
+    """
+    The page API (same methods as SqlQueries / FrameQueries) answered by the aggregation
+    service. Used when DASHBOARD_QUERY_MODE=service: the dashboard holds no data and runs
+    no group-bys; one keep-alive connection per Streamlit script thread.
+    """
+    mode = 'service'
+
+    def __init__(self, url=None, timeout=120):
+        self.url = url or Config.DASHBOARD_SERVICE_URL
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        if not hasattr(self._local, 'conn'):
+            parts = urlsplit(self.url)
+            if parts.scheme == 'unix':
+                self._local.conn = _UnixHTTPConnection(parts.path, self.timeout)
+            else:
+                self._local.conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=self.timeout)
+        return self._local.conn
+
+    def _request(self, method, path, body=None):
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+                response = conn.getresponse()
+                payload = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                # Stale keep-alive socket (service restarted): reconnect once
+                conn.close()
+                del self._local.conn
+                if attempt == 2:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(f"Aggregation service {path}: {json.loads(payload).get('error', response.status)}")
+        return payload
+
+    def version(self):
+        return json.loads(self._request('GET', '/version'))['version']
+
+    def stats(self):
+        return json.loads(self._request('GET', '/stats'))
+
+    def _query(self, name, *args):
+        body = json.dumps({'name': name, 'args': json.loads(encode_args(args))})
+        return decode_result(self._request('POST', '/query', body))
+
+    def __getattr__(self, name):
+        if name in QUERY_NAMES:
+            return functools.partial(self._query, name)
+        raise AttributeError(name)
+
+    def describe(self):
+        return f"aggregation service ({self.url})"
+
+def build_service(mode, cache_mb, workers):
+    """Load the data the way the dashboard would and wrap it in an AggregationService."""
+    from src.dashboard.backends import get_backend
+    from src.dashboard.frames import LiveFrames
+    from src.dashboard.queries import FrameQueries
+
+    backend = get_backend()
+    if mode == 'memory':
+        live = LiveFrames(backend, interval=Config.DASHBOARD_REFRESH_SECONDS,
+                          snapshot_dir=os.path.join(Config.DASHBOARD_FRAME_CACHE_DIR, Config.DASHBOARD_BACKEND))
+        return AggregationService(FrameQueries.from_live(live), live=live, cache_mb=cache_mb, workers=workers)
+    # SQL mode has no version to watch: results expire like the dashboard's own cache
+    return AggregationService(SqlQueries(backend), cache_mb=cache_mb, ttl=Config.DASHBOARD_CACHE_TTL, workers=workers)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared aggregation service for the dashboard (DASHBOARD_QUERY_MODE=service).")
+    parser.add_argument('--url', default=Config.DASHBOARD_SERVICE_URL, help="http://host:port or unix:///path/to.sock")
+    parser.add_argument('--mode', choices=['memory', 'sql'], default='memory', help="Hold the frames in memory or push aggregates down to the backend.")
+    parser.add_argument('--cache-mb', type=int, default=Config.DASHBOARD_SERVICE_CACHE_MB, help="Result cache budget.")
+    parser.add_argument('--workers', type=int, default=Config.DASHBOARD_SERVICE_WORKERS, help="Threads computing cache misses.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    service = build_service(args.mode, args.cache_mb, args.workers)
+    try:
+        asyncio.run(serve(service, args.url, refresh_seconds=Config.DASHBOARD_REFRESH_SECONDS))
+    except KeyboardInterrupt:
+        logger.info("Aggregation service stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
+import argparse
 import logging
+import os
+import re
 import sqlalchemy
 from src.config import Config
 
@@ -6,9 +9,15 @@ from src.config import Config
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def setup_database():
+PARTITIONING_SQL = os.path.join(Config.BASE_DIR, 'src', 'sql', 'partitioning.sql')
+# Partitioned facts: (table, partition key)
+PARTITIONED_FACTS = [('fact_sales', 'date'), ('fact_inventory', 'snapshot_date')]
+FUTURE_PARTITION_MONTHS = 3
+
+def setup_database(partitioned=True):
     """
     Applies the schema.sql to the configured database.
+    With partitioned=True (default) the fact tables are created as monthly range partitions.
     """
     logger.info("Connecting to database...")
     try:
@@ -28,9 +37,93 @@ def setup_database():
             
         logger.info("Database schema applied successfully.")
         
+        if partitioned:
+            apply_partitioning(engine)
+        
     except Exception as e:
         logger.error(f"Error setting up database: {e}")
         raise
 
+def apply_partitioning(engine):
+    """
+    Converts fact_sales / fact_inventory into monthly range-partitioned tables with
+    BRIN + B-tree indexes. Existing (non-partitioned) fact data is migrated in place.
+    """
+    with open(PARTITIONING_SQL, 'r') as f:
+        partitioning_sql = f.read()
+    
+    with engine.begin() as conn:
+        # 1. Move legacy heap tables out of the way
+        legacy = {}
+        for table, key in PARTITIONED_FACTS:
+            relkind = conn.execute(
+                sqlalchemy.text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {'t': table}
+            ).scalar()
+            if relkind == 'r':
+                logger.info(f"Migrating non-partitioned {table} to a partitioned table...")
+                conn.execute(sqlalchemy.text(f'ALTER TABLE {table} RENAME TO {table}_unpartitioned'))
+                legacy[table] = key
+        
+        # 2. Partitioned tables, management functions and indexes
+        conn.execute(sqlalchemy.text(partitioning_sql))
+        
+        # 3. Copy legacy rows into their monthly partitions
+        for table, key in legacy.items():
+            source = f'{table}_unpartitioned'
+            bounds = conn.execute(sqlalchemy.text(f'SELECT MIN({key})::date, MAX({key})::date FROM {source}')).one()
+            if bounds[0] is not None:
+                conn.execute(
+                    sqlalchemy.text("SELECT create_monthly_partitions(:t, :k, :s, :e)"),
+                    {'t': table, 'k': key, 's': bounds[0], 'e': bounds[1]}
+                )
+            columns = [c['name'] for c in sqlalchemy.inspect(conn).get_columns(source)]
+            target_columns = {c['name'] for c in sqlalchemy.inspect(conn).get_columns(table)}
+            shared = ', '.join(f'"{c}"' for c in columns if c in target_columns)
+            moved = conn.execute(sqlalchemy.text(f'INSERT INTO {table} ({shared}) SELECT {shared} FROM {source}')).rowcount
+            conn.execute(sqlalchemy.text(f'DROP TABLE {source}'))
+            logger.info(f"Migrated {moved} rows into partitioned {table}.")
+        
+        # 4. Keep future months open
+        created = conn.execute(
+            sqlalchemy.text("SELECT ensure_future_partitions(:m)"), {'m': FUTURE_PARTITION_MONTHS}
+        ).scalar()
+        
+        # Serial ids keep counting from the migrated data
+        for table, id_col in [('fact_sales', 'transaction_id'), ('fact_inventory', 'inventory_id')]:
+            if table in legacy:
+                conn.execute(sqlalchemy.text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{id_col}'), COALESCE(MAX({id_col}), 0) + 1, false) FROM {table}"
+                ))
+    
+    logger.info(f"Fact partitioning applied ({created} future partitions created).")
+
+def explain_partition_pruning(engine, start_date, end_date):
+    """
+    Logs EXPLAIN plans for date-filtered fact queries and returns the partitions each one scans.
+    Only partitions overlapping [start_date, end_date] should appear.
+    """
+    queries = {
+        'fact_sales': "EXPLAIN SELECT SUM(total_amount) FROM fact_sales WHERE date >= :s AND date < :e",
+        'fact_inventory': "EXPLAIN SELECT SUM(stock_on_hand) FROM fact_inventory WHERE snapshot_date >= :s AND snapshot_date < :e"
+    }
+    scanned = {}
+    with engine.connect() as conn:
+        for table, query in queries.items():
+            plan = [row[0] for row in conn.execute(sqlalchemy.text(query), {'s': start_date, 'e': end_date})]
+            total = conn.execute(
+                sqlalchemy.text("SELECT COUNT(*) FROM pg_inherits WHERE inhparent = to_regclass(:t)"), {'t': table}
+            ).scalar()
+            scanned[table] = sorted(set(re.findall(rf'\b{table}_(?:\d{{6}}|default)\b', "\n".join(plan))))
+            logger.info(f"EXPLAIN {table} [{start_date} .. {end_date}) scans {len(scanned[table])}/{total} partitions:\n" + "\n".join(plan))
+    return scanned
+
 if __name__ == "__main__":
-    setup_database()
+    parser = argparse.ArgumentParser(description="Apply the database schema.")
+    parser.add_argument('--no-partitioning', action='store_true', help="Skip the partitioned fact tables.")
+    parser.add_argument('--explain', nargs=2, metavar=('START_DATE', 'END_DATE'), help="Show partition pruning for a date range.")
+    args = parser.parse_args()
+    
+    if args.explain:
+        explain_partition_pruning(sqlalchemy.create_engine(Config().DATABASE_URL), *args.explain)
+    else:
+        setup_database(partitioned=not args.no_partitioning)
@@ -0,0 +1,205 @@
+import argparse
+import logging
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.utils.db_utils import get_engine, reload_table
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SCHEMA_SQL = os.path.join(Config.BASE_DIR, 'sql', 'schema.sql') # Single definition of dim_date
+
+FISCAL_YEAR_START_MONTH = 9 # ASOS financial year runs September -> August (FY named by its end year)
+
+# Fact table -> date column feeding its integer date_key (YYYYMMDD)
+FACT_DATE_COLUMNS = {'fact_sales': 'date', 'fact_inventory': 'snapshot_date'}
+
+def to_date_key(dates):
+    """Vectorized datetime -> YYYYMMDD integer key."""
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    return (dates.year * 10000 + dates.month * 100 + dates.day).astype('int32')
+
+def _easter_sunday(years):
+    """Anonymous Gregorian algorithm, vectorized over an array of years."""
+    y = np.asarray(years)
+    a = y % 19
+    b, c = y // 100, y % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return pd.to_datetime(pd.DataFrame({'year': y, 'month': month, 'day': day}))
+
+def _nth_weekday(years, month, weekday, n):
+    """n-th (1-based, or -1 for last) given weekday (Mon=0) of a month, per year."""
+    years = np.asarray(years)
+    if n > 0:
+        first = pd.to_datetime(pd.DataFrame({'year': years, 'month': month, 'day': 1}))
+        offset = (weekday - first.dt.weekday) % 7 + 7 * (n - 1)
+        return first + pd.to_timedelta(offset, unit='D')
+    last = pd.to_datetime(pd.DataFrame({'year': years, 'month': month, 'day': 1})) + pd.offsets.MonthEnd(0)
+    return last - pd.to_timedelta((last.dt.weekday - weekday) % 7, unit='D')
+
+def uk_bank_holidays(years):
+    """
+    England & Wales bank holidays (with weekend substitute days) for the given years.
+    Returns a Series indexed by date with the holiday name.
+    """
+    years = np.asarray(sorted(set(years)))
+    easter = _easter_sunday(years)
+    new_year = pd.to_datetime(pd.DataFrame({'year': years, 'month': 1, 'day': 1}))
+    christmas = pd.to_datetime(pd.DataFrame({'year': years, 'month': 12, 'day': 25}))
+    
+    # Weekend substitutes: New Year Sat/Sun -> next Monday.
+    # Christmas / Boxing Day on a weekend move two days on, so they never share a substitute day.
+    new_year = new_year + pd.to_timedelta(np.select([new_year.dt.weekday == 5, new_year.dt.weekday == 6], [2, 1], 0), unit='D')
+    boxing = christmas + pd.Timedelta(days=1)
+    christmas_obs = christmas + pd.to_timedelta(np.where(christmas.dt.weekday >= 5, 2, 0), unit='D')
+    boxing_obs = boxing + pd.to_timedelta(np.where(boxing.dt.weekday >= 5, 2, 0), unit='D')
+    
+    holidays = pd.concat([
+        pd.Series("New Year's Day", index=new_year),
+        pd.Series('Good Friday', index=easter - pd.Timedelta(days=2)),
+        pd.Series('Easter Monday', index=easter + pd.Timedelta(days=1)),
+        pd.Series('Early May Bank Holiday', index=_nth_weekday(years, 5, 0, 1)),
+        pd.Series('Spring Bank Holiday', index=_nth_weekday(years, 5, 0, -1)),
+        pd.Series('Summer Bank Holiday', index=_nth_weekday(years, 8, 0, -1)),
+        pd.Series('Christmas Day', index=christmas_obs),
+        pd.Series('Boxing Day', index=boxing_obs)
+    ])
+    return holidays[~holidays.index.duplicated()].sort_index()
+
+def retail_events(years):
+    """Black Friday (day after the 4th Thursday of November) and Cyber Monday."""
+    black_friday = _nth_weekday(years, 11, 3, 4) + pd.Timedelta(days=1)
+    return pd.concat([
+        pd.Series('Black Friday', index=black_friday),
+        pd.Series('Cyber Monday', index=black_friday + pd.Timedelta(days=3))
+    ]).sort_index()
+
+def build_dim_date(start_date, end_date):
+    """
+    Vectorized calendar covering the full calendar years of [start_date, end_date],
+    so BI time intelligence (DATEADD, YTD) always sees contiguous years.
+    """
+    start = pd.Timestamp(start_date).to_period('Y').start_time
+    end = pd.Timestamp(end_date).to_period('Y').end_time.normalize()
+    dates = pd.date_range(start, end, freq='D')
+    iso = dates.isocalendar()
+    
+    fiscal_month = (dates.month - FISCAL_YEAR_START_MONTH) % 12 + 1
+    holidays = uk_bank_holidays(dates.year.unique())
+    events = retail_events(dates.year.unique())
+    
+    df = pd.DataFrame({
+        'date_key': to_date_key(dates),
+        'date': dates.date,
+        'year': dates.year,
+        'quarter': dates.quarter,
+        'month': dates.month,
+        'month_name': dates.month_name(),
+        'year_month': dates.strftime('%Y-%m'),
+        'day_of_month': dates.day,
+        'day_of_year': dates.dayofyear,
+        'day_of_week': dates.dayofweek + 1, # ISO: 1 = Monday
+        'day_name': dates.day_name(),
+        'iso_week': iso['week'].to_numpy().astype(int),
+        'iso_year': iso['year'].to_numpy().astype(int),
+        'week_start_date': (dates - pd.to_timedelta(dates.dayofweek, unit='D')).date,
+        'is_weekend': dates.dayofweek >= 5,
+        'fiscal_year': dates.year + (dates.month >= FISCAL_YEAR_START_MONTH).astype(int) if FISCAL_YEAR_START_MONTH > 1 else dates.year,
+        'fiscal_quarter': (fiscal_month - 1) // 3 + 1,
+        'fiscal_month': fiscal_month,
+        'is_holiday': dates.isin(holidays.index),
+        'holiday_name': holidays.reindex(dates).to_numpy(),
+        'retail_event': events.reindex(dates).to_numpy()
+    })
+    return df
+
+def ensure_date_key_columns(engine):
+    """Adds the integer date_key column (+ index) to existing fact tables."""
+    inspector = sqlalchemy.inspect(engine)
+    with engine.begin() as conn:
+        for table in FACT_DATE_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            conn.execute(sqlalchemy.text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS date_key INT"))
+            conn.execute(sqlalchemy.text(f"CREATE INDEX IF NOT EXISTS idx_{table}_date_key ON {table} (date_key)"))
+
+def dim_date_ddl():
+    """The CREATE TABLE dim_date statement of sql/schema.sql."""
+    with open(SCHEMA_SQL, 'r') as f:
+        match = re.search(r'CREATE TABLE IF NOT EXISTS dim_date \(.*?\n\);', f.read(), re.DOTALL)
+    if match is None:
+        raise RuntimeError(f"No dim_date table in {SCHEMA_SQL}")
+    return match.group(0)
+
+def ensure_dim_date_table(engine):
+    """dim_date as in sql/schema.sql; a table created earlier by to_sql gets its keys."""
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(dim_date_ddl()))
+        has_key = conn.execute(sqlalchemy.text(
+            "SELECT EXISTS (SELECT 1 FROM pg_index WHERE indrelid = to_regclass('dim_date') AND indisprimary)")).scalar()
+        if not has_key:
+            # Keys are rebuilt below anyway: empty the old copy so the constraints apply cleanly
+            conn.execute(sqlalchemy.text("TRUNCATE TABLE dim_date"))
+            conn.execute(sqlalchemy.text("ALTER TABLE dim_date ADD PRIMARY KEY (date_key)"))
+            conn.execute(sqlalchemy.text("ALTER TABLE dim_date ADD UNIQUE (date)"))
+
+def refresh_dim_date(engine):
+    """
+    Rebuilds dim_date over the range of all fact dates and backfills missing fact date_keys.
+    """
+    ensure_dim_date_table(engine)
+    ensure_date_key_columns(engine)
+    
+    with engine.begin() as conn:
+        bounds = []
+        for table, col in FACT_DATE_COLUMNS.items():
+            if sqlalchemy.inspect(conn).has_table(table):
+                bounds.extend(conn.execute(sqlalchemy.text(f"SELECT MIN({col})::date, MAX({col})::date FROM {table}")).one())
+            
+        # Backfill rows loaded without a key (older loads / external inserts)
+        for table, col in FACT_DATE_COLUMNS.items():
+            if sqlalchemy.inspect(conn).has_table(table):
+                updated = conn.execute(sqlalchemy.text(
+                    f"UPDATE {table} SET date_key = to_char({col}, 'YYYYMMDD')::int WHERE date_key IS NULL"
+                )).rowcount
+                if updated:
+                    logger.info(f"Backfilled date_key on {updated} {table} rows.")
+    
+    bounds = [b for b in bounds if b is not None]
+    if not bounds:
+        logger.warning("No fact dates found. dim_date not built.")
+        return None
+    
+    df_date = build_dim_date(min(bounds), max(bounds))
+    reload_table(df_date, 'dim_date', engine, method='multi')
+    logger.info(f"dim_date loaded: {len(df_date)} days ({df_date['date'].min()} .. {df_date['date'].max()}).")
+    return df_date
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build dim_date and the fact date_key columns.")
+    parser.parse_args(argv)
+    refresh_dim_date(get_engine())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlalchemy
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.utils.db_utils import get_engine
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Table -> monthly partition column (None = single file)
+EXPORT_TABLES = {
+    'dim_brand': None,
+    'dim_category': None,
+    'dim_color': None,
+    'dim_material': None,
+    'dim_size': None,
+    'dim_store': None,
+    'dim_customer': None,
+    'dim_product': None,
+    'dim_date': None,
+    'bridge_product_size': None,
+    'fact_product_attributes': None,
+    'fact_product_features': None,
+    'fact_sales': 'date',
+    'fact_inventory': 'snapshot_date',
+    'inv_history_base': None,
+    'inv_history_delta': 'snapshot_date',
+    'inv_snapshot_totals': None,
+    'agg_sales_daily': None,
+    'agg_orders_daily': None,
+    'agg_sales_hourly': None,
+    'etl_watermark': None,
+    'etl_load_generation': None,
+    'analysis_rfm_segments': None,
+    'analysis_basket_rules': None,
+    'analysis_forecast': None
+}
+CHUNK_SIZE = 200000 # Rows per server-side cursor fetch
+COMPRESSION = 'zstd'
+LATEST_POINTER = 'LATEST'
+
+# PostgreSQL type -> Arrow type (fixed schema so every chunk / partition file matches)
+PG_TO_ARROW = {
+    'smallint': pa.int64(), 'integer': pa.int64(), 'bigint': pa.int64(),
+    'numeric': pa.float64(), 'double precision': pa.float64(), 'real': pa.float64(),
+    'boolean': pa.bool_(),
+    'date': pa.date32(),
+    'timestamp without time zone': pa.timestamp('us'),
+    'timestamp with time zone': pa.timestamp('us', tz='UTC')
+}
+
+def arrow_schema(conn, table):
+    """Arrow schema from information_schema (text-like / unknown types map to string)."""
+    rows = conn.execute(sqlalchemy.text("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = :t ORDER BY ordinal_position
+    """), {'t': table}).fetchall()
+    return pa.schema([(name, PG_TO_ARROW.get(dtype, pa.string())) for name, dtype in rows])
+
+def _to_arrow(df, schema):
+    # Timestamps: drop tz / align resolution before the schema cast
+    for field in schema:
+        if pa.types.is_date32(field.type):
+            df[field.name] = pd.to_datetime(df[field.name]).dt.date
+        elif pa.types.is_string(field.type):
+            df[field.name] = df[field.name].astype('string')
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False, safe=False)
+
+def export_table(conn, table, partition_col, out_dir):
+    """
+    Streams one table through a server-side cursor into Parquet.
+    Partitioned tables are written Hive-style: <table>/month=YYYY-MM/part-0.parquet
+    """
+    schema = arrow_schema(conn, table)
+    writers = {}
+    rows = 0
+    
+    def writer_for(key):
+        if key not in writers:
+            if partition_col:
+                path = os.path.join(out_dir, table, f"month={key}", "part-0.parquet")
+            else:
+                path = os.path.join(out_dir, f"{table}.parquet")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writers[key] = (path, pq.ParquetWriter(path, schema, compression=COMPRESSION, use_dictionary=True))
+        return writers[key][1]
+    
+    query = sqlalchemy.text(f"SELECT * FROM {table}" + (f" ORDER BY {partition_col}" if partition_col else ""))
+    try:
+        for chunk in pd.read_sql(query, conn, chunksize=CHUNK_SIZE):
+            rows += len(chunk)
+            if partition_col:
+                months = pd.to_datetime(chunk[partition_col]).dt.strftime('%Y-%m')
+                for month, part in chunk.groupby(months, sort=False):
+                    writer_for(month).write_table(_to_arrow(part, schema))
+            else:
+                writer_for(None).write_table(_to_arrow(chunk, schema))
+        if not writers and not partition_col:
+            writer_for(None) # Empty table still gets a (schema-only) file
+    finally:
+        for _, writer in writers.values():
+            writer.close()
+    
+    files = sorted(os.path.relpath(path, out_dir) for path, _ in writers.values())
+    return {
+        'rows': rows,
+        'partition_by': f"month({partition_col})" if partition_col else None,
+        'files': files,
+        'bytes': sum(os.path.getsize(os.path.join(out_dir, f)) for f in files),
+        'columns': {field.name: str(field.type) for field in schema}
+    }
+
+def export_snapshot(engine, tables=None, snapshot_root=None, keep=3):
+    """
+    Writes every star-schema table to a compressed Parquet snapshot + manifest.json
+    and points SNAPSHOT_DIR/LATEST at it once complete.
+    
+    Returns:
+        str: The snapshot directory.
+    """
+    snapshot_root = snapshot_root or Config.SNAPSHOT_DIR
+    tables = tables or EXPORT_TABLES
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    out_dir = os.path.join(snapshot_root, stamp)
+    os.makedirs(out_dir, exist_ok=True)
+    
+    manifest = {
+        'snapshot': stamp,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'source': f"postgresql://{Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_NAME}",
+        'compression': COMPRESSION,
+        'tables': {}
+    }
+    
+    inspector = sqlalchemy.inspect(engine)
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=CHUNK_SIZE) as conn:
+        for table in tables:
+            if not inspector.has_table(table):
+                logger.warning(f"Skipping {table}: table not found.")
+                continue
+            partition_col = EXPORT_TABLES.get(table)
+            logger.info(f"Exporting {table}...")
+            manifest['tables'][table] = export_table(conn, table, partition_col, out_dir)
+            info = manifest['tables'][table]
+            logger.info(f"  {info['rows']} rows -> {len(info['files'])} file(s), {info['bytes'] / 1e6:.1f} MB")
+    
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    # Publish atomically, then prune old snapshots
+    pointer_tmp = os.path.join(snapshot_root, LATEST_POINTER + '.tmp')
+    with open(pointer_tmp, 'w') as f:
+        f.write(stamp)
+    os.replace(pointer_tmp, os.path.join(snapshot_root, LATEST_POINTER))
+    
+    snapshots = sorted(d for d in os.listdir(snapshot_root) if os.path.isdir(os.path.join(snapshot_root, d)))
+    for old in snapshots[:-keep] if keep else []:
+        shutil.rmtree(os.path.join(snapshot_root, old), ignore_errors=True)
+    
+    logger.info(f"Snapshot {stamp} written to {out_dir}")
+    return out_dir
+
+def latest_snapshot_dir(snapshot_root=None):
+    """Directory of the most recent complete snapshot, or None."""
+    snapshot_root = snapshot_root or Config.SNAPSHOT_DIR
+    pointer = os.path.join(snapshot_root, LATEST_POINTER)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        return os.path.join(snapshot_root, f.read().strip())
+
+def load_manifest(snapshot_dir):
+    with open(os.path.join(snapshot_dir, 'manifest.json')) as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the star schema to a Parquet snapshot.")
+    parser.add_argument('--tables', nargs='+', help="Subset of tables to export (default: all).")
+    parser.add_argument('--keep', type=int, default=3, help="Snapshots to keep (0 = keep all).")
+    args = parser.parse_args(argv)
+    export_snapshot(get_engine(), tables=args.tables, keep=args.keep)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,9 @@
 import pandas as pd
 import numpy as np
-import sqlalchemy
+import argparse
 from datetime import datetime, timedelta
-import random
 import sys
 import os
-import uuid
 
 # Add project root to sys.path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,7 +12,9 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from src.config import Config
-from src.utils.db_utils import get_engine, insert_data, logger
+from src.utils.db_utils import get_engine, insert_data, reload_table, logger
+from src.etl.refresh_rollups import refresh_rollups
+from src.etl.build_dim_date import ensure_date_key_columns, refresh_dim_date, to_date_key
 
 # Constants
 NUM_CUSTOMERS = 1000
@@ -28,6 +28,36 @@ STORES = [
 ]
 START_DATE = datetime.now() - timedelta(days=365)
 END_DATE = datetime.now()
+PAYMENT_METHODS = ['Credit Card', 'Debit Card', 'PayPal', 'Klarna', 'Apple Pay']
+
+# Inventory: full coverage (every product in every store at every snapshot).
+# 'balance' = stock runs down with the generated sales and is restocked at the reorder point
+# 'random'  = independent random stock level per snapshot (legacy behaviour)
+INVENTORY_MODE = 'balance'
+NUM_SNAPSHOTS = 12 # Monthly history, plus one snapshot for today
+
+# Workload Profiles (Benchmark Datasets)
+# zipf_s:             product popularity exponent (0 = every product equally hot)
+# pareto_alpha:       customer purchase-frequency tail (0 = uniform, ~1.16 = 80/20 rule)
+# repeat_rate:        share of line items re-buying one of the customer's favourite products
+# online_weight:      order traffic of the Online store relative to one Physical store
+# seasonal_amplitude: peak-month uplift of each category's demand (0 = flat)
+PROFILE_DEFAULTS = {
+    'zipf_s': 0.0,
+    'pareto_alpha': 0.0,
+    'repeat_rate': 0.0,
+    'online_weight': 1.0,
+    'seasonal_amplitude': 0.0
+}
+WORKLOAD_PROFILES = {
+    'uniform': {}, # Legacy behaviour: no hot spots
+    'zipf_products': {'zipf_s': 1.1},
+    'pareto_customers': {'pareto_alpha': 1.16, 'repeat_rate': 0.3},
+    'store_traffic': {'online_weight': 6.0},
+    'seasonal_categories': {'seasonal_amplitude': 0.8},
+    'realistic': {'zipf_s': 1.1, 'pareto_alpha': 1.16, 'repeat_rate': 0.3, 'online_weight': 6.0, 'seasonal_amplitude': 0.8}
+}
+NUM_FAVOURITES = 5 # Favourite products per customer (repeat purchases)
 
 def generate_stores(engine):
     logger.info("Generating Stores...")
@@ -36,170 +66,311 @@ def generate_stores(engine):
     insert_data(df_stores, 'dim_store', engine, if_exists='replace')
     return df_stores
 
-def generate_customers(engine):
-    logger.info("Generating Customers...")
+def generate_customers(engine, num_customers=NUM_CUSTOMERS, rng=None):
+    rng = rng or np.random.default_rng()
+    logger.info(f"Generating {num_customers} Customers...")
     regions = ['London', 'South East', 'North West', 'West Midlands', 'Scotland', 'Wales', 'Northern Ireland']
     
-    customers = []
-    for i in range(1, NUM_CUSTOMERS + 1):
-        customers.append({
-            'customer_id': i,
-            'gender': random.choice(['Male', 'Female', 'Non-Binary']),
-            'age': random.randint(18, 65),
-            'region': random.choice(regions),
-            'join_date': START_DATE - timedelta(days=random.randint(0, 1000)),
-            'loyalty_score': random.randint(1, 100)
-        })
-    
-    df_customers = pd.DataFrame(customers)
-    insert_data(df_customers, 'dim_customer', engine, if_exists='replace')
+    df_customers = pd.DataFrame({
+        'customer_id': np.arange(1, num_customers + 1),
+        'gender': rng.choice(['Male', 'Female', 'Non-Binary'], size=num_customers),
+        'age': rng.integers(18, 66, size=num_customers),
+        'region': rng.choice(regions, size=num_customers),
+        'join_date': START_DATE - pd.to_timedelta(rng.integers(0, 1001, size=num_customers), unit='D'),
+        'loyalty_score': rng.integers(1, 101, size=num_customers)
+    })
+    insert_data(df_customers, 'dim_customer', engine, if_exists='replace', method='copy')
     return df_customers
 
-def generate_sales_and_inventory(engine):
+def resolve_profile(name, **overrides):
+    """Merge a named workload profile over the defaults; CLI overrides win when given."""
+    if name not in WORKLOAD_PROFILES:
+        raise ValueError(f"Unknown workload profile: {name}. Choose from {list(WORKLOAD_PROFILES)}")
+    params = {**PROFILE_DEFAULTS, **WORKLOAD_PROFILES[name]}
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    return params
+
+def _normalize(weights):
+    weights = np.asarray(weights, dtype=float)
+    return weights / weights.sum()
+
+def generate_sales(products, stores, num_orders=TARGET_NUM_ORDERS, num_customers=NUM_CUSTOMERS, profile=None, rng=None):
+    """
+    Vectorized order/line-item sampler driven by a workload profile.
+    
+    Args:
+        products (pd.DataFrame): dim_product rows (product_id, base_price, category_id).
+        stores (pd.DataFrame): dim_store rows (store_id, type).
+        num_orders (int): Unique orders to generate.
+        num_customers (int): Customer id range 1..num_customers.
+        profile (dict): Output of resolve_profile(); defaults to 'uniform'.
+        rng (np.random.Generator): Optional seeded generator.
+    """
+    profile = profile or resolve_profile('uniform')
+    rng = rng or np.random.default_rng()
+    logger.info(f"Generating Sales for target {num_orders} Orders (profile={profile})...")
+    
+    # --- Order Header Level ---
+    # Date Weighted Selection: Higher in Q4
+    date_range = pd.date_range(START_DATE, END_DATE)
+    date_weights = np.where(date_range.month.isin([11, 12]), 1.5, np.where(date_range.month.isin([1, 2]), 0.8, 1.0))
+    order_dates = date_range[rng.choice(len(date_range), size=num_orders, p=_normalize(date_weights))]
+    # Process orders chronologically so transaction_id grows with time
+    order_dates = order_dates.sort_values()
+    # Random time between 8am-10pm
+    order_times = (order_dates.normalize()
+                   + pd.to_timedelta(rng.integers(8, 23, size=num_orders), unit='h')
+                   + pd.to_timedelta(rng.integers(0, 60, size=num_orders), unit='m'))
+    
+    # Store traffic weighting
+    store_weights = np.where(stores['type'].to_numpy() == 'Online', profile['online_weight'], 1.0)
+    order_store = stores['store_id'].to_numpy()[rng.choice(len(stores), size=num_orders, p=_normalize(store_weights))]
+    
+    # Customer frequency: Pareto propensity gives a heavy tail of repeat buyers
+    if profile['pareto_alpha'] > 0:
+        customer_weights = rng.pareto(profile['pareto_alpha'], size=num_customers) + 1
+    else:
+        customer_weights = np.ones(num_customers)
+    customer_p = _normalize(customer_weights)
+    order_customer = rng.choice(num_customers, size=num_orders, p=customer_p) + 1
+    
+    order_pay = rng.choice(PAYMENT_METHODS, size=num_orders)
+    order_ids = 'ORD-' + pd.Series(rng.choice(16**8, size=num_orders, replace=False)).map('{:08X}'.format)
+    
+    # --- Line Item Level ---
+    # Basket Size (1-5 items)
+    basket_sizes = rng.choice([1, 2, 3, 4, 5], size=num_orders, p=[0.65, 0.2, 0.1, 0.03, 0.02])
+    line_order = np.repeat(np.arange(num_orders), basket_sizes)
+    n_lines = len(line_order)
+    
+    # Product popularity: Zipf over a random ranking of the catalog
+    n_products = len(products)
+    ranks = rng.permutation(n_products) + 1
+    popularity = _normalize(1.0 / ranks ** profile['zipf_s'])
+    
+    line_month = order_dates.month.to_numpy()[line_order]
+    line_product = np.empty(n_lines, dtype=np.int64)
+    if profile['seasonal_amplitude'] > 0:
+        # Category seasonality: each category peaks in its own month
+        cat_codes, _ = pd.factorize(products['category_id'])
+        peak_month = rng.integers(1, 13, size=cat_codes.max() + 1)[cat_codes]
+        for month in range(1, 13):
+            in_month = line_month == month
+            if not in_month.any():
+                continue
+            uplift = 1 + profile['seasonal_amplitude'] * np.cos(2 * np.pi * (month - peak_month) / 12)
+            line_product[in_month] = rng.choice(n_products, size=int(in_month.sum()), p=_normalize(popularity * uplift))
+    else:
+        line_product[:] = rng.choice(n_products, size=n_lines, p=popularity)
+    
+    # Repeat purchases: some lines re-buy one of the customer's favourites
+    if profile['repeat_rate'] > 0:
+        favourites = rng.choice(n_products, size=(num_customers, NUM_FAVOURITES), p=popularity)
+        repeat = rng.random(n_lines) < profile['repeat_rate']
+        line_customer = order_customer[line_order[repeat]] - 1
+        line_product[repeat] = favourites[line_customer, rng.integers(0, NUM_FAVOURITES, size=int(repeat.sum()))]
+    
+    # Pricing Logic
+    # Discount affects PRICE, but not COST
+    qty = rng.choice([1, 2], size=n_lines, p=[0.9, 0.1])
+    discount_pct = rng.choice([0, 0.1, 0.2, 0.5], size=n_lines, p=[0.7, 0.15, 0.1, 0.05])
+    base_price = products['base_price'].astype(float).to_numpy()[line_product]
+    unit_price = np.round(base_price * (1 - discount_pct), 2)
+    total_amount = np.round(unit_price * qty, 2)
+    
+    # Cost Logic (Stable COGS)
+    # COGS is typically 40-60% of BASE price, unaffected by promo
+    margin_pct = rng.uniform(0.4, 0.6, size=n_lines)
+    unit_cost = np.round(base_price * (1 - margin_pct), 2)
+    total_cost = np.round(unit_cost * qty, 2)
+    
+    df_sales = pd.DataFrame({
+        'transaction_id': np.arange(1, n_lines + 1),
+        'order_id': order_ids.to_numpy()[line_order],
+        'date': order_dates.values[line_order],
+        'time': order_times.values[line_order],
+        'store_id': order_store[line_order],
+        'customer_id': order_customer[line_order],
+        'product_id': products['product_id'].to_numpy()[line_product],
+        'quantity': qty,
+        'unit_price': unit_price,
+        'total_amount': total_amount,
+        'unit_cost': unit_cost,
+        'total_cost': total_cost,
+        'profit': np.round(total_amount - total_cost, 2),
+        'payment_method': order_pay[line_order],
+        # Channel removed, derived from store type in BI
+        'date_key': to_date_key(order_dates).to_numpy()[line_order]
+    })
+    return df_sales
+
+def generate_sales_and_inventory(engine, num_orders=TARGET_NUM_ORDERS, num_customers=NUM_CUSTOMERS, profile=None, inventory_mode=INVENTORY_MODE, rng=None):
     logger.info("Reading Products...")
     products = pd.read_sql("SELECT product_id, base_price, category_id, brand_id FROM dim_product", engine)
     
     if products.empty:
         logger.error("No products found! Please load product data first.")
         return
-
-    stores = pd.read_sql("SELECT store_id, type FROM dim_store", engine)
-    customer_ids = range(1, NUM_CUSTOMERS + 1)
     
-    # --- 1. Generate Sales (Target Based) ---
-    logger.info(f"Generating Sales for target {TARGET_NUM_ORDERS} Orders...")
-    
-    sales_data = []
-    product_list = products.to_dict('records')
-    payment_methods = ['Credit Card', 'Debit Card', 'PayPal', 'Klarna', 'Apple Pay']
-    
-    # Date Weighted Selection
-    date_range = pd.date_range(START_DATE, END_DATE).to_pydatetime().tolist()
-    # Weights: Higher in Q4
-    weights = [1.5 if d.month in [11, 12] else (0.8 if d.month in [1, 2] else 1.0) for d in date_range]
-    
-    # Sample actual dates for orders
-    selected_dates = random.choices(date_range, weights=weights, k=TARGET_NUM_ORDERS)
+    products = products.dropna(subset=['base_price'])
+    stores = pd.read_sql("SELECT store_id, type FROM dim_store", engine)
     
-    transaction_counter = 1
+    ensure_date_key_columns(engine)
     
-    for order_date in selected_dates:
-        order_id = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-        store = stores.sample(1).iloc[0]
-        customer_id = random.choice(customer_ids)
-        pay_method = random.choice(payment_methods)
-        # Random time between 8am-10pm
-        order_time = order_date.replace(hour=random.randint(8, 22), minute=random.randint(0, 59))
-        
-        # Basket Size (1-5 items)
-        num_items = np.random.choice([1, 2, 3, 4, 5], p=[0.65, 0.2, 0.1, 0.03, 0.02])
-        
-        for _ in range(num_items):
-            prod = random.choice(product_list)
-            qty = np.random.choice([1, 2], p=[0.9, 0.1])
-            
-            # Pricing Logic
-            # Discount affects PRICE, but not COST
-            discount_pct = np.random.choice([0, 0.1, 0.2, 0.5], p=[0.7, 0.15, 0.1, 0.05])
-            base_price = float(prod['base_price'])
-            
-            unit_price = round(base_price * (1 - discount_pct), 2)
-            total_amount = round(unit_price * qty, 2)
-            
-            # Cost Logic (Stable COGS)
-            # COGS is typically 40-60% of BASE price, unaffected by promo
-            margin_pct = random.uniform(0.4, 0.6) 
-            unit_cost = round(base_price * (1 - margin_pct), 2)
-            total_cost = round(unit_cost * qty, 2)
-            
-            profit = round(total_amount - total_cost, 2)
-            
-            sales_data.append({
-                'transaction_id': transaction_counter, 
-                'order_id': order_id,
-                'date': order_date,
-                'time': order_time,
-                'store_id': store['store_id'],
-                'customer_id': customer_id,
-                'product_id': prod['product_id'],
-                'quantity': qty,
-                'unit_price': unit_price,
-                'total_amount': total_amount,
-                'unit_cost': unit_cost,
-                'total_cost': total_cost,
-                'profit': profit,
-                'payment_method': pay_method
-                # Channel removed, derived from store type in BI
-            })
-            transaction_counter += 1
-            
-    df_sales = pd.DataFrame(sales_data)
-    insert_data(df_sales, 'fact_sales', engine, if_exists='replace')
+    # --- 1. Generate Sales (Target Based) ---
+    df_sales = generate_sales(products, stores, num_orders, num_customers, profile, rng)
+    reload_table(df_sales, 'fact_sales', engine, partition_col='date')
     
     # --- 2. Generate Inventory (Historical Snapshots) ---
-    logger.info("Generating Inventory Snapshots (Historical + Current)...")
-    inventory_data = []
-    
-    # Snapshot dates: 1st of every month in the last 12 months + Today
-    snapshot_dates = [START_DATE + timedelta(days=30*i) for i in range(12)]
-    snapshot_dates.append(datetime.now())
+    df_inventory = generate_inventory(products, stores, df_sales, mode=inventory_mode, rng=rng)
+    reload_table(df_inventory, 'fact_inventory', engine, partition_col='snapshot_date')
     
-    # Optimization: Not every product is in every store.
-    # Online store has 90% products, Physical stores have 30% products
-    # To reduce size: Online (Store 1) + 1 Physical Store (Store 2) get full history?
-    # Or just sample products? 
-    # User claimed 135k rows. 13 snapshots.
-    # 135,000 / 13 ~= 10,000 rows per snapshot.
-    # We have 30k products. So we can't snapshot ALL products for ALL stores.
-    # Let's snapshot Top 2000 products for all stores (~10k rows) per month?
-    # OR snapshot ALL products only for Online Store? 
-    # Let's stick to the previous logic but apply to limited items for history to match volume.
-    
-    # Let's allow growing volume. 
-    # If we do full coverage: 5 stores * 30k products = 150k rows PER SNAPSHOT. 
-    # 13 snapshots = 2 Million rows. 
-    # User loved the "135k" number. 
-    # Let's generate ~10k records per snapshot (Sampled products).
-    
-    ids = [p['product_id'] for p in product_list]
-    sampled_ids = random.sample(ids, k=min(2000, len(ids))) # Track 2000 core items across time
-    
-    for snap_date in snapshot_dates:
-        s_date = snap_date.date()
-        for _, store in stores.iterrows():
-             # Physical stores only track a subset of the subset
-             if store['type'] == 'Physical':
-                 current_store_ids = random.sample(sampled_ids, k=500)
-             else:
-                 current_store_ids = sampled_ids # Online tracks all 2000 core items
-                 
-             for pid in current_store_ids:
-                inventory_data.append({
-                    'snapshot_date': s_date,
-                    'store_id': store['store_id'],
-                    'product_id': pid,
-                    'stock_on_hand': random.randint(0, 100),
-                    'reorder_point': random.randint(5, 10),
-                    'last_restock_date': snap_date - timedelta(days=random.randint(0, 30))
-                })
-                
-    df_inventory = pd.DataFrame(inventory_data)
-    insert_data(df_inventory, 'fact_inventory', engine, if_exists='replace')
+    # Calendar over the new fact date range
+    refresh_dim_date(engine)
     
     # --- 3. Verification Log ---
     logger.info("--- Data Verification ---")
-    logger.info(f"Target Orders: {TARGET_NUM_ORDERS}")
+    logger.info(f"Target Orders: {num_orders}")
     logger.info(f"Actual Unique Orders: {df_sales['order_id'].nunique()}")
     logger.info(f"Actual Line Items: {len(df_sales)}")
     logger.info(f"Inventory Snapshots Rows: {len(df_inventory)}")
     logger.info(f"Unique Products in Inventory: {df_inventory['product_id'].nunique()}")
+    # Skew check: share of revenue from the top 1% products / top 20% customers
+    product_rev = df_sales.groupby('product_id')['total_amount'].sum().sort_values(ascending=False)
+    customer_rev = df_sales.groupby('customer_id')['total_amount'].sum().sort_values(ascending=False)
+    top_products = product_rev.head(max(1, len(products) // 100)).sum() / product_rev.sum()
+    top_customers = customer_rev.head(max(1, num_customers // 5)).sum() / customer_rev.sum()
+    logger.info(f"Top 1% Products Revenue Share: {top_products:.1%}")
+    logger.info(f"Top 20% Customers Revenue Share: {top_customers:.1%}")
 
-def main():
+def build_snapshot_dates():
+    """Snapshot dates: every 30 days over the last year + Today."""
+    snapshot_dates = [START_DATE + timedelta(days=30*i) for i in range(NUM_SNAPSHOTS)]
+    snapshot_dates.append(datetime.now())
+    return pd.DatetimeIndex(snapshot_dates)
+
+def generate_inventory(products, stores, df_sales=None, mode=INVENTORY_MODE, rng=None):
+    """
+    Build the full snapshot x store x product inventory grid with NumPy broadcasting.
+    5 stores * 30k products * 13 snapshots (~2M rows) takes seconds instead of hours.
+    
+    Args:
+        products (pd.DataFrame): dim_product rows (needs product_id).
+        stores (pd.DataFrame): dim_store rows (needs store_id).
+        df_sales (pd.DataFrame): Generated fact_sales, drives stock depletion in 'balance' mode.
+        mode (str): 'balance' or 'random'.
+        rng (np.random.Generator): Optional seeded generator.
+    """
+    rng = rng or np.random.default_rng()
+    logger.info(f"Generating Inventory Snapshots (Full Coverage, mode={mode})...")
+    
+    snapshot_dates = build_snapshot_dates()
+    store_ids = stores['store_id'].to_numpy()
+    product_ids = products['product_id'].to_numpy()
+    n_snap, n_store, n_prod = len(snapshot_dates), len(store_ids), len(product_ids)
+    shape = (n_snap, n_store, n_prod)
+    snap_values = snapshot_dates.values[:, None, None] # Broadcasts against (store, product)
+    
+    if mode == 'random':
+        stock = rng.integers(0, 101, size=shape)
+        reorder_point = rng.integers(5, 11, size=shape)
+        last_restock = snap_values - rng.integers(0, 31, size=shape).astype('timedelta64[D]')
+    elif mode == 'balance':
+        # Units sold per (snapshot period, store, product)
+        # A sale on day d depletes the first snapshot taken on/after d
+        sold = np.zeros(n_snap * n_store * n_prod, dtype=np.int64)
+        if df_sales is not None and not df_sales.empty:
+            period = snapshot_dates.searchsorted(pd.to_datetime(df_sales['date']).values)
+            s_idx = pd.Index(store_ids).get_indexer(df_sales['store_id'])
+            p_idx = pd.Index(product_ids).get_indexer(df_sales['product_id'])
+            valid = (period < n_snap) & (s_idx >= 0) & (p_idx >= 0)
+            flat = np.ravel_multi_index((period[valid], s_idx[valid], p_idx[valid]), shape)
+            sold = np.bincount(flat, weights=df_sales['quantity'].to_numpy()[valid], minlength=sold.size).astype(np.int64)
+        sold = sold.reshape(shape)
+        
+        # Static replenishment policy per store/product
+        reorder_level = rng.integers(5, 11, size=(n_store, n_prod))
+        order_up_to = rng.integers(40, 101, size=(n_store, n_prod))
+        
+        # Running balance: one vectorized step per snapshot (13 steps, not 2M rows)
+        balance = rng.integers(0, order_up_to + 1)
+        restocked_at = snapshot_dates.values[0] - rng.integers(0, 31, size=(n_store, n_prod)).astype('timedelta64[D]')
+        
+        stock = np.empty(shape, dtype=np.int64)
+        last_restock = np.empty(shape, dtype='datetime64[ns]')
+        for i in range(n_snap):
+            balance = np.maximum(balance - sold[i], 0) # Lost sales once out of stock
+            stock[i] = balance
+            last_restock[i] = restocked_at
+            
+            # Lines at/below the reorder point are topped up after the count (1-7 days lead time)
+            low = balance <= reorder_level
+            balance = np.where(low, order_up_to, balance)
+            lead = rng.integers(1, 8, size=int(low.sum())).astype('timedelta64[D]')
+            restocked_at[low] = snapshot_dates.values[i] + lead
+        reorder_point = np.broadcast_to(reorder_level, shape)
+    else:
+        raise ValueError(f"Unknown inventory mode: {mode}")
+    
+    snap_dates = np.array([d.date() for d in snapshot_dates], dtype=object)
+    df_inventory = pd.DataFrame({
+        'snapshot_date': np.repeat(snap_dates, n_store * n_prod),
+        'store_id': np.tile(np.repeat(store_ids, n_prod), n_snap),
+        'product_id': np.tile(product_ids, n_snap * n_store),
+        'stock_on_hand': stock.ravel(),
+        'reorder_point': reorder_point.ravel(),
+        'last_restock_date': last_restock.ravel(),
+        'date_key': np.repeat(to_date_key(snapshot_dates).to_numpy(), n_store * n_prod)
+    })
+    return df_inventory
+
+def _amplitude(value):
+    # 1 + a * cos(...) must stay positive: a >= 1 gives zero or negative demand weights
+    try:
+        a = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a number: {value}")
+    if not 0 <= a < 1:
+        raise argparse.ArgumentTypeError(f"must be in [0, 1), got {value}")
+    return a
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic stores, customers, sales and inventory.")
+    parser.add_argument('--profile', default='uniform', choices=list(WORKLOAD_PROFILES), help="Workload profile (benchmark dataset shape).")
+    parser.add_argument('--orders', type=int, default=TARGET_NUM_ORDERS, help="Unique orders to generate.")
+    parser.add_argument('--customers', type=int, default=NUM_CUSTOMERS, help="Number of customers.")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for reproducible datasets.")
+    parser.add_argument('--inventory-mode', default=INVENTORY_MODE, choices=['balance', 'random'])
+    parser.add_argument('--refresh-rollups', action='store_true', help="Rebuild the sales rollup tables afterwards.")
+    # Profile overrides
+    parser.add_argument('--zipf-s', type=float, default=None)
+    parser.add_argument('--pareto-alpha', type=float, default=None)
+    parser.add_argument('--repeat-rate', type=float, default=None)
+    parser.add_argument('--online-weight', type=float, default=None)
+    parser.add_argument('--seasonal-amplitude', type=_amplitude, default=None, help="Peak-month demand uplift, in [0, 1).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile = resolve_profile(
+        args.profile,
+        zipf_s=args.zipf_s,
+        pareto_alpha=args.pareto_alpha,
+        repeat_rate=args.repeat_rate,
+        online_weight=args.online_weight,
+        seasonal_amplitude=args.seasonal_amplitude
+    )
+    rng = np.random.default_rng(args.seed)
+    
     engine = get_engine()
     generate_stores(engine)
-    generate_customers(engine)
-    generate_sales_and_inventory(engine)
-    logger.info("Data Generation Complete (Enterprise Mode V2).")
+    generate_customers(engine, args.customers, rng)
+    generate_sales_and_inventory(engine, args.orders, args.customers, profile, args.inventory_mode, rng)
+    logger.info(f"Data Generation Complete (Enterprise Mode V2, profile={args.profile}).")
+    
+    if args.refresh_rollups:
+        # fact_sales was fully reloaded: rebuild rather than trust the old watermark
+        refresh_rollups(engine, full=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,332 @@
+import argparse
+import logging
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.utils.db_utils import GENERATION_TABLE, get_engine, insert_data, load_generation
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# fact_inventory repeats every store x product row on every snapshot, although most lines
+# don't move between two counts. The history keeps the first snapshot in full and then
+# only the lines that changed (a NULL stock_on_hand marks a line that disappeared).
+HISTORY_SQL = os.path.join(Config.BASE_DIR, 'src', 'sql', 'inventory_history.sql')
+BASE_TABLE = 'inv_history_base'
+DELTA_TABLE = 'inv_history_delta'
+TOTALS_TABLE = 'inv_snapshot_totals' # One row per snapshot x store, written for every snapshot
+
+KEY_COLUMNS = ['store_id', 'product_id']
+VALUE_COLUMNS = ['stock_on_hand', 'reorder_point', 'last_restock_date']
+HISTORY_COLUMNS = ['snapshot_date'] + KEY_COLUMNS + VALUE_COLUMNS
+
+SNAPSHOT_SQL = """
+    SELECT store_id, product_id, stock_on_hand, reorder_point, last_restock_date
+    FROM fact_inventory WHERE snapshot_date = :day
+"""
+
+def _keys(df):
+    # (store_id, product_id) packed into one int64, so joins become array lookups
+    return (df['store_id'].to_numpy(np.int64) << 32) | df['product_id'].to_numpy(np.int64)
+
+def _comparable(df):
+    # Value columns as int64 arrays (NaT / NULL -> sentinel) so equality is exact
+    out = []
+    for col in VALUE_COLUMNS:
+        values = df[col]
+        if col == 'last_restock_date':
+            values = pd.to_datetime(values).to_numpy('datetime64[ns]').view(np.int64)
+        else:
+            values = values.fillna(np.iinfo(np.int64).min).to_numpy(np.int64)
+        out.append(values)
+    return out
+
+def diff_snapshot(prev, curr, day):
+    """
+    Change rows turning snapshot `prev` into `curr` (both full store x product frames):
+    new or changed lines with their new values, and a NULL-stock row for each line gone.
+    """
+    prev_keys, curr_keys = _keys(prev), _keys(curr)
+    idx = pd.Index(prev_keys).get_indexer(curr_keys)
+    matched = idx >= 0
+    changed = ~matched
+    for old, new in zip(_comparable(prev), _comparable(curr)):
+        changed[matched] |= old[idx[matched]] != new[matched]
+    rows = curr.loc[changed, KEY_COLUMNS + VALUE_COLUMNS]
+
+    gone = pd.Index(curr_keys).get_indexer(prev_keys) < 0
+    if gone.any():
+        tombstones = prev.loc[gone, KEY_COLUMNS].assign(stock_on_hand=None, reorder_point=None, last_restock_date=pd.NaT)
+        rows = pd.concat([rows, tombstones], ignore_index=True)
+    rows.insert(0, 'snapshot_date', day)
+    return rows.reset_index(drop=True)
+
+def snapshot_totals(curr, day):
+    """Per-store stock, line count and low-stock lines of one full snapshot."""
+    stock = curr['stock_on_hand'].astype(np.int64)
+    totals = pd.DataFrame({
+        'store_id': curr['store_id'].to_numpy(),
+        'stock_on_hand': stock.to_numpy(),
+        'lines': 1,
+        'low_stock_lines': (stock <= curr['reorder_point']).astype(np.int64).to_numpy()
+    }).groupby('store_id', as_index=False).sum()
+    totals.insert(0, 'snapshot_date', day)
+    return totals
+
+class InventoryHistory:
+    """
+    Base snapshot + change rows, reconstructed without touching fact_inventory.
+    Rows are ordered by snapshot date, so "the state of a line on day d" is the last
+    row of that line at or before d: a running maximum of row positions per line.
+    """
+    def __init__(self, base, delta, totals):
+        rows = pd.concat([base[HISTORY_COLUMNS], delta[HISTORY_COLUMNS]], ignore_index=True)
+        rows['snapshot_date'] = pd.to_datetime(rows['snapshot_date'])
+        rows = rows.sort_values('snapshot_date', kind='stable', ignore_index=True) # Base rows stay first
+
+        self.totals = totals.assign(snapshot_date=pd.to_datetime(totals['snapshot_date']))
+        # Every snapshot has totals, also the ones where nothing changed
+        self.dates = pd.DatetimeIndex(np.sort(self.totals['snapshot_date'].unique()))
+        self.key_codes, keys = pd.factorize(_keys(rows))
+        self.store_ids = (keys >> 32).astype(np.int64)
+        self.product_ids = (keys & 0xFFFFFFFF).astype(np.int64)
+        self.date_idx = self.dates.searchsorted(rows['snapshot_date'].to_numpy())
+        self.rows = rows
+        self.present = rows['stock_on_hand'].notna().to_numpy()
+
+    @property
+    def end(self):
+        return self.dates[-1] if len(self.dates) else None
+
+    def _gather(self, positions, snapshot_date):
+        # positions: row position per (date x) line, -1 = not seen yet; lines that are gone are dropped
+        keep = positions >= 0
+        keep[keep] = self.present[positions[keep]]
+        slots = np.flatnonzero(keep)
+        line = slots % len(self.store_ids)
+        picked = self.rows.iloc[positions[slots]]
+        return pd.DataFrame({
+            'snapshot_date': snapshot_date[slots] if np.ndim(snapshot_date) else snapshot_date,
+            'store_id': self.store_ids[line],
+            'product_id': self.product_ids[line],
+            'stock_on_hand': picked['stock_on_hand'].to_numpy(np.int64),
+            'reorder_point': picked['reorder_point'].to_numpy(np.int64),
+            'last_restock_date': pd.to_datetime(picked['last_restock_date']).to_numpy()
+        })
+
+    def as_of(self, day):
+        """Full store x product stock of the latest snapshot taken on or before `day`."""
+        upto = self.dates.searchsorted(pd.Timestamp(day), side='right')
+        if upto == 0:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        cut = np.searchsorted(self.date_idx, upto) # Rows are date-ordered: a prefix
+        positions = np.full(len(self.store_ids), -1, dtype=np.int64)
+        np.maximum.at(positions, self.key_codes[:cut], np.arange(cut))
+        return self._gather(positions, self.dates[upto - 1])
+
+    def snapshots(self):
+        """
+        Every snapshot in full (the rows fact_inventory holds): the change positions are laid
+        out as a date x line grid and carried forward with one cumulative maximum.
+        """
+        n_dates, n_keys = len(self.dates), len(self.store_ids)
+        grid = np.full((n_dates, n_keys), -1, dtype=np.int32 if len(self.rows) < 2 ** 31 else np.int64)
+        grid[self.date_idx, self.key_codes] = np.arange(len(self.rows)) # At most one row per (date, line)
+        np.maximum.accumulate(grid, axis=0, out=grid)
+        dates = np.repeat(self.dates.values, n_keys)
+        return self._gather(grid.ravel(), dates)
+
+def read_history(query):
+    """
+    InventoryHistory from the history tables, or None when they were never built.
+    `query(sql, params)` returns a DataFrame (a dashboard backend's query, or pd.read_sql on an engine).
+    """
+    try:
+        totals = query(f"SELECT snapshot_date, store_id, stock_on_hand, lines, low_stock_lines FROM {TOTALS_TABLE}", None)
+    except Exception:
+        return None
+    if totals.empty:
+        return None
+    columns = ', '.join(HISTORY_COLUMNS)
+    base = query(f"SELECT {columns} FROM {BASE_TABLE}", None)
+    delta = query(f"SELECT {columns} FROM {DELTA_TABLE}", None)
+    return InventoryHistory(base, delta, totals)
+
+def _engine_query(engine):
+    return lambda sql, params: pd.read_sql(sqlalchemy.text(sql), engine, params=params or {})
+
+# Lines and stock per snapshot: in fact_inventory (what the history must reproduce) and in the history
+SUMMARY_SQL = """
+    SELECT snapshot_date, COUNT(*) AS lines, SUM(stock_on_hand) AS stock_on_hand
+    FROM fact_inventory GROUP BY 1 ORDER BY 1
+"""
+TOTALS_SUMMARY_SQL = f"""
+    SELECT snapshot_date, SUM(lines) AS lines, SUM(stock_on_hand) AS stock_on_hand
+    FROM {TOTALS_TABLE} GROUP BY 1 ORDER BY 1
+"""
+
+def snapshot_summary(engine):
+    """Lines and stock per snapshot in fact_inventory (what the history must reproduce)."""
+    df = pd.read_sql(SUMMARY_SQL, engine)
+    df['snapshot_date'] = pd.to_datetime(df['snapshot_date'])
+    return df
+
+def covered_end(summary, totals):
+    """
+    Last snapshot of the history `totals` (per snapshot, or per snapshot x store) when they match
+    fact_inventory's `summary` snapshot for snapshot - same dates, lines and stock - else None.
+    A reload with the same store x product x snapshot grid (e.g. another --seed) keeps the line
+    counts but not the stock sums.
+    """
+    if totals.empty:
+        return None
+    totals = totals.assign(snapshot_date=pd.to_datetime(totals['snapshot_date']))
+    totals = totals.groupby('snapshot_date', as_index=False)[['lines', 'stock_on_hand']].sum()
+    summary = summary.assign(snapshot_date=pd.to_datetime(summary['snapshot_date']))
+    source = summary[summary['snapshot_date'] <= totals['snapshot_date'].max()].reset_index(drop=True)
+    if len(source) != len(totals) or not (
+        (source['snapshot_date'] == totals['snapshot_date']).all()
+        and (source['lines'].astype(np.int64) == totals['lines'].astype(np.int64)).all()
+        and (source['stock_on_hand'].astype(np.int64) == totals['stock_on_hand'].astype(np.int64)).all()
+    ):
+        return None
+    return totals['snapshot_date'].max()
+
+def history_end(engine, summary):
+    """
+    Last snapshot the stored history covers, or None when it has to be rebuilt:
+    missing tables, or totals that no longer match fact_inventory (data was reloaded).
+    """
+    if not sqlalchemy.inspect(engine).has_table(TOTALS_TABLE):
+        return None
+    return covered_end(summary, pd.read_sql(TOTALS_SUMMARY_SQL, engine))
+
+# Last snapshot of the history and the fact_inventory generations it was encoded from
+# (a few rows per snapshot x store; fact_inventory itself isn't read)
+HISTORY_STAMP_SQL = f"""
+    SELECT MAX(snapshot_date) AS history_end,
+        COUNT(*) - COUNT(source_generation) AS unstamped,
+        MIN(source_generation) AS lo, MAX(source_generation) AS hi,
+        (SELECT MAX(generation) FROM {GENERATION_TABLE} WHERE table_name = 'fact_inventory') AS generation
+    FROM {TOTALS_TABLE}
+"""
+
+def current_history_end(query):
+    """
+    history_end() for readers: the last snapshot of the history, or None when it is missing or
+    was encoded from an earlier load of fact_inventory (reload_table bumps the generation).
+    `query(sql, params)` returns a DataFrame.
+    """
+    try:
+        stamp = query(HISTORY_STAMP_SQL, None).iloc[0]
+    except Exception:
+        return None
+    if pd.isna(stamp['history_end']) or stamp['unstamped'] > 0:
+        return None
+    generation = 0 if pd.isna(stamp['generation']) else int(stamp['generation'])
+    if int(stamp['lo']) != generation or int(stamp['hi']) != generation:
+        return None
+    return pd.Timestamp(stamp['history_end'])
+
+def build_history(engine, rebuild=False):
+    """
+    Encode fact_inventory snapshot by snapshot (one partition read at a time).
+    Appends the snapshots newer than the stored history, or rebuilds it from scratch.
+    """
+    generation = load_generation(engine, 'fact_inventory') # Before reading: a reload meanwhile leaves a stale stamp
+    summary = snapshot_summary(engine)
+    if summary.empty:
+        logger.warning("fact_inventory is empty; nothing to encode.")
+        return
+
+    end = None if rebuild else history_end(engine, summary)
+    if end is None:
+        logger.info(f"Building inventory history from {len(summary)} snapshots...")
+        prev = None
+        with engine.begin() as conn:
+            for table in (BASE_TABLE, DELTA_TABLE, TOTALS_TABLE):
+                conn.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS {table}"))
+    with open(HISTORY_SQL, 'r') as f:
+        history_sql = f.read()
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(history_sql))
+    if end is not None:
+        # Change rows written after the last totals belong to an interrupted run
+        with engine.begin() as conn:
+            conn.execute(sqlalchemy.text(f"DELETE FROM {DELTA_TABLE} WHERE snapshot_date > :end"), {'end': end.date()})
+            # Just matched fact_inventory snapshot for snapshot: valid for this generation
+            conn.execute(sqlalchemy.text(f"UPDATE {TOTALS_TABLE} SET source_generation = :gen"), {'gen': generation})
+        prev = read_history(_engine_query(engine)).as_of(end)
+        logger.info(f"Inventory history covers up to {end:%Y-%m-%d}; appending newer snapshots.")
+
+    pending = summary.loc[summary['snapshot_date'] > end, 'snapshot_date'] if end is not None else summary['snapshot_date']
+    for day in pending:
+        start = time.perf_counter()
+        curr = pd.read_sql(sqlalchemy.text(SNAPSHOT_SQL), engine, params={'day': day.date()})
+        if prev is None:
+            insert_data(curr.assign(snapshot_date=day.date())[HISTORY_COLUMNS], BASE_TABLE, engine, if_exists='append', method='copy')
+            changes = len(curr)
+        else:
+            delta = diff_snapshot(prev, curr, day.date())
+            if not delta.empty:
+                insert_data(delta, DELTA_TABLE, engine, if_exists='append', method='copy')
+            changes = len(delta)
+        # Totals last: they mark the snapshot as complete
+        totals = snapshot_totals(curr, day.date()).assign(source_generation=generation)
+        insert_data(totals, TOTALS_TABLE, engine, if_exists='append', method='copy')
+        logger.info(f"[{day:%Y-%m-%d}] {len(curr):,} lines -> {changes:,} stored rows ({time.perf_counter() - start:.1f}s).")
+        prev = curr
+
+
+    with engine.connect() as conn:
+        stored = conn.execute(sqlalchemy.text(f"SELECT (SELECT COUNT(*) FROM {BASE_TABLE}) + (SELECT COUNT(*) FROM {DELTA_TABLE})")).scalar()
+    source = int(summary['lines'].sum())
+    logger.info(f"Inventory history: {stored:,} stored rows for {source:,} fact_inventory rows ({source / max(stored, 1):.1f}x smaller).")
+
+def verify_history(engine):
+    """Reconstruct every snapshot and compare it line by line with fact_inventory."""
+    history = read_history(_engine_query(engine))
+    if history is None:
+        logger.error("No inventory history to verify.")
+        return False
+    start = time.perf_counter()
+    rebuilt = history.snapshots()
+    logger.info(f"Reconstructed {len(rebuilt):,} rows in {time.perf_counter() - start:.2f}s.")
+    ok = True
+    for day, part in rebuilt.groupby('snapshot_date'):
+        source = pd.read_sql(sqlalchemy.text(SNAPSHOT_SQL), engine, params={'day': day.date()})
+        a = part.sort_values(KEY_COLUMNS)[KEY_COLUMNS + VALUE_COLUMNS].reset_index(drop=True)
+        b = source.sort_values(KEY_COLUMNS)[KEY_COLUMNS + VALUE_COLUMNS].reset_index(drop=True)
+        same = len(a) == len(b) and all((x == y).all() for x, y in zip(_comparable(a), _comparable(b))) \
+            and (a[KEY_COLUMNS].to_numpy() == b[KEY_COLUMNS].to_numpy()).all()
+        if not same:
+            logger.error(f"[{day:%Y-%m-%d}] reconstruction differs from fact_inventory.")
+            ok = False
+    logger.info("Inventory history verified." if ok else "Inventory history verification FAILED.")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encode fact_inventory as a base snapshot + per-snapshot changes.")
+    parser.add_argument('--rebuild', action='store_true', help="Re-encode every snapshot instead of appending new ones.")
+    parser.add_argument('--verify', action='store_true', help="Compare every reconstructed snapshot with fact_inventory.")
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    build_history(engine, rebuild=args.rebuild)
+    if args.verify and not verify_history(engine):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
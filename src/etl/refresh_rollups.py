@@ -0,0 +1,170 @@
+import argparse
+import logging
+import os
+import sys
+import pandas as pd
+import sqlalchemy
+from datetime import timedelta
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.utils.db_utils import get_engine
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROLLUPS_SQL = os.path.join(Config.BASE_DIR, 'src', 'sql', 'rollups.sql')
+JOB_NAME = 'sales_rollups'
+
+# Day filter: the range predicate lets Postgres prune fact_sales partitions,
+# the ANY() keeps only the affected days inside that range.
+DAY_FILTER = "s.date >= :min_day AND s.date < :max_day AND s.date::date = ANY(:days)"
+
+ROLLUP_QUERIES = {
+    'agg_sales_daily': f"""
+        INSERT INTO agg_sales_daily
+            (sales_date, store_id, category_id, brand_id, payment_method,
+             revenue, cost, profit, quantity, line_count, order_count)
+        SELECT
+            s.date::date, s.store_id, p.category_id, p.brand_id, s.payment_method,
+            SUM(s.total_amount), SUM(s.total_cost), SUM(s.profit), SUM(s.quantity),
+            COUNT(*), COUNT(DISTINCT s.order_id)
+        FROM fact_sales s
+        JOIN dim_product p ON s.product_id = p.product_id
+        WHERE {DAY_FILTER}
+        GROUP BY 1, 2, 3, 4, 5
+    """,
+    'agg_orders_daily': f"""
+        INSERT INTO agg_orders_daily
+            (sales_date, store_id, payment_method, revenue, line_count, order_count)
+        SELECT
+            s.date::date, s.store_id, s.payment_method,
+            SUM(s.total_amount), COUNT(*), COUNT(DISTINCT s.order_id)
+        FROM fact_sales s
+        WHERE {DAY_FILTER}
+        GROUP BY 1, 2, 3
+    """,
+    'agg_sales_hourly': f"""
+        INSERT INTO agg_sales_hourly
+            (sales_date, weekday, hour, store_id, category_id, revenue, line_count, order_count)
+        SELECT
+            s.date::date, EXTRACT(ISODOW FROM s.date), EXTRACT(HOUR FROM s.time),
+            s.store_id, p.category_id,
+            SUM(s.total_amount), COUNT(*), COUNT(DISTINCT s.order_id)
+        FROM fact_sales s
+        JOIN dim_product p ON s.product_id = p.product_id
+        WHERE {DAY_FILTER}
+        GROUP BY 1, 2, 3, 4, 5
+    """
+}
+
+# fact_sales stamp: everything (what the next watermark covers) and the part at or below the
+# current watermark (what the rollups already hold). Amounts are summed as integer cents, so
+# the stamp compares exactly on Postgres NUMERIC and on the float Parquet export alike.
+STAMP_SQL = """
+    SELECT
+        MAX(transaction_id) AS max_id,
+        COUNT(*) AS row_count,
+        CAST(SUM(ROUND(total_amount * 100)) AS BIGINT) AS amount_cents,
+        COUNT(*) FILTER (WHERE transaction_id <= :hw) AS known_rows,
+        CAST(SUM(ROUND(total_amount * 100)) FILTER (WHERE transaction_id <= :hw) AS BIGINT) AS known_cents
+    FROM fact_sales
+"""
+
+def _int(value):
+    return None if value is None or pd.isna(value) else int(value)
+
+def rollups_current(query):
+    """
+    True when the rollups cover fact_sales exactly as it is now (the stamp stored by the
+    last refresh matches the table), so readers can use them instead of the line items.
+    `query(sql, params)` returns a DataFrame (a dashboard backend's query).
+    """
+    try:
+        mark = query(f"SELECT high_water, row_count, amount_cents FROM etl_watermark WHERE job_name = '{JOB_NAME}'", None)
+    except Exception:
+        return False
+    if mark.empty:
+        return False
+    mark = mark.iloc[0]
+    now = query(STAMP_SQL, {'hw': 0}).iloc[0]
+    stored = (_int(mark['high_water']), _int(mark['row_count']), _int(mark['amount_cents']))
+    return None not in stored and stored == (_int(now['max_id']), _int(now['row_count']), _int(now['amount_cents']))
+
+def refresh_rollups(engine, full=False):
+    """
+    Refreshes the rollup tables for the days touched by fact_sales rows above the watermark.
+    A full rebuild runs when requested, on first run, or when fact_sales was reloaded:
+    its max transaction_id dropped below the watermark, or the rows at or below it no
+    longer match the stamp stored with it (a regenerate restarts transaction_id at 1).
+    
+    Returns:
+        int: Number of days recomputed.
+    """
+    with open(ROLLUPS_SQL, 'r') as f:
+        rollups_sql = f.read()
+    
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(rollups_sql))
+        
+        mark = conn.execute(
+            sqlalchemy.text("SELECT high_water, row_count, amount_cents FROM etl_watermark WHERE job_name = :job"), {'job': JOB_NAME}
+        ).first()
+        high_water = mark.high_water if mark else None
+        stamp = conn.execute(sqlalchemy.text(STAMP_SQL), {'hw': high_water if high_water is not None else -1}).first()
+        current_max = stamp.max_id
+        
+        if current_max is None:
+            logger.warning("fact_sales is empty. Nothing to roll up.")
+            return 0
+        
+        reloaded = high_water is not None and (
+            current_max < high_water or (stamp.known_rows, stamp.known_cents) != (mark.row_count, mark.amount_cents)
+        )
+        if reloaded:
+            logger.info(f"fact_sales no longer matches the rollups at watermark {high_water} (reloaded).")
+        if full or high_water is None or reloaded:
+            logger.info("Full rollup rebuild...")
+            for table in ROLLUP_QUERIES:
+                conn.execute(sqlalchemy.text(f"TRUNCATE TABLE {table}"))
+            high_water = 0
+        elif current_max == high_water:
+            logger.info(f"Rollups up to date (watermark = {high_water}).")
+            return 0
+        
+        # Days touched by the new line items
+        days = [row[0] for row in conn.execute(
+            sqlalchemy.text("SELECT DISTINCT date::date FROM fact_sales WHERE transaction_id > :hw"), {'hw': high_water}
+        )]
+        params = {'days': days, 'min_day': min(days), 'max_day': max(days) + timedelta(days=1)}
+        logger.info(f"Refreshing {len(days)} days ({min(days)} .. {max(days)}) above watermark {high_water}...")
+        
+        for table, insert_sql in ROLLUP_QUERIES.items():
+            conn.execute(sqlalchemy.text(f"DELETE FROM {table} WHERE sales_date = ANY(:days)"), {'days': days})
+            inserted = conn.execute(sqlalchemy.text(insert_sql), params).rowcount
+            logger.info(f"  {table}: {inserted} rows")
+        
+        conn.execute(sqlalchemy.text("""
+            INSERT INTO etl_watermark (job_name, high_water, row_count, amount_cents, updated_at)
+            VALUES (:job, :hw, :rows, :cents, CURRENT_TIMESTAMP)
+            ON CONFLICT (job_name) DO UPDATE SET high_water = EXCLUDED.high_water, row_count = EXCLUDED.row_count,
+                amount_cents = EXCLUDED.amount_cents, updated_at = EXCLUDED.updated_at
+        """), {'job': JOB_NAME, 'hw': current_max, 'rows': stamp.row_count, 'cents': stamp.amount_cents})
+    
+    logger.info(f"Rollups refreshed. New watermark = {current_max}.")
+    return len(days)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally refresh the sales rollup tables.")
+    parser.add_argument('--full', action='store_true', help="Rebuild every rollup from scratch.")
+    args = parser.parse_args(argv)
+    refresh_rollups(get_engine(), full=args.full)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+-- ASOS Retail Dashboard - Delta-encoded inventory history
+-- Built from fact_inventory by src/etl/inventory_history.py.
+-- fact_inventory repeats every store x product line on every snapshot; most lines don't
+-- move between two counts, so only the first snapshot is stored in full.
+
+-- First snapshot, every line
+CREATE TABLE IF NOT EXISTS inv_history_base (
+    snapshot_date DATE NOT NULL,
+    store_id INT NOT NULL,
+    product_id INT NOT NULL,
+    stock_on_hand INT,
+    reorder_point INT,
+    last_restock_date TIMESTAMP
+);
+
+-- Later snapshots: only the lines whose values changed (new values).
+-- A NULL stock_on_hand marks a line that is no longer in the snapshot.
+-- State of a line on day d = its last row (base or change) with snapshot_date <= d.
+CREATE TABLE IF NOT EXISTS inv_history_delta (
+    snapshot_date DATE NOT NULL,
+    store_id INT NOT NULL,
+    product_id INT NOT NULL,
+    stock_on_hand INT,
+    reorder_point INT,
+    last_restock_date TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_inv_history_delta_date ON inv_history_delta (snapshot_date);
+
+-- Per snapshot x store totals, written for every snapshot (also when nothing changed)
+CREATE TABLE IF NOT EXISTS inv_snapshot_totals (
+    snapshot_date DATE NOT NULL,
+    store_id INT NOT NULL,
+    stock_on_hand BIGINT,
+    lines BIGINT,
+    low_stock_lines BIGINT,
+    PRIMARY KEY (snapshot_date, store_id)
+);
+-- fact_inventory load generation (etl_load_generation) the snapshot was encoded from:
+-- readers trust the history only while every row matches the current generation
+ALTER TABLE inv_snapshot_totals ADD COLUMN IF NOT EXISTS source_generation BIGINT;
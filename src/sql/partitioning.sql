@@ -0,0 +1,106 @@
+-- ASOS Retail Dashboard Schema - Time-Partitioned Facts
+-- fact_sales is RANGE partitioned by month on date, fact_inventory by month on snapshot_date.
+-- Notes:
+--   * The partition key must be part of the primary key.
+--   * No FKs to the dims, so generate_mock_data.py can keep reloading dim_store / dim_customer.
+--   * Monthly partitions are named <table>_YYYYMM; rows outside them land in <table>_default.
+
+-- 1. Partition Management -------------------------------------------------
+
+-- Creates one partition per month between from_date and to_date (inclusive).
+-- Rows already sitting in the DEFAULT partition for that month are moved into the new partition.
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, key_col TEXT, from_date DATE, to_date DATE)
+RETURNS INT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_date)::date;
+    month_end DATE;
+    part_name TEXT;
+    created INT := 0;
+BEGIN
+    WHILE month_start <= to_date LOOP
+        month_end := (month_start + INTERVAL '1 month')::date;
+        part_name := parent || '_' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(part_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', part_name, parent);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+                parent || '_default', key_col, month_start, key_col, month_end, part_name
+            );
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', parent, part_name, month_start, month_end);
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keeps partitions open for the current month + months_ahead on both facts.
+-- Run on a schedule (e.g. monthly cron: SELECT ensure_future_partitions(3);)
+CREATE OR REPLACE FUNCTION ensure_future_partitions(months_ahead INT DEFAULT 3)
+RETURNS INT AS $$
+DECLARE
+    horizon DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::date;
+BEGIN
+    RETURN create_monthly_partitions('fact_sales', 'date', CURRENT_DATE, horizon)
+         + create_monthly_partitions('fact_inventory', 'snapshot_date', CURRENT_DATE, horizon);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 2. Partitioned Fact Tables ----------------------------------------------
+
+-- Fact Sales (Transactions)
+-- Grain: One row per Product per Order (Line Item)
+CREATE TABLE IF NOT EXISTS fact_sales (
+    transaction_id SERIAL, -- Unique ID for the Line Item
+    order_id VARCHAR(50), -- Tie multiple items to one Basket (MBA Support)
+    date TIMESTAMP NOT NULL, -- Partition Key
+    time TIMESTAMP,
+    store_id INT,
+    customer_id INT,
+    product_id INT,
+    quantity INT,
+    unit_price NUMERIC, -- Price at time of purchase (after discount)
+    total_amount NUMERIC, -- quantity * unit_price
+    unit_cost NUMERIC, -- BASE cost (not affected by discount)
+    total_cost NUMERIC, -- unit_cost * quantity
+    profit NUMERIC, -- total_amount - total_cost
+    payment_method VARCHAR(50),
+    date_key INT, -- dim_date.date_key (YYYYMMDD)
+    PRIMARY KEY (transaction_id, date)
+) PARTITION BY RANGE (date);
+
+CREATE TABLE IF NOT EXISTS fact_sales_default PARTITION OF fact_sales DEFAULT;
+
+-- Fact Inventory (Stock Snapshots)
+-- Grain: One row per Store per Product per Snapshot
+CREATE TABLE IF NOT EXISTS fact_inventory (
+    inventory_id SERIAL,
+    snapshot_date DATE NOT NULL, -- Partition Key
+    store_id INT,
+    product_id INT,
+    stock_on_hand INT,
+    reorder_point INT,
+    last_restock_date TIMESTAMP,
+    date_key INT, -- dim_date.date_key of snapshot_date
+    PRIMARY KEY (inventory_id, snapshot_date)
+) PARTITION BY RANGE (snapshot_date);
+
+CREATE TABLE IF NOT EXISTS fact_inventory_default PARTITION OF fact_inventory DEFAULT;
+
+-- 3. Index Strategy -------------------------------------------------------
+-- Indexes on the parent cascade to every (current and future) partition.
+-- BRIN for the time columns: rows arrive in time order, so block ranges stay tight and tiny.
+-- B-tree for the join / lookup keys used by the dashboard, RFM and basket analysis.
+
+CREATE INDEX IF NOT EXISTS idx_fact_sales_date_brin ON fact_sales USING BRIN (date);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_customer ON fact_sales (customer_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_product ON fact_sales (product_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_store ON fact_sales (store_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_order ON fact_sales (order_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_date_key ON fact_sales (date_key);
+
+CREATE INDEX IF NOT EXISTS idx_fact_inventory_snapshot_brin ON fact_inventory USING BRIN (snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_fact_inventory_product ON fact_inventory (product_id);
+CREATE INDEX IF NOT EXISTS idx_fact_inventory_store ON fact_inventory (store_id);
+CREATE INDEX IF NOT EXISTS idx_fact_inventory_date_key ON fact_inventory (date_key);
@@ -0,0 +1,56 @@
+-- ASOS Retail Dashboard - Sales Rollup Tables
+-- Pre-aggregated fact_sales, refreshed incrementally by src/etl/refresh_rollups.py.
+-- Dashboards / BI read thousands of rollup rows instead of millions of line items.
+
+-- Daily sales by store x category x brand x payment method
+-- Note: order_count counts distinct orders inside each row. Multi-category orders appear in
+-- several rows, so use agg_orders_daily for exact order totals / AOV.
+CREATE TABLE IF NOT EXISTS agg_sales_daily (
+    sales_date DATE NOT NULL,
+    store_id INT,
+    category_id INT,
+    brand_id INT,
+    payment_method VARCHAR(50),
+    revenue NUMERIC,
+    cost NUMERIC,
+    profit NUMERIC,
+    quantity BIGINT,
+    line_count BIGINT,
+    order_count BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_agg_sales_daily_date ON agg_sales_daily (sales_date);
+
+-- Daily orders by store x payment method (one order = one store + one payment method, so fully additive)
+CREATE TABLE IF NOT EXISTS agg_orders_daily (
+    sales_date DATE NOT NULL,
+    store_id INT,
+    payment_method VARCHAR(50),
+    revenue NUMERIC,
+    line_count BIGINT,
+    order_count BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_agg_orders_daily_date ON agg_orders_daily (sales_date);
+
+-- Peak times: hour-of-day x weekday (ISO: 1 = Monday) per day, store and category
+CREATE TABLE IF NOT EXISTS agg_sales_hourly (
+    sales_date DATE NOT NULL,
+    weekday SMALLINT,
+    hour SMALLINT,
+    store_id INT,
+    category_id INT,
+    revenue NUMERIC,
+    line_count BIGINT,
+    order_count BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_agg_sales_hourly_date ON agg_sales_hourly (sales_date);
+
+-- High-water marks for incremental jobs
+CREATE TABLE IF NOT EXISTS etl_watermark (
+    job_name VARCHAR(100) PRIMARY KEY,
+    high_water BIGINT, -- Last processed fact_sales.transaction_id
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+-- Stamp of fact_sales at the watermark: transaction_id restarts at 1 on every regenerate,
+-- so a reload with as many rows is only caught by comparing what lies below it
+ALTER TABLE etl_watermark ADD COLUMN IF NOT EXISTS row_count BIGINT; -- Line items with transaction_id <= high_water
+ALTER TABLE etl_watermark ADD COLUMN IF NOT EXISTS amount_cents BIGINT; -- SUM(total_amount) of those line items, in cents
@@ -47,6 +47,8 @@ CREATE TABLE IF NOT EXISTS dim_customer (
     loyalty_score INT
 );
 
+-- Date Dimension: defined once in sql/schema.sql (applied by src/db_setup.py and src/etl/build_dim_date.py)
+
 -- Product Dimension (Central Catalog)
 CREATE TABLE IF NOT EXISTS dim_product (
     product_id SERIAL PRIMARY KEY,
@@ -78,7 +80,18 @@ CREATE TABLE IF NOT EXISTS bridge_product_size (
 CREATE TABLE IF NOT EXISTS fact_product_features (
     product_id INT PRIMARY KEY REFERENCES dim_product(product_id),
     price_zscore FLOAT,
-    cluster_id INT
+    cluster_id INT,
+    feature_hash BIGINT, -- Hash of the inputs (description, price, category): changed rows get re-assigned
+    updated_at TIMESTAMP
+);
+
+-- Fact Product Similar (top-k cosine neighbours of the description embeddings)
+CREATE TABLE IF NOT EXISTS fact_product_similar (
+    product_id INT REFERENCES dim_product(product_id),
+    rank SMALLINT, -- 1 = most similar
+    similar_product_id INT REFERENCES dim_product(product_id),
+    score REAL, -- Cosine similarity
+    PRIMARY KEY (product_id, rank)
 );
 
 -- Fact Product Attributes (Extended Info)
@@ -108,8 +121,9 @@ CREATE TABLE IF NOT EXISTS fact_sales (
     unit_cost NUMERIC, -- BASE cost (not affected by discount)
     total_cost NUMERIC, -- unit_cost * quantity
     profit NUMERIC, -- total_amount - total_cost
-    payment_method VARCHAR(50)
+    payment_method VARCHAR(50),
     -- channel removed: join dim_store.type instead
+    date_key INT -- dim_date.date_key (YYYYMMDD)
 );
 
 -- Fact Inventory (Stock Snapshots)
@@ -121,5 +135,6 @@ CREATE TABLE IF NOT EXISTS fact_inventory (
     product_id INT REFERENCES dim_product(product_id),
     stock_on_hand INT,
     reorder_point INT,
-    last_restock_date TIMESTAMP
+    last_restock_date TIMESTAMP,
+    date_key INT -- dim_date.date_key of snapshot_date
 );